@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Throughput of the batch analysis with different numbers of worker processes
+usage: python benchmarks/bench_batch.py --dumps 64 --size 2 --workers 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats import dump_generator
+from src.webrtc_stats import batch as ws_batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dumps', type=int, default=64, help='number of synthetic dumps')
+    parser.add_argument('--size', type=int, default=2, help='size of each dump in MB')
+    parser.add_argument('--workers', default="1,2,4,{}".format(os.cpu_count()), help='comma separated worker counts')
+    parser.add_argument('--chunk-size', type=int, default=ws_batch.DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(args.dumps):
+            dump_generator.write_dump_of_size(os.path.join(tmp_dir, f"{i:05d}_webrtc_internals_dump.txt"), args.size)
+
+        baseline = None
+        for workers in sorted(set(int(w) for w in args.workers.split(','))):
+            begin = time.time()
+            results = ws_batch.analyze_dumps(tmp_dir, workers=workers, chunk_size=args.chunk_size)
+            elapsed = time.time() - begin
+            errors = sum(1 for result in results if result["error"])
+            throughput = len(results) / elapsed
+            baseline = baseline or throughput
+            print(f"workers={workers}: {throughput:.1f} dumps/s, scaling {throughput / baseline:.2f}x, errors={errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compare the per row literal_eval decoding with the batch decoder of get_metrics_values
+usage: python benchmarks/bench_decode_values.py --keys 5000 --samples 600
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from ast import literal_eval
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pandas as pd
+from src.webrtc_stats import analyzer as ws_analyzer
+from src.webrtc_stats import values_decoder
+
+
+def create_stats_df(key_count, sample_count):
+    records = []
+    for i in range(key_count):
+        choice = i % 10
+        if choice == 0:
+            values = ["video"] * sample_count
+        elif choice == 1:
+            values = [True] * sample_count
+        elif choice == 2:
+            values = [0] * sample_count
+        elif choice < 6:
+            values = [round(random.random() * 100, 3) for _ in range(sample_count)]
+        else:
+            values = [random.randint(0, 1 << 31) for _ in range(sample_count)]
+        records.append({
+            "key": f"IT{i // 20}V-metric{i % 20}",
+            "values": json.dumps(values, separators=(',', ':')),
+            "statsType": "inbound-rtp",
+            "startTime": "2023-02-18T08:00:00.000Z",
+            "endTime": "2023-02-18T08:10:00.000Z",
+        })
+    return pd.DataFrame.from_records(records)
+
+
+def get_metrics_values_per_row(statsDf):
+    media_stats = {}
+    for index, row in statsDf.iterrows():
+        df = ws_analyzer.create_df_from_values(row)
+        if len(df) > 0:
+            media_stats[row['key']] = df
+    return media_stats
+
+
+def decode_values_per_row(statsDf):
+    decoded = []
+    for metrics_str in statsDf["values"]:
+        metrics_str = metrics_str.replace("false", "False").replace("true", "True")
+        decoded.append(literal_eval(metrics_str))
+    return decoded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keys', type=int, default=5000)
+    parser.add_argument('--samples', type=int, default=600)
+    args = parser.parse_args()
+
+    stats_df = create_stats_df(args.keys, args.samples)
+    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+
+    begin = time.time()
+    expected = get_metrics_values_per_row(stats_df)
+    per_row_seconds = time.time() - begin
+
+    begin = time.time()
+    actual = analyzer.get_metrics_values(stats_df)
+    batch_seconds = time.time() - begin
+
+    assert expected.keys() == actual.keys()
+    for key, df in expected.items():
+        pd.testing.assert_frame_equal(df, actual[key])
+
+    begin = time.time()
+    decode_values_per_row(stats_df)
+    literal_eval_seconds = time.time() - begin
+
+    begin = time.time()
+    values_decoder.decode_values(stats_df["values"])
+    decode_seconds = time.time() - begin
+
+    print(f"{args.keys} keys x {args.samples} samples")
+    print(f"values decoding: literal_eval: {literal_eval_seconds:.3f} s, batch: {decode_seconds:.3f} s, "
+          f"speedup: {literal_eval_seconds / decode_seconds:.1f}x")
+    print(f"get_metrics_values: per row: {per_row_seconds:.3f} s, batch: {batch_seconds:.3f} s, "
+          f"speedup: {per_row_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup time of the command line: the imports of the modules with python -X importtime and their heaviest
+dependencies, then the wall time of fab -l and of a media-stats query on a cached dump against a budget
+usage: python benchmarks/bench_import_time.py --repeat 5 --budget 0.3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats import dump_generator
+
+DEFAULT_MODULES = "fabfile,src.webrtc_stats.analyzer,src.webrtc_stats.plotter"
+
+
+def import_times(module):
+    """(total ms, [(cumulative ms, package)] of its imports) of a fresh interpreter importing module,
+       a package is reported once with the time of itself and everything it imported
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    module_ms, packages = None, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name, ms = name.strip(), int(cumulative) / 1000
+        top = name.split(".")[0]
+        if name == module:
+            module_ms = ms
+        elif top != module.split(".")[0]:
+            # the top level package with its dependencies, or its largest submodule imported first
+            packages[top] = max(packages.get(top, 0), ms)
+    return module_ms, sorted(((ms, name) for name, ms in packages.items()), reverse=True)
+
+
+def wall_times(command, repeat):
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - begin)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', default=DEFAULT_MODULES, help='comma separated modules to import')
+    parser.add_argument('--top', type=int, default=8, help='heaviest imports shown per module')
+    parser.add_argument('--file', help='existing dump file instead of a small synthetic one')
+    parser.add_argument('--type', default="inbound-rtp", help='stats type of the media-stats query')
+    parser.add_argument('--name', default="bytesReceived", help='metric of the media-stats query')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.3, help='seconds a command should take at most')
+    args = parser.parse_args()
+
+    python_ms = statistics.median(wall_times([sys.executable, "-c", "pass"], args.repeat)) * 1000
+    print(f"python startup: {python_ms:.0f} ms")
+    for module in args.modules.split(","):
+        module_ms, packages = import_times(module)
+        print(f"import {module}: {module_ms or 0:.0f} ms")
+        for ms, name in packages[:args.top]:
+            print(f"    {name:24} {ms:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = args.file
+        if not file_name:
+            file_name = os.path.join(tmp_dir, "startup_dump.txt")
+            dump_generator.write_dump(file_name, pc_count=2, sample_count=300)
+        fab = [sys.executable, "-m", "fabric"]
+        query = fab + ["media-stats", "-f", os.path.abspath(file_name), "-t", args.type, "-n", args.name]
+        # the first query writes the parse cache which the timed ones read
+        subprocess.run(query, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True)
+        for label, command in (("fab -l", fab + ["-l"]), ("fab media-stats, cached dump", query)):
+            seconds = statistics.median(wall_times(command, args.repeat))
+            verdict = "ok" if seconds <= args.budget else f"over the {args.budget * 1000:.0f} ms budget"
+            print(f"{label}: {seconds * 1000:.0f} ms median of {args.repeat}, {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Latency of the get_stats_by_* lookups, boolean masks versus the precomputed StatsIndex
+usage: python benchmarks/bench_lookup.py --rows 50000 --lookups 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pandas as pd
+from src.webrtc_stats.stats_index import StatsIndex, LOOKUP_COLUMNS
+
+STATS_TYPES = ["inbound-rtp", "outbound-rtp", "remote-inbound-rtp", "candidate-pair", "local-candidate"]
+
+
+def create_stats_df(row_count, names_per_id=40):
+    records = []
+    for i in range(row_count):
+        stats_id = f"ID{i // names_per_id}"
+        name = f"metric{i % names_per_id}"
+        records.append({"key": f"{stats_id}-{name}", "pc": "1-1", "id": stats_id, "name": name,
+                        "statsType": STATS_TYPES[(i // names_per_id) % len(STATS_TYPES)],
+                        "values": "[1,2,3]", "startTime": "", "endTime": ""})
+    return pd.DataFrame.from_records(records)
+
+
+def get_by_id_name_with_masks(stats_df, id, name):
+    filter1 = stats_df["name"] == name
+    filter2 = stats_df["id"] == id
+    return stats_df[filter1 & filter2][LOOKUP_COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    args = parser.parse_args()
+
+    stats_df = create_stats_df(args.rows)
+    pairs = stats_df[["id", "name"]].sample(args.lookups, replace=True, random_state=1).values.tolist()
+
+    begin = time.time()
+    index = StatsIndex(stats_df)
+    build_seconds = time.time() - begin
+
+    begin = time.time()
+    for id, name in pairs:
+        get_by_id_name_with_masks(stats_df, id, name)
+    mask_seconds = time.time() - begin
+
+    begin = time.time()
+    for id, name in pairs:
+        index.get_by_id_name(id, name)
+    index_seconds = time.time() - begin
+
+    id, name = random.choice(pairs)
+    assert get_by_id_name_with_masks(stats_df, id, name).equals(index.get_by_id_name(id, name))
+
+    print(f"{args.rows} rows, {args.lookups} lookups, index built in {build_seconds * 1000:.1f} ms")
+    print(f"masks: {mask_seconds / args.lookups * 1e6:.1f} us/lookup, "
+          f"index: {index_seconds / args.lookups * 1e6:.1f} us/lookup, "
+          f"speedup: {mask_seconds / index_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory of json.load and the incremental parser on a synthetic dump
+usage: python benchmarks/bench_parse_memory.py --size 500
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats import dump_generator
+
+MODES = ["load-scan", "stream-scan", "load-parse", "stream-parse"]
+
+
+def run_mode(mode, file_name):
+    from src.webrtc_stats import analyzer as ws_analyzer
+    from src.webrtc_stats import stream_parser
+
+    records = 0
+    begin = time.time()
+    if mode.endswith("-scan"):
+        with open(file_name, 'r', encoding='utf_8') as f:
+            if mode == "load-scan":
+                items = stream_parser.walk_webrtc_internals(json.load(f))
+            else:
+                items = stream_parser.iter_webrtc_internals(f)
+            for item in items:
+                records += 1
+    else:
+        analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+        analyzer.parse(file_name, incremental=(mode == "stream-parse"))
+        records = len(analyzer.get_webrtc_stats())
+    elapsed = time.time() - begin
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "records": records, "seconds": round(elapsed, 2), "peak_rss_mb": round(peak_mb, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=500, help='size of the synthetic dump in MB')
+    parser.add_argument('--modes', default=",".join(MODES), help='comma separated modes to run')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help='existing dump file instead of a synthetic one')
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.child, args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = args.file
+        if not file_name:
+            file_name = os.path.join(tmp_dir, "synthetic_webrtc_internals_dump.txt")
+            dump_generator.write_dump_of_size(file_name, args.size)
+        print(f"dump {file_name}: {os.path.getsize(file_name) / 1024 / 1024:.1f} MB")
+        for mode in args.modes.split(','):
+            # each mode runs in its own process so ru_maxrss is not shared
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--file', file_name],
+                           cwd=ROOT_DIR, check=False)
+
+
+if __name__ == "__main__":
+    main()
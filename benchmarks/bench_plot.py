@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Time Plotter.draw_charts on a long series, with and without downsampling,
+and Plotter.render_charts of many series with one process and with a process pool
+usage: python benchmarks/bench_plot.py --hours 4 --charts 24 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats.plotter import Plotter
+from src.webrtc_stats import downsample
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=4)
+    parser.add_argument('--rate', type=float, default=1, help='samples per second')
+    parser.add_argument('--points', type=int, default=downsample.DEFAULT_MAX_POINTS)
+    parser.add_argument('--full', action='store_true', help='also draw every sample, that is slow')
+    parser.add_argument('--charts', type=int, default=24, help='number of series for render_charts')
+    parser.add_argument('--workers', type=int, default=None, help='processes of render_charts, default cpu count')
+    args = parser.parse_args()
+
+    count = int(args.hours * 3600 * args.rate)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2023-02-18 08:00:00", periods=count, freq=pd.Timedelta(seconds=1 / args.rate), tz='UTC'),
+        "value": np.abs(rng.normal(size=count).cumsum() * 1000 + 2000000),
+    })
+    print(f"{count} samples")
+
+    runs = [("lttb", args.points), ("minmax", args.points)]
+    if args.full:
+        runs.append(("lttb", 0))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for method, points in runs:
+            plotter = Plotter(os.path.join(tmp_dir, "chart.png"), width=16, height=6, max_points=points,
+                              downsample_method=method)
+            begin = time.time()
+            plotter.draw_charts(df, ["value"])
+            print(f"{method:8} max_points={points:6}: {time.time() - begin:.2f} seconds")
+
+        series = [(f"metric{i}", df) for i in range(args.charts)]
+        plotter = Plotter(os.path.join(tmp_dir, "charts"), width=16, height=6, max_points=args.points)
+        for workers in (1, args.workers):
+            begin = time.time()
+            plotter.render_charts(series, tmp_dir, workers=workers)
+            print(f"render_charts {args.charts} charts, workers={workers}: {time.time() - begin:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Resident size of the _webrtc_stats table, object columns versus categorical and datetime64 columns
+usage: python benchmarks/bench_table_memory.py --size 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pandas as pd
+from src.webrtc_stats import dump_generator
+from src.webrtc_stats import analyzer as ws_analyzer
+from src.webrtc_stats import stream_parser
+
+
+def get_memory_mb(df, columns):
+    return df[columns].memory_usage(deep=True, index=False).sum() / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100, help='size of the synthetic dump in MB')
+    parser.add_argument('--file', help='existing dump file instead of a synthetic one')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = args.file
+        if not file_name:
+            file_name = os.path.join(tmp_dir, "synthetic_webrtc_internals_dump.txt")
+            dump_generator.write_dump_of_size(file_name, args.size)
+        with open(file_name, 'r', encoding='utf_8') as f:
+            stats_items = [ws_analyzer.create_stats_item(pc_key, key, value)
+                           for item_key, pc_key, key, value in stream_parser.iter_webrtc_internals(f)
+                           if item_key == "stats"]
+
+    object_df = pd.DataFrame.from_records(stats_items)
+    compact_df = ws_analyzer.create_stats_table(stats_items)
+
+    metadata_columns = [column for column in object_df.columns if column != "values"]
+    object_mb = get_memory_mb(object_df, metadata_columns)
+    compact_mb = get_memory_mb(compact_df, metadata_columns)
+    values_mb = get_memory_mb(object_df, ["values"])
+    print(f"{len(object_df)} rows")
+    print(f"metadata columns: object {object_mb:.2f} MB, compact {compact_mb:.2f} MB, {object_mb / compact_mb:.1f}x smaller")
+    print(f"whole table: object {object_mb + values_mb:.2f} MB, compact {compact_mb + values_mb:.2f} MB "
+          f"(values strings {values_mb:.2f} MB are unchanged)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite over a synthetic webrtc internals dump: parse time, get_metrics_values time,
+lookup latency and peak RSS. Save the results and compare them with a baseline to catch regressions.
+
+The binary modes open the same dump converted to the memory mapped binary format.
+The gzip, zstd and xz modes parse the compressed dump while it is decompressed, the decompress_parse ones
+decompress it to disk first and parse the decompressed copy.
+The firefox and jsonl modes parse the same synthetic stats written as Firefox about:webrtc reports and as
+RTCStatsReport json lines.
+
+usage: python benchmarks/run_benchmarks.py --size 50 --output bench.json
+       python benchmarks/run_benchmarks.py --size 50 --baseline bench.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats import compression
+from src.webrtc_stats import dump_generator
+
+PARSE_MODES = ["json", "incremental"]
+DEFAULT_COMPRESSIONS = "gzip,zstd"
+DEFAULT_FORMATS = "firefox,jsonl"
+
+
+def measure_parse(file_name, mode):
+    """Run in a child process, so that the peak RSS belongs to one parse only"""
+    from src.webrtc_stats import analyzer as ws_analyzer
+
+    begin = time.time()
+    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+    analyzer.parse(file_name, incremental=(mode == "incremental"))
+    parse_seconds = time.time() - begin
+    return {
+        f"parse_{mode}_seconds": parse_seconds,
+        f"parse_{mode}_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def measure_decompress_parse(file_name, file_compression):
+    """The way compressed dumps are read without streaming: decompress to disk, then parse"""
+    from src.webrtc_stats import analyzer as ws_analyzer
+
+    begin = time.time()
+    decompressed = compression.decompress_file(file_name, file_name + ".decompressed")
+    try:
+        analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+        analyzer.parse(decompressed, incremental=True)
+    finally:
+        os.remove(decompressed)
+    return {
+        f"decompress_parse_{file_compression}_seconds": time.time() - begin,
+        f"decompress_parse_{file_compression}_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def measure_queries(file_name, lookups):
+    from src.webrtc_stats import analyzer as ws_analyzer
+
+    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+    analyzer.parse(file_name)
+    stats_df = analyzer.get_webrtc_stats()
+
+    begin = time.time()
+    media_stats = analyzer.get_metrics_values(stats_df)
+    metrics_seconds = time.time() - begin
+
+    rng = random.Random(0)
+    pairs = rng.choices(stats_df[["id", "name"]].values.tolist(), k=lookups)
+
+    begin = time.time()
+    for id, name in pairs:
+        analyzer.get_stats_by_id_name(id, name)
+    lookup_seconds = time.time() - begin
+
+    begin = time.time()
+    for id, name in pairs:
+        analyzer.get_stats_values(id, name)
+    values_seconds = time.time() - begin
+
+    return {
+        "records": len(stats_df),
+        "metrics": len(media_stats),
+        "get_metrics_values_seconds": metrics_seconds,
+        "lookup_us": lookup_seconds / lookups * 1e6,
+        "get_stats_values_us": values_seconds / lookups * 1e6,
+    }
+
+
+def run_child(args):
+    if args.child == "queries":
+        result = measure_queries(args.file, args.lookups)
+    elif args.child.startswith("decompress_"):
+        result = measure_decompress_parse(args.file, args.child[len("decompress_"):])
+    else:
+        result = measure_parse(args.file, args.child)
+    print(json.dumps(result))
+
+
+def run_in_child(name, file_name, lookups):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, '--file', file_name,
+                             '--lookups', str(lookups)], cwd=ROOT_DIR, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every measure, return the names of those which regressed"""
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base or name in ("records", "metrics") or name.startswith("dump_"):
+            continue
+        change = (value - base) / base
+        flag = ""
+        if change > tolerance:
+            flag = "  <-- regression"
+            regressions.append(name)
+        print(f"{name:32} {base:12.3f} -> {value:12.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=50, help='size of the synthetic dump in MB')
+    parser.add_argument('--file', help='existing dump file instead of a synthetic one')
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--baseline', help='json results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    parser.add_argument('--compressions', default=DEFAULT_COMPRESSIONS,
+                        help='comma separated compressions of the dump to measure: gzip, zstd, xz')
+    parser.add_argument('--formats', default=DEFAULT_FORMATS,
+                        help='comma separated formats of the synthetic dump to measure besides chrome: firefox, jsonl')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = args.file
+        pc_count = None
+        if not file_name:
+            file_name = os.path.join(tmp_dir, "synthetic_webrtc_internals_dump.txt")
+            pc_count = dump_generator.write_dump_of_size(file_name, args.size)
+
+        results = {"dump_mb": os.path.getsize(file_name) / 1024 / 1024}
+        for mode in PARSE_MODES:
+            results.update(run_in_child(mode, file_name, args.lookups))
+        results.update(run_in_child("queries", file_name, args.lookups))
+        # converted in a child as well, the peak RSS of a child starts from the one of its parent
+        binary_name = os.path.join(tmp_dir, "synthetic_webrtc_internals_dump.wsdump")
+        subprocess.run([sys.executable, '-m', 'src.webrtc_stats.binary_dump', '-i', file_name, '-o', binary_name],
+                       cwd=ROOT_DIR, check=True, capture_output=True)
+        results.update(run_in_child("binary", binary_name, args.lookups))
+
+        for file_compression in filter(None, args.compressions.split(",")):
+            if file_compression == compression.ZSTD and compression.zstandard is None:
+                print("skip zstd, zstandard is not installed")
+                continue
+            compressed_name = compression.compress_file(
+                file_name, file_compression, os.path.join(tmp_dir, "synthetic_webrtc_internals_dump.txt" +
+                                                          compression.SUFFIXES[file_compression]))
+            results[f"dump_{file_compression}_mb"] = os.path.getsize(compressed_name) / 1024 / 1024
+            results.update(run_in_child(file_compression, compressed_name, args.lookups))
+            results.update(run_in_child("decompress_" + file_compression, compressed_name, args.lookups))
+
+        # the same peer connections and stats as the chrome dump, the other formats are bigger
+        for dump_format in filter(None, args.formats.split(",") if pc_count else []):
+            format_name = os.path.join(tmp_dir, f"synthetic_{dump_format}_dump.txt")
+            dump_generator.write_snapshots(format_name, dump_format, pc_count=pc_count)
+            results[f"dump_{dump_format}_mb"] = os.path.getsize(format_name) / 1024 / 1024
+            results.update(run_in_child(dump_format, format_name, args.lookups))
+
+    for name, value in results.items():
+        print(f"{name:32} {value:12.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf_8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf_8') as f:
+            baseline = json.load(f)
+        print(f"\ncompare with {args.baseline}")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,22 @@
+import atexit
 import os
-import sys
-import matplotlib.pyplot as plt
-from fabric import task
-from fabric import Connection
 import time
-import json
-import pprint
-import os
-import platform
-import socket
-from tabulate import tabulate
-from pytz import timezone
-from datetime import datetime, timedelta
-import pandas as pd
-import src.webrtc_stats.analyzer as ws_analyzer
+from fabric import task
 import src.webrtc_stats.analyzer_util as ws_util
-from src.webrtc_stats.yaml_config import YamlConfig
 
+# the modules of the tasks are imported by the first task which uses one, fab -l and a task which
+# only reads a cached dump do not pay for pandas, matplotlib or tabulate
+pd = ws_util.lazy_module("pandas")
+tabulate = ws_util.lazy_module("tabulate")
+ws_analyzer = ws_util.lazy_module("src.webrtc_stats.analyzer")
+ws_aggregation = ws_util.lazy_module("src.webrtc_stats.aggregation")
+ws_batch = ws_util.lazy_module("src.webrtc_stats.batch")
+ws_binary = ws_util.lazy_module("src.webrtc_stats.binary_dump")
+ws_derived = ws_util.lazy_module("src.webrtc_stats.derived_metrics")
+ws_incidents = ws_util.lazy_module("src.webrtc_stats.incidents")
+ws_plotter = ws_util.lazy_module("src.webrtc_stats.plotter")
+ws_profiling = ws_util.lazy_module("src.webrtc_stats.profiling")
+ws_config = ws_util.lazy_module("src.webrtc_stats.yaml_config")
 
 DEFAULT_HOSTS = ["localhost"]
 DEFAULT_PATH = os.getcwd()
@@ -28,6 +28,26 @@ def get_log_path(file):
         return file
 
 
+def parse_dump(file, profile=None, utc_offset=None):
+    """Parse a dump with its parse cache
+       profile: --profile prints the time, records and peak RSS of every stage when the task ends,
+       --profile=cprofile or --profile=pyinstrument also prints a function profile
+       utc_offset: UTC offset of the browser for the update log times, e.g. +02:00, inferred by default
+    """
+    analyzer = ws_analyzer.WebrtcInternalsAnalyzer(profile=bool(profile), log_utc_offset=utc_offset)
+    if profile:
+        stop = ws_profiling.start_capture(profile) if profile in ws_profiling.CAPTURE_TOOLS else None
+        atexit.register(print_profile, analyzer, stop)
+    analyzer.parse(get_log_path(file), cache=True)
+    return analyzer
+
+
+def print_profile(analyzer, stop=None):
+    if stop:
+        stop()
+    print(ws_profiling.format_report(analyzer.get_profile()))
+
+
 @task(hosts=DEFAULT_HOSTS)
 def local_ip(c):
     print(ws_util.get_host_ip())
@@ -46,39 +66,35 @@ def frontend(c):
         c.local(cmd)
 
 
-@task(hosts=DEFAULT_HOSTS)
-def media_stats(c, file, name, type="", id="", output=None):
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def media_stats(c, file, name, type="", id="", output=None, profile=None):
     """
     usage: fab media-stats -f samples/receiver_webrtc_internals_dump.txt -t inbound-rtp -n [bytesReceived_in_bits/s]
     or fab media-stats -f $TA_LOG_DIR/10.224.34.19_webrtc_internals_dump.txt -n "[framesDecoded/s]"  -i IT01V3609914274
     """
-    log_file = get_log_path(file)
-    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
-    analyzer.parse(log_file)
+    analyzer = parse_dump(file, profile)
     if type:
         stats_df = analyzer.get_stats_by_type_name(type, name)
         print(stats_df)
     if id:
         #stats_df = analyzer.get_stats_by_id_name(id, name)
         stats_df = analyzer.get_stats_values(id, name)
-        print(tabulate(stats_df, headers='keys', tablefmt='psql'))
+        print(tabulate.tabulate(stats_df, headers='keys', tablefmt='psql'))
         if output and output.endswith(".csv"):
             stats_df.to_csv(output)
 
 
 
-@task(hosts=DEFAULT_HOSTS)
-def rtp_stats(c, file, category, bitrate_item):
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def rtp_stats(c, file, category, bitrate_item, profile=None):
     """
     usage: fab rtp-stats -f samples/sender_webrtc_internals_dump.txt -c outbound-rtp -b "[bytesSent_in_bits/s]"
     """
 
-    log_file = get_log_path(file)
-    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
-    analyzer.parse(log_file)
+    analyzer = parse_dump(file, profile)
     stats_ids = analyzer.get_stats_ids(category)
 
-    yamlConfig = YamlConfig("src/webrtc_stats/analyzer.yaml")
+    yamlConfig = ws_config.YamlConfig("src/webrtc_stats/analyzer.yaml")
     stats_items = yamlConfig.get_config().get("media_stats").get(category)
 
     for stats_id in stats_ids:
@@ -96,28 +112,28 @@ def rtp_stats(c, file, category, bitrate_item):
             print(f"* {stats_id}-{stats_item}: ", stats_df.tail(10)["value"].values.tolist())
 
 
-@task(hosts=DEFAULT_HOSTS)
-def outbound_rtp_stats(c, file):
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def outbound_rtp_stats(c, file, profile=None):
     """
     usage: fab outbound-rtp-stats -f samples/sender_webrtc_internals_dump.txt
     """
     category="outbound-rtp"
     bitrate_item = "[bytesSent_in_bits/s]"
 
-    rtp_stats(c, file, category, bitrate_item)
+    rtp_stats(c, file, category, bitrate_item, profile)
 
-@task(hosts=DEFAULT_HOSTS)
-def inbound_rtp_stats(c, file):
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def inbound_rtp_stats(c, file, profile=None):
     """
     usage: fab inbound-rtp-stats -f samples/receiver_webrtc_internals_dump.txt
     """
     category="inbound-rtp"
     bitrate_item = "[bytesReceived_in_bits/s]"
 
-    rtp_stats(c, file, category, bitrate_item)
+    rtp_stats(c, file, category, bitrate_item, profile)
 
-@task(hosts=DEFAULT_HOSTS)
-def candidate_pair_stats(c, file):
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def candidate_pair_stats(c, file, profile=None):
     """
     usage: fab candidate-pair-stats -f samples/receiver_webrtc_internals_dump.txt
     """
@@ -128,9 +144,7 @@ def candidate_pair_stats(c, file):
                    "[bytesReceived_in_bits/s]",
                    "currentRoundTripTime"]
 
-    log_file = get_log_path(file)
-    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
-    analyzer.parse(log_file)
+    analyzer = parse_dump(file, profile)
     stats_ids = analyzer.get_stats_ids(category)
     i = 0
     media_stats = analyzer.get_media_stats()
@@ -162,11 +176,159 @@ def candidate_pair_stats(c, file):
 
 
 @task(hosts=DEFAULT_HOSTS)
-def overview(c, file):
+def batch_stats(c, path, pattern="*.txt", workers=0, timeout=0, output=None, incidents=False):
     """
-    usage: fab overview -f samples/receiver_webrtc_internals_dump.txt
+    usage: fab batch-stats -p "$TA_LOG_DIR" -w 8 -t 120
+    or fab batch-stats -p "$TA_LOG_DIR/**/*_webrtc_internals_dump.txt" -o summary.csv --incidents
+    """
+    begin = time.time()
+    summarize = ws_incidents.summarize_incidents if incidents else ws_batch.summarize_dump
+    results = ws_batch.analyze_dumps(get_log_path(path), pattern, int(workers) or None, timeout=float(timeout) or None,
+                                     summarize=summarize)
+    elapsed = time.time() - begin
+
+    summary_df = pd.DataFrame.from_records(results)
+    print(tabulate.tabulate(summary_df, headers='keys', tablefmt='psql'))
+    print(f"{len(results)} dumps in {elapsed:.2f} seconds, {len(results) / max(elapsed, 1e-9):.1f} dumps/s")
+    if output and output.endswith(".csv"):
+        summary_df.to_csv(output)
+
+
+@task(hosts=DEFAULT_HOSTS)
+def fleet_stats(c, path, pattern="*.txt", workers=0, timeout=0, output=None):
+    """
+    usage: fab fleet-stats -p "$TA_LOG_DIR" -w 8
+    or fab fleet-stats -p "$TA_LOG_DIR/**/*_webrtc_internals_dump.txt" -o fleet.csv
+    """
+    begin = time.time()
+    aggregate = ws_aggregation.aggregate_dumps(get_log_path(path), pattern, int(workers) or None,
+                                               timeout=float(timeout) or None)
+    elapsed = time.time() - begin
+
+    fleet_df = pd.DataFrame.from_records(aggregate.get_percentiles())
+    print(tabulate.tabulate(fleet_df, headers='keys', tablefmt='psql', showindex=False))
+    print("distinct candidate ips:", aggregate.get_distinct_ips())
+    print(f"{aggregate.dumps} dumps, {aggregate.errors} errors in {elapsed:.2f} seconds")
+    if output and output.endswith(".csv"):
+        fleet_df.to_csv(output, index=False)
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def derived_stats(c, file, category, name="", id="", profile=None):
+    """
+    usage: fab derived-stats -f samples/receiver_webrtc_internals_dump.txt -c inbound-rtp
+    or fab derived-stats -f samples/receiver_webrtc_internals_dump.txt -c inbound-rtp -n packetLossPercent -i IT01V3609914274
+    """
+    analyzer = parse_dump(file, profile)
+
+    derived_metrics = ws_derived.DerivedMetrics(analyzer)
+    names = [name] if name else list(derived_metrics.get_formulas(category).keys())
+    stats_ids = [id] if id else analyzer.get_stats_ids(category)
+    for metric in names:
+        for stats_id in stats_ids:
+            stats_df = derived_metrics.get_values(stats_id, category, metric)
+            if len(stats_df) > 0:
+                print(f"{stats_id}-{metric} = {derived_metrics.get_formulas(category)[metric]}")
+                print(tabulate.tabulate(stats_df.tail(10), headers='keys', tablefmt='psql'))
+
+
+@task(hosts=DEFAULT_HOSTS)
+def convert_dump(c, file, output=None, narrow=False):
+    """
+    usage: fab convert-dump -f samples/receiver_webrtc_internals_dump.txt
+    or fab convert-dump -f $TA_LOG_DIR/10.224.34.19_webrtc_internals_dump.txt -o /data/archive/10.224.34.19.wsdump
+    --narrow writes a smaller dump whose samples are copied instead of memory mapped when they are read
     """
     log_file = get_log_path(file)
-    analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
-    analyzer.parse(log_file)
+    begin = time.time()
+    output_file = ws_binary.convert_dump(log_file, output, narrow)
+    input_size, output_size = os.path.getsize(log_file), os.path.getsize(output_file)
+    print(f"{log_file} ({input_size} bytes) -> {output_file} ({output_size} bytes, "
+          f"{output_size / max(input_size, 1):.1%}) in {time.time() - begin:.2f} seconds")
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def aligned_stats(c, file, keys, interval="1s", output=None, profile=None):
+    """
+    usage: fab aligned-stats -f samples/sender_webrtc_internals_dump.txt -k "OT01V1896130134-bytesSent,CP1366389553-availableOutgoingBitrate,RIV1553401233-roundTripTime"
+    or fab aligned-stats -f samples/sender_webrtc_internals_dump.txt -k "..." -i 500ms -o aligned.csv
+    """
+    analyzer = parse_dump(file, profile)
+
+    aligned_df = analyzer.get_aligned_stats([key.strip() for key in keys.split(",") if key.strip()], interval)
+    print(tabulate.tabulate(aligned_df.tail(10), headers='keys', tablefmt='psql'))
+    print(f"{aligned_df.shape[1]} metrics on {aligned_df.shape[0]} time points")
+    if output and output.endswith(".csv"):
+        aligned_df.to_csv(output)
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def events(c, file, pc=None, type=None, start=None, end=None, states=False, utc_offset=None, profile=None):
+    """
+    usage: fab events -f samples/receiver_webrtc_internals_dump.txt --states
+    or fab events -f samples/receiver_webrtc_internals_dump.txt -p 1000-1 -t icecandidate -s "2023-02-18 08:00:10" -e "2023-02-18 08:00:20"
+    or fab events -f dumps/paris_webrtc_internals_dump.txt --utc-offset=+01:00, for a dump saved in UTC+1
+    """
+    analyzer = parse_dump(file, profile, utc_offset)
+
+    if states:
+        events_df = analyzer.get_event_timeline().get_state_changes(pc)
+    else:
+        events_df = analyzer.get_events(start, end, pc, type)
+    print(tabulate.tabulate(events_df, headers='keys', tablefmt='psql', showindex=False))
+    print(f"{len(events_df)} of {len(analyzer.get_webrtc_events())} events")
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def incidents(c, file, severity="", output=None, profile=None):
+    """
+    usage: fab incidents -f samples/receiver_webrtc_internals_dump.txt
+    or fab incidents -f $TA_LOG_DIR/10.224.34.19_webrtc_internals_dump.txt -s major -o incidents.csv
+    """
+    analyzer = parse_dump(file, profile)
+
+    begin = time.time()
+    incidents_df = ws_incidents.IncidentDetector().detect(analyzer)
+    elapsed = time.time() - begin
+    if severity:
+        levels = [label for _, label in ws_incidents.SEVERITIES]
+        incidents_df = incidents_df[incidents_df["severity"].isin(levels[:levels.index(severity) + 1])]
+    print(tabulate.tabulate(incidents_df, headers='keys', tablefmt='psql', showindex=False))
+    print(f"{len(incidents_df)} incidents in {elapsed:.2f} seconds")
+    if output and output.endswith(".csv"):
+        incidents_df.to_csv(output, index=False)
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def draw_charts(c, file, category, output="charts", format="png", per_page=1, workers=0, profile=None):
+    """
+    usage: fab draw-charts -f samples/receiver_webrtc_internals_dump.txt -c inbound-rtp -o charts
+    or fab draw-charts -f samples/sender_webrtc_internals_dump.txt -c outbound-rtp --format svg --per-page 4 -w 8
+    """
+    analyzer = parse_dump(file, profile)
+
+    yamlConfig = ws_config.YamlConfig("src/webrtc_stats/analyzer.yaml")
+    stats_items = yamlConfig.get_config().get("media_stats").get(category, [])
+
+    series = []
+    for stats_id in analyzer.get_stats_ids(category):
+        for stats_item in stats_items:
+            stats_df = analyzer.get_stats_values(stats_id, stats_item)
+            if len(stats_df) > 0 and stats_df["value"].dtype.kind in 'iufb':
+                series.append((f"{stats_id}-{stats_item}", stats_df))
+
+    begin = time.time()
+    plotter = ws_plotter.Plotter(os.path.join(output, category), width=16, height=6)
+    chart_files = plotter.render_charts(series, output, format, int(per_page), int(workers) or None)
+    print(f"{len(chart_files)} charts of {len(series)} metrics in {time.time() - begin:.2f} seconds")
+    for chart_file in chart_files:
+        print("*", chart_file)
+
+
+@task(hosts=DEFAULT_HOSTS, optional=['profile'])
+def overview(c, file, profile=None):
+    """
+    usage: fab overview -f samples/receiver_webrtc_internals_dump.txt
+    """
+    analyzer = parse_dump(file, profile)
     print(analyzer._webrtc_stats)
\ No newline at end of file
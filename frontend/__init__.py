@@ -61,6 +61,14 @@ def create_app(app_name, env_name="default"):
 app = create_app("webrtc_stats")
 logger = create_logger("webrtc_stats")
 
+from .jobs import JobManager
+from .sessions import AnalyzerCache
+from .store import MetricStore
+sessions = AnalyzerCache(app.config['ANALYZER_CACHE_MB'] * 1024 * 1024)
+store = MetricStore(app, db)
+jobs = JobManager(app.config['UPLOAD_FOLDER'], app.config['ANALYSIS_WORKERS'], sessions,
+                  store if app.config['PERSIST_UPLOADS'] else None)
+
 
 
 
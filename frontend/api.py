@@ -0,0 +1,134 @@
+import io
+import math
+import numpy as np
+from flask import request, jsonify, Response
+from . import app, sessions, store
+from src.webrtc_stats import batch as ws_batch
+from src.webrtc_stats import downsample as ws_downsample
+
+ARROW_MIME_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def get_session(dump_hash):
+    session = sessions.get(dump_hash)
+    if not session:
+        return None, (jsonify({"error": "unknown dump {}".format(dump_hash)}), 404)
+    return session, None
+
+
+def to_json_values(values):
+    if values.dtype.kind == 'f':
+        # NaN is not valid JSON
+        return [None if math.isnan(value) else value for value in values.tolist()]
+    return values.tolist()
+
+
+def summarize_series(df):
+    values = df["value"].values
+    summary = {"count": len(values), "last": values[-1].item() if hasattr(values[-1], "item") else values[-1]}
+    if values.dtype.kind in 'iuf':
+        summary.update({"min": values.min().item(), "max": values.max().item(), "mean": float(values.mean())})
+    return summary
+
+
+@app.route('/api/v1/dumps/<dump_hash>')
+def get_dump(dump_hash):
+    session, error = get_session(dump_hash)
+    if error:
+        return error
+    with sessions.query(session):
+        summary = ws_batch.summarize_analyzer(session.analyzer)
+    summary.update({"hash": dump_hash, "bytes": session.size})
+    return jsonify(summary)
+
+
+@app.route('/api/v1/dumps/<dump_hash>/types/<stats_type>/ids')
+def get_stats_ids(dump_hash, stats_type):
+    session, error = get_session(dump_hash)
+    if error:
+        return error
+    with sessions.query(session):
+        ids = session.analyzer.get_stats_ids(stats_type)
+    return jsonify({"statsType": stats_type, "ids": [str(id) for id in ids]})
+
+
+@app.route('/api/v1/dumps/<dump_hash>/types/<stats_type>/summary')
+def get_type_summary(dump_hash, stats_type):
+    """min, max, mean and last value of every metric of a stats type"""
+    session, error = get_session(dump_hash)
+    if error:
+        return error
+    with sessions.query(session):
+        summary = session.type_summaries.get(stats_type)
+        if summary is None:
+            analyzer = session.analyzer
+            summary = {}
+            for id in analyzer.get_stats_ids(stats_type):
+                metrics = {}
+                for key in analyzer.get_stats_by_type_id(stats_type, id)["key"]:
+                    df = analyzer.get_media_stats().get(key)
+                    if df is not None and len(df) > 0:
+                        metrics[key[len(id) + 1:]] = summarize_series(df)
+                summary[str(id)] = metrics
+            session.add_type_summary(stats_type, summary)
+    return jsonify({"statsType": stats_type, "ids": summary})
+
+
+@app.route('/api/v1/dumps/<dump_hash>/series')
+def get_series(dump_hash):
+    """Samples of the metric id, name as timestamps in ms since epoch and values, format=json or arrow
+       points: downsample to about this number of samples with method lttb or minmax
+    """
+    stats_id, stats_name = request.args.get('id'), request.args.get('name')
+    if not stats_id or not stats_name:
+        return jsonify({"error": "id and name are required"}), 400
+    points = request.args.get('points', 0, type=int)
+    method = request.args.get('method', 'lttb')
+    if method not in ws_downsample.DOWNSAMPLE_METHODS:
+        return jsonify({"error": "method must be one of {}".format(ws_downsample.DOWNSAMPLE_METHODS)}), 400
+    session, error = get_session(dump_hash)
+    if error:
+        return error
+    with sessions.query(session):
+        df = session.analyzer.get_stats_values(stats_id, stats_name)
+    if len(df) == 0:
+        return jsonify({"error": "no samples of {}-{}".format(stats_id, stats_name)}), 404
+    df = ws_downsample.downsample(df, points, method)
+
+    timestamps = df["timestamp"].values.astype('datetime64[ms]').astype(np.int64)
+    values = df["value"].values
+    if request.args.get('format') == 'arrow':
+        try:
+            # only the arrow responses pay for importing pyarrow
+            import pyarrow as pa
+        except ImportError:
+            return jsonify({"error": "arrow format needs pyarrow"}), 406
+        table = pa.table({"timestamp": pa.array(timestamps, type=pa.timestamp('ms', tz='UTC')),
+                          "value": pa.array(values)})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue(), mimetype=ARROW_MIME_TYPE)
+
+    return jsonify({"id": stats_id, "name": stats_name,
+                    "timestamps": timestamps.tolist(), "values": to_json_values(values)})
+
+
+@app.route('/api/v1/store/dumps')
+def get_stored_dumps():
+    return jsonify({"dumps": store.list_dumps()})
+
+
+@app.route('/api/v1/store/samples')
+def get_stored_samples():
+    """Samples of the stored dumps by statsType, name, id, hash and time range (start, end in ms since epoch)"""
+    df = store.query_samples(stats_type=request.args.get('statsType'), name=request.args.get('name'),
+                             stats_id=request.args.get('id'), start=request.args.get('start', type=int),
+                             end=request.args.get('end', type=int), dump_hash=request.args.get('hash'),
+                             limit=request.args.get('limit', 100000, type=int))
+    return jsonify({column: df[column].tolist() for column in df.columns})
+
+
+@app.route('/api/v1/cache')
+def get_cache_info():
+    return jsonify(sessions.info())
@@ -2,6 +2,7 @@ from flask import Flask, render_template
 from . import app, logger
 from .forms import ToolForm, UploadForm
 from . import views
+from . import api
 import os
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -16,6 +16,11 @@ class Config:
     ADMIN_DEFAULT_EMAIL = os.environ.get('ADMIN_DEFAULT_EMAIL')
     ADMIN_DEFAULT_PASSWORD = os.environ.get('ADMIN_DEFAULT_PASSWORD')
     PAGE_SIZE = 20
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'uploads')
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(1 << 20)))
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', '2'))
+    ANALYZER_CACHE_MB = int(os.environ.get('ANALYZER_CACHE_MB', '1024'))
+    PERSIST_UPLOADS = os.environ.get('PERSIST_UPLOADS', 'true').lower() in ['true', 'on', '1']
 
     @staticmethod
     def init_app(app):
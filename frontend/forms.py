@@ -37,7 +37,7 @@ def get_stats_type_choices():
     return choices
 
 class UploadForm(FlaskForm):
-    script_file = FileField('Upload Script', validators=[FileAllowed(['txt'])])
+    script_file = FileField('Upload Script', validators=[FileAllowed(['txt', 'json', 'jsonl'])])
     submit_file = SubmitField('Upload')
 
 class ToolForm(FlaskForm):
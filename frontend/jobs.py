@@ -0,0 +1,194 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.webrtc_stats import analyzer as ws_analyzer
+from src.webrtc_stats import batch as ws_batch
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# finished jobs kept for polling, the oldest ones are forgotten first
+MAX_JOBS = 1000
+# bytes of the start of an upload kept in memory, e.g. for a preview, the spool may be removed by then
+HEAD_SIZE = 1 << 15
+
+
+class SpoolFile:
+    """Upload spooled to disk chunk by chunk, it can be read while it is still being written"""
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.size = 0
+        self.hash = None
+        self.head = b''
+        self._hasher = hashlib.blake2b(digest_size=16)
+        self._file = open(file_name, 'wb')
+        self._finished = False
+        self._error = None
+        self._condition = threading.Condition()
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._file.flush()
+        self._hasher.update(chunk)
+        if len(self.head) < HEAD_SIZE:
+            self.head += chunk[:HEAD_SIZE - len(self.head)]
+        with self._condition:
+            self.size += len(chunk)
+            self._condition.notify_all()
+
+    def close(self, error=None):
+        self._file.close()
+        with self._condition:
+            self.hash = self._hasher.hexdigest()
+            self._finished = True
+            self._error = error
+            self._condition.notify_all()
+
+    def wait_for(self, offset):
+        """Block until there are bytes after offset or the upload ended, return the spooled size"""
+        with self._condition:
+            while self.size <= offset and not self._finished:
+                self._condition.wait()
+            if self._error:
+                raise IOError(f"upload aborted: {self._error}")
+            return self.size
+
+    def open_reader(self):
+        return io.TextIOWrapper(io.BufferedReader(_SpoolReader(self)), encoding='utf_8')
+
+
+class _SpoolReader(io.RawIOBase):
+    def __init__(self, spool):
+        self._spool = spool
+        self._file = open(spool.file_name, 'rb')
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self._spool.wait_for(self._offset)
+        if size <= self._offset:
+            return 0
+        count = self._file.readinto(memoryview(buffer)[:size - self._offset])
+        self._offset += count
+        return count
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class AnalysisJob:
+    def __init__(self, job_id, filename, spool):
+        self.id = job_id
+        self.filename = filename
+        self.spool = spool
+        self.state = JOB_QUEUED
+        self.created = time.time()
+        self.seconds = None
+        self.summary = None
+        self.error = None
+        self.stored = False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "state": self.state,
+            "received": self.spool.size,
+            "hash": self.spool.hash,
+            "seconds": self.seconds,
+            "summary": self.summary,
+            "error": self.error,
+            "stored": self.stored,
+        }
+
+
+class JobManager:
+    """Analyze uploads in a background worker pool while they are received
+       The request thread only spools the body to disk, a worker parses it with the streaming reader
+    """
+    def __init__(self, upload_folder, workers=2, sessions=None, store=None):
+        self._upload_folder = upload_folder
+        # AnalyzerCache which keeps the parsed dumps for the queries
+        self._sessions = sessions
+        # MetricStore which persists the series of the parsed dumps
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, filename):
+        os.makedirs(self._upload_folder, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        spool = SpoolFile(os.path.join(self._upload_folder, job_id + ".txt"))
+        job = AnalysisJob(job_id, filename, spool)
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job)
+        return job
+
+    def receive(self, job, stream, chunk_size=1 << 20):
+        """Copy the stream to the spool of job, the worker reads it at the same time"""
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                job.spool.write(chunk)
+        except Exception as e:
+            job.spool.close(error=repr(e))
+            raise
+        job.spool.close()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        begin = time.time()
+        job.state = JOB_RUNNING
+        try:
+            analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+            with job.spool.open_reader() as fp:
+                analyzer.parse_stream(fp)
+            job.summary = ws_batch.summarize_analyzer(analyzer)
+            if self._sessions is not None:
+                self._sessions.put(job.spool.hash, job.spool.file_name, analyzer)
+            if self._store is not None:
+                self._store.save_analyzer(job.spool.hash, job.filename, job.spool.size, analyzer)
+                job.stored = True
+            job.state = JOB_DONE
+        except Exception as e:
+            job.error = repr(e)
+            job.state = JOB_FAILED
+        finally:
+            # the series of a stored upload are in the store and a failed one is of no use,
+            # without a store the upload is kept as the session of the dump is loaded again from it
+            if job.stored or job.state == JOB_FAILED:
+                self._remove_spool(job)
+        job.seconds = round(time.time() - begin, 3)
+
+    def _remove_spool(self, job):
+        if self._sessions is not None and job.spool.hash:
+            self._sessions.release_file(job.spool.hash, job.spool.file_name)
+        try:
+            os.remove(job.spool.file_name)
+        except OSError:
+            pass
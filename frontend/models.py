@@ -0,0 +1,52 @@
+from datetime import datetime
+from . import db
+
+
+class Dump(db.Model):
+    __tablename__ = 'dumps'
+    id = db.Column(db.Integer, primary_key=True)
+    hash = db.Column(db.String(32), unique=True, index=True, nullable=False)
+    filename = db.Column(db.String(256))
+    size = db.Column(db.BigInteger)
+    created = db.Column(db.DateTime, default=datetime.utcnow)
+    peer_connections = db.relationship('PeerConnection', backref='dump', lazy='dynamic',
+                                       cascade='all, delete-orphan')
+
+
+class PeerConnection(db.Model):
+    __tablename__ = 'peer_connections'
+    __table_args__ = (db.UniqueConstraint('dump_id', 'pc_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    dump_id = db.Column(db.Integer, db.ForeignKey('dumps.id', ondelete='CASCADE'), nullable=False)
+    pc_key = db.Column(db.String(64), nullable=False)
+    entries = db.relationship('StatsEntry', backref='peer_connection', lazy='dynamic',
+                              cascade='all, delete-orphan')
+
+
+class StatsEntry(db.Model):
+    """One metric (id-name) of a peer connection, text_value is set for the metrics of a single string value"""
+    __tablename__ = 'stats_entries'
+    __table_args__ = (
+        db.Index('ix_stats_entries_type_name', 'stats_type', 'name'),
+        db.Index('ix_stats_entries_id_name', 'stats_id', 'name'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    pc_id = db.Column(db.Integer, db.ForeignKey('peer_connections.id', ondelete='CASCADE'), nullable=False, index=True)
+    stats_id = db.Column(db.String(64), nullable=False)
+    name = db.Column(db.String(128), nullable=False)
+    stats_type = db.Column(db.String(32), nullable=False)
+    # ms since epoch
+    start_time = db.Column(db.BigInteger)
+    end_time = db.Column(db.BigInteger)
+    sample_count = db.Column(db.Integer, default=0)
+    text_value = db.Column(db.String(256))
+
+
+class Sample(db.Model):
+    """Samples clustered by (entry_id, seq), time is in ms since epoch"""
+    __tablename__ = 'samples'
+    __table_args__ = {'sqlite_with_rowid': False}
+    entry_id = db.Column(db.Integer, db.ForeignKey('stats_entries.id', ondelete='CASCADE'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    time = db.Column(db.BigInteger, nullable=False)
+    value = db.Column(db.Float, nullable=False)
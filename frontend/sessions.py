@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from src.webrtc_stats import analyzer as ws_analyzer
+
+
+class DumpSession:
+    """A parsed dump shared by the queries, the lock serializes them as the analyzer caches are not thread safe"""
+    def __init__(self, dump_hash, file_name, analyzer):
+        self.hash = dump_hash
+        self.file_name = file_name
+        self.analyzer = analyzer
+        self.lock = threading.Lock()
+        # per stats type summaries, computed once
+        self.type_summaries = {}
+        self._summary_bytes = 0
+        self.size = self.measure()
+
+    def add_type_summary(self, stats_type, summary):
+        self.type_summaries[stats_type] = summary
+        self._summary_bytes += len(json.dumps(summary))
+
+    def measure(self):
+        """bytes held now, the analyzer grows with the metrics decoded by the queries"""
+        return self.analyzer.memory_usage() + self._summary_bytes
+
+
+class AnalyzerCache:
+    """LRU cache of parsed dumps keyed by upload hash, the least recently used ones are evicted
+       when the total memory goes beyond max_bytes. An evicted dump is loaded again from its upload
+       through the parse cache next to it, so it is parsed at most once, unless the upload was released.
+    """
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._files = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        # dump hash -> lock of the thread which loads it, the others wait for it instead of parsing it again
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, dump_hash, file_name, analyzer):
+        session = DumpSession(dump_hash, file_name, analyzer)
+        with self._lock:
+            self._files[dump_hash] = file_name
+            previous = self._sessions.pop(dump_hash, None)
+            if previous:
+                self._size -= previous.size
+            self._sessions[dump_hash] = session
+            self._size += session.size
+            self._evict()
+        return session
+
+    def release_file(self, dump_hash, file_name):
+        """The upload of a dump is removed, once evicted the dump is not loaded again from it"""
+        with self._lock:
+            if self._files.get(dump_hash) == file_name:
+                del self._files[dump_hash]
+
+    def get(self, dump_hash):
+        """Session of a dump, None if the hash is unknown"""
+        with self._lock:
+            session = self._get_session(dump_hash)
+            if session:
+                return session
+            file_name = self._files.get(dump_hash)
+            if not file_name or not os.path.exists(file_name):
+                return None
+            loading = self._loading.setdefault(dump_hash, threading.Lock())
+
+        with loading:
+            with self._lock:
+                # loaded by another thread while this one waited
+                session = self._get_session(dump_hash)
+                if session:
+                    return session
+                self.misses += 1
+            try:
+                analyzer = ws_analyzer.WebrtcInternalsAnalyzer()
+                analyzer.parse(file_name, incremental=True, cache=True)
+                return self.put(dump_hash, file_name, analyzer)
+            finally:
+                with self._lock:
+                    self._loading.pop(dump_hash, None)
+
+    def _get_session(self, dump_hash):
+        session = self._sessions.get(dump_hash)
+        if session:
+            self._sessions.move_to_end(dump_hash)
+            self.hits += 1
+        return session
+
+    @contextmanager
+    def query(self, session):
+        """Serialize the queries of a session, its size is measured again afterwards
+           as they decode metrics and fill caches of the analyzer
+        """
+        with session.lock:
+            try:
+                yield session.analyzer
+            finally:
+                size = session.measure()
+        with self._lock:
+            if self._sessions.get(session.hash) is session:
+                self._size += size - session.size
+                self._evict()
+            session.size = size
+
+    def _evict(self):
+        # the most recent session is always kept, even if it alone is beyond max_bytes
+        while self._size > self._max_bytes and len(self._sessions) > 1:
+            _, session = self._sessions.popitem(last=False)
+            self._size -= session.size
+
+    def info(self):
+        with self._lock:
+            return {"dumps": len(self._sessions), "known": len(self._files), "bytes": self._size,
+                    "max_bytes": self._max_bytes, "hits": self.hits, "misses": self.misses}
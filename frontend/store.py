@@ -0,0 +1,179 @@
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+
+from src.webrtc_stats import analyzer_util
+from src.webrtc_stats import values_decoder
+from .models import Dump, PeerConnection, StatsEntry, Sample
+
+# rows of one executemany of the samples, when the database has no json_each
+SAMPLE_BATCH_SIZE = 200000
+# placeholder of the DBAPI paramstyles, sqlite is qmark
+PARAM_STYLES = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+# rows without one of these are not stored, they would be written as the string "nan"
+KEY_COLUMNS = ["pc", "id", "name"]
+
+
+def get_time_steps(start_times, end_times, counts):
+    """(start, step) in ms of every metric, the samples are evenly spread between start and end time
+       like the analyzer does, one second apart when the end time is unknown
+    """
+    starts = start_times.astype('datetime64[ns]').astype(np.int64)
+    ends = end_times.astype('datetime64[ns]').astype(np.int64)
+    return starts // 1000000, analyzer_util.get_sample_steps(starts, ends, counts) / 1e6
+
+
+class MetricStore:
+    """Persist the metric series of parsed dumps in the frontend database
+       dumps -> peer_connections -> stats_entries -> samples, inserted in bulk with executemany
+    """
+    def __init__(self, app, db):
+        self._app = app
+        self._db = db
+        self._schema_ready = False
+        # one dump is written at a time by a process, the entry ids are given by the database
+        self._lock = threading.Lock()
+
+    def _ensure_schema(self):
+        if not self._schema_ready:
+            self._db.create_all()
+            self._schema_ready = True
+
+    def save_analyzer(self, dump_hash, filename, size, analyzer):
+        """Write the series of a parsed dump, return the dump id, a dump already stored is skipped"""
+        with self._lock, self._app.app_context():
+            self._ensure_schema()
+            session = self._db.session
+            dump = session.execute(select(Dump).filter_by(hash=dump_hash)).scalar_one_or_none()
+            if dump:
+                return dump.id
+
+            dump = Dump(hash=dump_hash, filename=filename, size=size)
+            session.add(dump)
+            session.flush()
+
+            stats_df = analyzer.get_webrtc_stats()
+            if len(stats_df) == 0:
+                session.commit()
+                return dump.id
+
+            pcs = {}
+            for pc_key in stats_df["pc"].dropna().astype(str).unique():
+                pc = PeerConnection(dump_id=dump.id, pc_key=pc_key)
+                session.add(pc)
+                pcs[pc_key] = pc
+            session.flush()
+
+            decoded = analyzer.get_decoded_values()
+            counts = np.diff(decoded.offsets)
+            numeric = np.isin(decoded.kinds, values_decoder.NUMERIC_KINDS)
+            valid = stats_df[KEY_COLUMNS].notna().all(axis=1).values
+            counts[~numeric | ~valid] = 0
+
+            start_times = stats_df["startTime"].values
+            end_times = stats_df["endTime"].values
+            positions = np.flatnonzero(valid)
+            to_ms = lambda times: (times[positions].astype('datetime64[ns]').astype(np.int64) // 1000000).tolist()
+            to_str = lambda column: stats_df[column].astype(object).fillna("").astype(str).values[positions]
+
+            entries = []
+            for i, pc_key, stats_id, name, stats_type, start, end in zip(
+                    positions, to_str("pc"), to_str("id"), to_str("name"), to_str("statsType"),
+                    to_ms(start_times), to_ms(end_times)):
+                text_value = None
+                if decoded.kinds[i] == values_decoder.KIND_OBJECT:
+                    unique = set(map(str, decoded.objects[i]))
+                    text_value = unique.pop()[:256] if len(unique) == 1 else None
+                entries.append({"pc_id": pcs[pc_key].id, "stats_id": stats_id,
+                                "name": name, "stats_type": stats_type, "start_time": start if start > 0 else None,
+                                "end_time": end if end > 0 else None, "sample_count": int(counts[i]),
+                                "text_value": text_value})
+            entry_ids = np.zeros(len(stats_df), dtype=np.int64)
+            entry_ids[positions] = self._insert_entries(session, entries)
+
+            starts, steps = get_time_steps(start_times, end_times, counts)
+            cursor = session.connection().connection.cursor()
+            # the table of a binary dump has no "values" json to expand
+            if self._db.engine.dialect.name == "sqlite" and "values" in stats_df:
+                self._insert_samples_json(cursor, entry_ids, counts, starts, steps, stats_df["values"].values)
+            else:
+                self._insert_samples(cursor, entry_ids, counts, starts, steps, decoded.buffer[np.repeat(counts > 0, np.diff(decoded.offsets))])
+            cursor.close()
+            session.commit()
+            return dump.id
+
+    def _insert_entries(self, session, entries):
+        """ids of the inserted entries in their order, autoincremented by the database so that the workers
+           and processes which write dumps at the same time never collide
+        """
+        if not entries:
+            return []
+        if getattr(self._db.engine.dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+            statement = insert(StatsEntry).returning(StatsEntry.id, sort_by_parameter_order=True)
+            return session.scalars(statement, entries).all()
+        # without a bulk INSERT ... RETURNING, the ORM flush reads back the id of every row
+        rows = [StatsEntry(**entry) for entry in entries]
+        session.add_all(rows)
+        session.flush()
+        return [row.id for row in rows]
+
+    @staticmethod
+    def _insert_samples_json(cursor, entry_ids, counts, starts, steps, values_strs):
+        """sqlite expands the "values" json of a metric into its samples with json_each,
+           the rows are never built in python
+        """
+        statement = ("INSERT INTO {} (entry_id, seq, time, value) "
+                     "SELECT ?, key, ? + CAST(key * ? AS INTEGER), value FROM json_each(?)").format(Sample.__tablename__)
+        indexes = np.flatnonzero(counts)
+        cursor.executemany(statement, zip(entry_ids[indexes].tolist(), starts[indexes].tolist(),
+                                          steps[indexes].tolist(), values_strs[indexes]))
+
+    def _insert_samples(self, cursor, entry_ids, counts, starts, steps, values):
+        """plain DBAPI executemany of tuples, the ORM and core inserts spend most of their time per row"""
+        seqs = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        times = (np.repeat(starts, counts) + np.repeat(steps, counts) * seqs).astype(np.int64)
+        sample_entry_ids = np.repeat(entry_ids, counts)
+        statement = "INSERT INTO {} (entry_id, seq, time, value) VALUES ({})".format(
+            Sample.__tablename__, ", ".join([PARAM_STYLES.get(self._db.engine.dialect.paramstyle, "%s")] * 4))
+        for begin in range(0, len(values), SAMPLE_BATCH_SIZE):
+            end = begin + SAMPLE_BATCH_SIZE
+            cursor.executemany(statement, zip(sample_entry_ids[begin:end].tolist(), seqs[begin:end].tolist(),
+                                              times[begin:end].tolist(), values[begin:end].tolist()))
+
+    def query_samples(self, stats_type=None, name=None, stats_id=None, start=None, end=None, dump_hash=None,
+                      limit=None):
+        """Samples of the past dumps as a DataFrame: hash, pc, statsId, name, statsType, time (ms), value
+           start and end are ms since epoch, entries out of the time range are pruned before the samples
+        """
+        with self._app.app_context():
+            self._ensure_schema()
+            query = (select(Dump.hash, PeerConnection.pc_key.label("pc"), StatsEntry.stats_id.label("statsId"),
+                            StatsEntry.name, StatsEntry.stats_type.label("statsType"), Sample.time, Sample.value)
+                     .join(PeerConnection, PeerConnection.dump_id == Dump.id)
+                     .join(StatsEntry, StatsEntry.pc_id == PeerConnection.id)
+                     .join(Sample, Sample.entry_id == StatsEntry.id))
+            if dump_hash:
+                query = query.where(Dump.hash == dump_hash)
+            if stats_type:
+                query = query.where(StatsEntry.stats_type == stats_type)
+            if name:
+                query = query.where(StatsEntry.name == name)
+            if stats_id:
+                query = query.where(StatsEntry.stats_id == stats_id)
+            if start is not None:
+                query = query.where(StatsEntry.end_time >= start, Sample.time >= start)
+            if end is not None:
+                query = query.where(StatsEntry.start_time <= end, Sample.time <= end)
+            query = query.order_by(StatsEntry.id, Sample.seq)
+            if limit:
+                query = query.limit(limit)
+            return pd.read_sql(query, self._db.session.connection())
+
+    def list_dumps(self):
+        with self._app.app_context():
+            self._ensure_schema()
+            rows = self._db.session.execute(select(Dump.hash, Dump.filename, Dump.size, Dump.created)
+                                            .order_by(Dump.id)).all()
+            return [{"hash": hash, "filename": filename, "size": size, "created": created.isoformat()}
+                    for hash, filename, size, created in rows]
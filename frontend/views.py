@@ -1,8 +1,11 @@
-from flask import Flask, render_template
-from . import app, logger
+from flask import Flask, render_template, request, jsonify, url_for
+from werkzeug.utils import secure_filename
+from . import app, logger, jobs
 from .forms import ToolForm, UploadForm
 
-ALLOWED_EXTENSIONS = set(['txt', 'log', 'json'])
+ALLOWED_EXTENSIONS = set(['txt', 'log', 'json', 'jsonl'])
+# the input textarea of ToolForm takes up to 8192 characters
+INPUT_PREVIEW_SIZE = 8192
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -26,22 +29,49 @@ def tool():
 def upload_stats():
     upload_form = UploadForm()
     tool_form = ToolForm()
-    input_content = ""
     if upload_form.validate_on_submit():
         file = upload_form.script_file.data
         logger.info('filename={}'.format(file.filename))
         if file and allowed_file(file.filename):
-
-            file_content = file.read()
-            if file_content:
-                input_content = file_content.decode('UTF-8').strip()
-                tool_form.input_content.data = input_content
+            job = jobs.start(secure_filename(file.filename))
+            jobs.receive(job, file.stream, app.config['UPLOAD_CHUNK_SIZE'])
             file.close()
 
-            logger.info('File successfully uploaded: {}'.format(input_content))
+            # only the head of the dump fits in the textarea, the whole dump is analyzed by the job,
+            # which removes the spool once the dump is stored
+            preview = job.spool.head.decode('utf_8', errors='replace')
+            tool_form.input_content.data = preview[:INPUT_PREVIEW_SIZE]
+            logger.info('File successfully uploaded: {}, {} bytes, job {}'.format(file.filename, job.spool.size, job.id))
     else:
         logger.info(upload_form.errors)
 
+    return render_template('index.html', form=tool_form, upload_form=upload_form)
 
 
-    return render_template('index.html', form=tool_form, upload_form=upload_form)
+@app.route('/api/v1/uploads', methods=['POST'])
+def create_upload_job():
+    """Stream a dump into an analysis job, the body is the raw dump or a multipart form with a file
+       e.g. curl --data-binary @dump.txt "http://localhost:5000/api/v1/uploads?filename=dump.txt"
+    """
+    if request.files:
+        file = next(iter(request.files.values()))
+        filename, stream = file.filename, file.stream
+    else:
+        filename, stream = request.args.get('filename', 'webrtc_internals_dump.txt'), request.stream
+    if not allowed_file(filename):
+        return jsonify({"error": "unsupported file type {}".format(filename)}), 400
+
+    job = jobs.start(secure_filename(filename))
+    jobs.receive(job, stream, app.config['UPLOAD_CHUNK_SIZE'])
+    logger.info('upload {} received: {} bytes, job {}'.format(filename, job.spool.size, job.id))
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = url_for('get_upload_job', job_id=job.id)
+    return response, 202
+
+
+@app.route('/api/v1/uploads/<job_id>')
+def get_upload_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "unknown job {}".format(job_id)}), 404
+    return jsonify(job.to_dict())
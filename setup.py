@@ -8,4 +8,10 @@ setup(
     author_email='walter.fan@gmail.com',
     packages=find_packages(),
     install_requires=[],
+    extras_require={
+        # zstd compressed dumps, gzip and xz need nothing more
+        'zstd': ['zstandard==0.21.0'],
+        # --profile=pyinstrument, the stage report and --profile=cprofile need nothing more
+        'profile': ['pyinstrument==4.5.1'],
+    },
 )
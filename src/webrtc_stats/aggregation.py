@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from . import analyzer_util
+from .analyzer import WebrtcInternalsAnalyzer
+from .batch import DEFAULT_CHUNK_SIZE, DEFAULT_PATTERN, get_dump_files, time_limit
+
+logger = analyzer_util.get_logger(os.path.basename(__file__))
+
+# metrics of every stats type which are aggregated across dumps
+FLEET_METRICS = {
+    "candidate-pair": ["currentRoundTripTime", "availableOutgoingBitrate", "availableIncomingBitrate"],
+    "remote-inbound-rtp": ["roundTripTime", "jitter", "fractionLost"],
+    "inbound-rtp": ["jitter", "[packetsLost/s]", "[framesDecoded/s]", "framesPerSecond", "[bytesReceived_in_bits/s]"],
+    "outbound-rtp": ["[framesEncoded/s]", "framesPerSecond", "[bytesSent_in_bits/s]"],
+}
+
+# rates which are not in the dumps, derived from their cumulative counter
+DERIVED_RATES = {
+    "[packetsLost/s]": "packetsLost",
+}
+
+# stats types whose distinct ip addresses are counted
+CANDIDATE_TYPES = ["local-candidate", "remote-candidate"]
+
+DEFAULT_QUANTILES = [0.5, 0.95, 0.99]
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+DEFAULT_HLL_PRECISION = 14
+
+
+class _BinStore:
+    """Dense counts of consecutive sketch keys, the lowest keys are collapsed beyond max_bins"""
+    def __init__(self, max_bins):
+        self.max_bins = max_bins
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def _extend(self, low, high):
+        if len(self.counts) == 0:
+            new_low, new_high = low, high
+        else:
+            new_low, new_high = min(low, self.offset), max(high, self.offset + len(self.counts) - 1)
+        new_low = max(new_low, new_high - self.max_bins + 1)
+        if len(self.counts) and new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        if len(self.counts):
+            keys = np.arange(self.offset, self.offset + len(self.counts))
+            np.add.at(counts, np.maximum(keys, new_low) - new_low, self.counts)
+        self.offset, self.counts = new_low, counts
+
+    def add_counts(self, low, counts):
+        """counts[i] is the count of key low + i"""
+        if len(counts) == 0:
+            return
+        self._extend(low, low + len(counts) - 1)
+        keys = np.maximum(np.arange(low, low + len(counts)), self.offset) - self.offset
+        np.add.at(self.counts, keys, counts)
+
+    def add(self, keys):
+        if len(keys) == 0:
+            return
+        low = int(keys.min())
+        self.add_counts(low, np.bincount(keys - low))
+
+    def merge(self, other):
+        self.add_counts(other.offset, other.counts)
+
+    def key_at_rank(self, rank):
+        return self.offset + int(np.searchsorted(np.cumsum(self.counts), rank, side='right'))
+
+
+class DDSketch:
+    """Quantiles with a relative accuracy, mergeable and bounded by max_bins per sign
+       see DDSketch: A Fast and Fully-Mergeable Quantile Sketch with Relative-Error Guarantees
+    """
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # values of smaller magnitude are counted as zero
+        self._min_indexable = 1e-9
+        self.positive = _BinStore(max_bins)
+        self.negative = _BinStore(max_bins)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _keys(self, values):
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.positive.add(self._keys(values[values > self._min_indexable]))
+        self.negative.add(self._keys(-values[values < -self._min_indexable]))
+        self.zero_count += int(np.count_nonzero(np.abs(values) <= self._min_indexable))
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches of a different relative accuracy")
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        negative_count = self.negative.count
+        if rank < negative_count:
+            value = -self._value(self.negative.key_at_rank(negative_count - 1 - rank))
+        elif rank < negative_count + self.zero_count:
+            value = 0.0
+        else:
+            value = self._value(self.positive.key_at_rank(rank - negative_count - self.zero_count))
+        return min(max(value, self.min), self.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+class HyperLogLog:
+    """Approximate count of distinct items in 2^precision registers, merged by register max"""
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @staticmethod
+    def _hash(item):
+        return int.from_bytes(hashlib.blake2b(str(item).encode('utf_8'), digest_size=8).digest(), 'big')
+
+    def add(self, items):
+        hashes = np.fromiter((self._hash(item) for item in items), dtype=np.uint64)
+        if len(hashes) == 0:
+            return
+        width = 64 - self.precision
+        indexes = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # rank = position of the leftmost 1 bit of the rest, the rest fits a float64 exactly
+        bit_lengths = np.frexp(rest.astype(np.float64))[1]
+        ranks = (width - bit_lengths + 1).astype(np.uint8)
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("cannot merge HyperLogLog of a different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def cardinality(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # linear counting of the small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class FleetAggregate:
+    """Sketches of the fleet metrics grouped by (statsType, metric, codec) and distinct candidate ips
+       Its memory does not depend on the number of dumps, aggregates of workers are merged
+    """
+    def __init__(self, metrics=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.metrics = metrics or FLEET_METRICS
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+        self.candidate_ips = {statsType: HyperLogLog() for statsType in CANDIDATE_TYPES}
+        self.dumps = 0
+        self.errors = 0
+
+    def _get_sketch(self, statsType, metric, codec):
+        key = (statsType, metric, codec)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = DDSketch(self.relative_accuracy)
+        return sketch
+
+    @staticmethod
+    def _get_codec(analyzer, stats_id):
+        codec_id = analyzer.get_unique_value(stats_id, "codecId")
+        if not codec_id:
+            return ""
+        return analyzer.get_unique_value(codec_id, "mimeType") or ""
+
+    @staticmethod
+    def _get_values(analyzer, stats_id, metric):
+        counter = DERIVED_RATES.get(metric)
+        if counter is None:
+            df = analyzer.get_stats_values(stats_id, metric)
+            return df["value"].values if len(df) and df["value"].dtype.kind in 'iufb' else []
+
+        df = analyzer.get_stats_values(stats_id, counter)
+        if len(df) < 2 or df["value"].dtype.kind not in 'iuf':
+            return []
+        seconds = np.diff(df["timestamp"].values.astype('datetime64[ns]').astype(np.int64)) / 1e9
+        deltas = np.diff(df["value"].values.astype(np.float64))
+        valid = seconds > 0
+        return np.maximum(deltas[valid] / seconds[valid], 0)
+
+    def add_analyzer(self, analyzer):
+        for statsType, metrics in self.metrics.items():
+            for stats_id in analyzer.get_stats_ids(statsType):
+                codec = self._get_codec(analyzer, stats_id) if statsType.endswith("bound-rtp") else ""
+                for metric in metrics:
+                    values = self._get_values(analyzer, stats_id, metric)
+                    if len(values):
+                        self._get_sketch(statsType, metric, codec).add(values)
+
+        for statsType, hll in self.candidate_ips.items():
+            ips = [analyzer.get_unique_value(stats_id, "ip") for stats_id in analyzer.get_stats_ids(statsType)]
+            hll.add(ip for ip in ips if ip)
+        self.dumps += 1
+
+    def add_dump(self, file_name, timeout=None):
+        try:
+            with time_limit(timeout):
+                analyzer = WebrtcInternalsAnalyzer()
+                analyzer.parse(file_name, incremental=True)
+                self.add_analyzer(analyzer)
+        except Exception as e:
+            logger.warning(f"fail to aggregate {file_name}: {e!r}")
+            self.errors += 1
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        for statsType, hll in other.candidate_ips.items():
+            self.candidate_ips[statsType].merge(hll)
+        self.dumps += other.dumps
+        self.errors += other.errors
+
+    def get_percentiles(self, quantiles=DEFAULT_QUANTILES):
+        """One record per (statsType, metric, codec): count, min, mean, max and the quantiles"""
+        records = []
+        for (statsType, metric, codec), sketch in sorted(self.sketches.items()):
+            record = {"statsType": statsType, "metric": metric, "codec": codec, "count": sketch.count,
+                      "min": sketch.min, "mean": sketch.mean, "max": sketch.max}
+            for q in quantiles:
+                record[f"p{q * 100:g}"] = sketch.quantile(q)
+            records.append(record)
+        return records
+
+    def get_distinct_ips(self):
+        return {statsType: hll.cardinality() for statsType, hll in self.candidate_ips.items()}
+
+
+def aggregate_chunk(file_names, timeout=None, metrics=None):
+    aggregate = FleetAggregate(metrics)
+    for file_name in file_names:
+        aggregate.add_dump(file_name, timeout)
+    return aggregate
+
+
+def aggregate_dumps(path, pattern=DEFAULT_PATTERN, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, timeout=None,
+                    metrics=None):
+    """Aggregate the fleet metrics of a directory or a glob of dumps in a process pool
+       every chunk of dumps returns one FleetAggregate, which is merged as soon as it completes
+    """
+    file_names = get_dump_files(path, pattern)
+    logger.info(f"aggregate {len(file_names)} dumps of {path}")
+    aggregate = FleetAggregate(metrics)
+    chunks = [file_names[i:i + chunk_size] for i in range(0, len(file_names), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(aggregate_chunk, chunk, timeout, metrics) for chunk in chunks]
+        for future in as_completed(futures):
+            aggregate.merge(future.result())
+    return aggregate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', action='store', dest='path', required=True,
+                        help='directory or glob of webrtc dump files')
+    parser.add_argument('-p', action='store', dest='pattern', default=DEFAULT_PATTERN,
+                        help='file pattern inside the directory')
+    parser.add_argument('-w', action='store', dest='workers', type=int, default=None,
+                        help='number of worker processes, default is the number of cpus')
+    parser.add_argument('-t', action='store', dest='timeout', type=float, default=None,
+                        help='timeout in seconds of each dump')
+    args = parser.parse_args()
+
+    begin = time.time()
+    aggregate = aggregate_dumps(args.path, args.pattern, args.workers, timeout=args.timeout)
+    elapsed = time.time() - begin
+    for record in aggregate.get_percentiles():
+        print(record)
+    print("distinct ips:", aggregate.get_distinct_ips())
+    print(f"{aggregate.dumps} dumps, {aggregate.errors} errors in {elapsed:.2f} seconds")
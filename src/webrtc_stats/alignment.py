@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+from . import analyzer_util
+from . import values_decoder
+
+# step of the shared time grid, webrtc internals samples getStats() every second
+DEFAULT_INTERVAL = pd.Timedelta(seconds=1)
+# without an explicit tolerance, a grid point takes a sample at most this many sampling steps old
+DEFAULT_TOLERANCE_STEPS = 1.5
+
+def to_ns(times):
+    """int64 ns since epoch of datetime64 or tz aware times, NaT is int64 min"""
+    times = pd.DatetimeIndex(np.atleast_1d(times))
+    if times.tz is not None:
+        times = times.tz_convert(None)
+    return times.values.astype('datetime64[ns]').astype(np.int64)
+
+
+def align_series(grid, times, values, offsets, tolerances):
+    """As-of join of series on a time grid: one column per series, a grid point takes the last sample
+       at or before it if it is at most tolerance ns older, NaN otherwise
+       series i is times[offsets[i]:offsets[i+1]], values[offsets[i]:offsets[i+1]], its times sorted
+       return a (grid, series) float64 matrix, allocated once and filled column by column
+    """
+    columns = len(offsets) - 1
+    # column major, so that every column is contiguous and the DataFrame over it is not copied
+    matrix = np.full((columns, len(grid)), np.nan)
+    for column in range(columns):
+        begin, end = offsets[column], offsets[column + 1]
+        if begin == end:
+            continue
+        series_times = times[begin:end]
+        indexes = np.searchsorted(series_times, grid, side='right') - 1
+        valid = indexes >= 0
+        indexes = np.maximum(indexes, 0)
+        valid &= grid - series_times[indexes] <= tolerances[column]
+        matrix[column, valid] = values[begin + indexes[valid]]
+    return matrix.T
+
+
+def align_stats(stats_df, decoded, positions, labels, interval=DEFAULT_INTERVAL, start=None, end=None,
+                tolerance=None, as_matrix=False):
+    """Wide frame of the metrics at row positions of the stats table on one time grid from start to end,
+       by default the time range of the metrics, one column per label
+       decoded: DecodedValues of the whole stats table
+       as_matrix: return (grid as datetime64[ns] UTC, matrix, labels) instead of a DataFrame
+    """
+    # a position of -1 is a metric which is not in the dump, its column stays NaN
+    positions = np.asarray(positions, dtype=np.intp)
+    found = positions >= 0
+    # the table is indexed at row 0 for them and masked with found, an empty table is not indexed at all
+    safe = np.where(found, positions, 0)
+    counts = np.zeros(len(positions), dtype=np.int64)
+    starts = np.full(len(positions), analyzer_util.NAT_NS, dtype=np.int64)
+    ends = starts.copy()
+    if found.any():
+        # strings can not be aligned, their column stays NaN
+        numeric = found & np.isin(decoded.kinds[safe], values_decoder.NUMERIC_KINDS)
+        counts = np.where(numeric, decoded.offsets[safe + 1] - decoded.offsets[safe], 0)
+        starts = np.where(found, to_ns(stats_df["startTime"].values[safe]), starts)
+        ends = np.where(found, to_ns(stats_df["endTime"].values[safe]), ends)
+    offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    # gather the samples of the columns from the flat buffer in one take
+    seqs = np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+    values = decoded.buffer[np.repeat(decoded.offsets[safe], counts) + seqs]
+
+    times, steps = analyzer_util.get_sample_times(starts, ends, counts)
+    if tolerance is None:
+        tolerances = steps * DEFAULT_TOLERANCE_STEPS
+    else:
+        tolerances = np.full(len(positions), pd.Timedelta(tolerance).value)
+
+    interval = pd.Timedelta(interval).value
+    has_samples = counts > 0
+    if not has_samples.any():
+        # nothing to align, whatever the time range
+        grid = np.array([], dtype=np.int64)
+    else:
+        start = starts[has_samples].min() if start is None else to_ns(pd.Timestamp(start))[0]
+        end = times[offsets[1:][has_samples] - 1].max() if end is None else to_ns(pd.Timestamp(end))[0]
+        grid = np.arange(start, max(start, end) + 1, interval, dtype=np.int64)
+
+    matrix = align_series(grid, times, values, offsets, tolerances)
+    grid = grid.astype('datetime64[ns]')
+    if as_matrix:
+        return grid, matrix, list(labels)
+    return pd.DataFrame(matrix, index=pd.DatetimeIndex(grid, tz='UTC', name="timestamp"), columns=list(labels),
+                        copy=False)
@@ -1,34 +1,51 @@
 #!/usr/bin/env python3
 
 import argparse
-from copy import deepcopy
-from datetime import datetime, timedelta
+from datetime import timedelta
 import os
 import json
-import matplotlib.pyplot as plt
-from matplotlib import dates
-from pytz import timezone
+from collections import OrderedDict
+from collections.abc import Mapping
 import numpy as np
 import pandas as pd
 from ast import literal_eval
-from tabulate import tabulate
 from . import analyzer_util
+from . import stream_parser
+from .stats_index import StatsIndex
+from . import values_decoder
+
+# imported when they are used, a query of a cached dump does not need the parsers, live store or alignment
+alignment = analyzer_util.lazy_module(f"{__package__}.alignment")
+binary_dump = analyzer_util.lazy_module(f"{__package__}.binary_dump")
+compression = analyzer_util.lazy_module(f"{__package__}.compression")
+dump_formats = analyzer_util.lazy_module(f"{__package__}.dump_formats")
+event_timeline = analyzer_util.lazy_module(f"{__package__}.event_timeline")
+live_store = analyzer_util.lazy_module(f"{__package__}.live_store")
+parse_cache = analyzer_util.lazy_module(f"{__package__}.parse_cache")
+profiling = analyzer_util.lazy_module(f"{__package__}.profiling")
 
 logger = analyzer_util.get_logger(os.path.basename(__file__))
 
+# max number of decoded metrics kept by LazyMediaStats
+MEDIA_STATS_CACHE_SIZE = 1024
+
+# columns of _webrtc_stats stored as categorical and as datetime64
+CATEGORY_COLUMNS = ["key", "pc", "id", "name", "statsType"]
+TIME_COLUMNS = ["startTime", "endTime"]
+
 def getWebrtcStatsTypes():
     statsTypes = "inbound-rtp,outbound-rtp,remote-inbound-rtp,transport,candidate-pair,local-candidate,remote-candidate"
     return statsTypes.split(',')
 
-def generate_time_series(start_time, num_points, interval=timedelta(seconds=1)):
-    timestamps = []
-    current_time = start_time
-
-    for _ in range(num_points):
-        timestamps.append(current_time)
-        current_time += interval
-
-    return timestamps
+def generate_time_series(start_time, num_points, end_time=None, interval=timedelta(seconds=1)):
+    """numpy.datetime64 timestamps of num_points samples spread evenly from start_time to end_time
+       the fixed interval is only used when end_time is unknown or not after start_time
+    """
+    start = np.datetime64(start_time, 'ns').astype(np.int64)
+    end = np.datetime64(end_time, 'ns').astype(np.int64) if end_time is not None else analyzer_util.NAT_NS
+    step = np.timedelta64(interval).astype('timedelta64[ns]').astype(np.int64)
+    times, _ = analyzer_util.get_sample_times([start], [end], [num_points], step)
+    return times.astype('datetime64[ns]')
 
 def create_df_from_values(row):
     df = pd.DataFrame()
@@ -52,36 +69,166 @@ def create_df_from_values(row):
         #print("all is zero")
         return df
 
-    time_points = generate_time_series(analyzer_util.str2time(row["startTime"]), len(values))
-    df =  pd.DataFrame()
-    df["timestamp"] = time_points
-    df["value"] = values
+    return create_series_df(row["startTime"], values, row.get("endTime"))
+
+def create_series_df(start_time, values, end_time=None):
+    start_time = analyzer_util.to_datetime64(start_time)
+    end_time = analyzer_util.to_datetime64(end_time) if end_time is not None else None
+    time_points = generate_time_series(start_time, len(values), end_time)
+    # values may be a view of a memory mapped binary dump, it is not copied
+    return pd.DataFrame({"timestamp": pd.DatetimeIndex(time_points, tz='UTC'), "value": values}, copy=False)
+
+def split_stats_key(statKey):
+    """(id, name) of a stats key "id-name", the id may contain dashes, the metric name never does"""
+    stats_id, _, name = statKey.rpartition("-")
+    return stats_id, name
+
+def create_stats_item(pcKey, statKey, statDict):
+    statsItem = {}
+    statsItem["key"] = statKey
+    statsItem["pc"] = pcKey
+    if "-" in statKey:
+        statsItem["id"], statsItem["name"] = split_stats_key(statKey)
+
+    statsItem.update(statDict)
+    return statsItem
+
+def create_stats_table(statsItems):
+    """Compact table of stats items, ids and names are categorical and the times are datetime64"""
+    df = pd.DataFrame.from_records(statsItems)
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    for column in TIME_COLUMNS:
+        if column in df:
+            df[column] = pd.to_datetime(df[column], utc=True, errors='coerce').astype('datetime64[ns, UTC]')
     return df
 
+class LazyMediaStats(Mapping):
+    """Media stats of metrics key (id-name) to "timestamp, value" DataFrame
+       A metric is decoded only when it is first asked for, decoded metrics are kept in a LRU cache
+    """
+    def __init__(self, statsDf, cache_size=MEDIA_STATS_CACHE_SIZE, decoded=None):
+        self._cache_size = cache_size
+        # values of the whole table which are already decoded, e.g. loaded from the parse cache or a binary dump
+        self._decoded = decoded
+        self._cache = OrderedDict()
+        self._empty_keys = set()
+        self._non_empty_keys = None
+        if len(statsDf) == 0:
+            self._positions = {}
+            return
+        self._values = statsDf["values"].values if "values" in statsDf else None
+        self._start_times = statsDf["startTime"].values
+        self._end_times = statsDf["endTime"].values
+        # the last one wins for duplicated keys, same as get_metrics_values
+        self._positions = {key: i for i, key in enumerate(statsDf["key"].values)}
+
+    def _decode(self, key):
+        position = self._positions[key]
+        if self._decoded is not None:
+            values = self._decoded.get_values(position)
+        else:
+            values = values_decoder.decode_values([self._values[position]]).get_values(0)
+        if values is None:
+            return None
+        return create_series_df(self._start_times[position], values, self._end_times[position])
+
+    def __getitem__(self, key):
+        df = self._cache.get(key)
+        if df is not None:
+            self._cache.move_to_end(key)
+            return df
+
+        if key not in self._positions or key in self._empty_keys:
+            raise KeyError(key)
+
+        df = self._decode(key)
+        if df is None:
+            self._empty_keys.add(key)
+            raise KeyError(key)
+
+        self._cache[key] = df
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return df
+
+    def _get_non_empty_keys(self):
+        if self._non_empty_keys is None:
+            if self._decoded is not None:
+                kinds = self._decoded.kinds
+                self._non_empty_keys = [key for key, position in self._positions.items()
+                                        if kinds[position] not in (values_decoder.KIND_EMPTY, values_decoder.KIND_ZERO)]
+            else:
+                keys = list(self._positions.keys())
+                decoded = values_decoder.decode_values(self._values[self._positions[key]] for key in keys)
+                self._non_empty_keys = [keys[i] for i in decoded.non_empty_indexes()]
+        return self._non_empty_keys
+
+    def __iter__(self):
+        return iter(self._get_non_empty_keys())
+
+    def __len__(self):
+        return len(self._get_non_empty_keys())
+
+    def cache_info(self):
+        return {"cached": len(self._cache), "max_size": self._cache_size, "empty": len(self._empty_keys)}
+
+    def memory_usage(self):
+        """bytes of the cached metrics, the decoded values are counted by the analyzer"""
+        return sum(int(df.memory_usage().sum()) for df in self._cache.values())
+
 class WebrtcInternalsAnalyzer:
     """Analyze WebRTC Internals
        Put webrtc stats into pandas DataFrame
     """
-    def __init__(self):
+    def __init__(self, cache_size=MEDIA_STATS_CACHE_SIZE, live_window=None, profile=False,
+                 log_utc_offset=None):
 
         self._webrtc_internals = {}
+        self._cache_size = cache_size
+        # samples per metric kept by the live store, live_store.DEFAULT_WINDOW when None
+        self._live_window = live_window
+        # chrome's update log times are the local time of the browser, e.g. "+02:00", inferred when None
+        self._log_utc_offset = log_utc_offset
 
         # a data frame: key (id-name), values, statsType, startTime, endTime
         self._webrtc_stats = pd.DataFrame()
-        self._webrtc_events = pd.DataFrame()
+        # update log events of all peer connections, time sorted: time, pc, type, value
+        self._event_timeline = event_timeline.EventTimeline()
+        self._webrtc_events = self._event_timeline.get_events()
 
-        # dict of array for media stats
+        # dict of array for media stats, only kept until _webrtc_stats is built
         self._pc_stats = []
-        # dict of array for media events
-        self._pc_events = []
+        # raw update log entries of all peer connections as column lists, kept for the parse cache
+        self._pc_events = event_timeline.new_event_columns()
+
+        # row positions of _webrtc_stats by statsType, id and name
+        self._stats_index = StatsIndex(self._webrtc_stats)
+
+        # values of the whole table: DecodedValues of the parse cache or decoded on demand, or a BinaryDump
+        self._decoded = None
 
         # key is metrics id-name, values is a dataframe: "timestamp, value"
+        # a LazyMediaStats unless the dump is parsed with lazy=False, the LiveStatsStore of ingested snapshots
         self._media_stats = {}
 
+        # rolling store of ingested getStats() snapshots, also the index of the live stats,
+        # the table of their metadata and times is rebuilt from it when it is asked for
+        self._live_store = None
+        self._live_snapshot_count = 0
+
+        # wall and cpu time of the pipeline stages when profile is set, a no-op otherwise
+        self._profiler = profiling.StageProfiler() if profile else profiling.NULL_PROFILER
+
     def get_webrtc_stats(self):
+        self._refresh_live_stats()
         return self._webrtc_stats
 
-    def get_media_stats(self):
+    def get_media_stats(self, decode_all=False):
+        """decode_all: return a plain dict with every metric decoded"""
+        if decode_all and isinstance(self._media_stats, LazyMediaStats):
+            return self.get_metrics_values(self._webrtc_stats, self.get_decoded_values())
         return self._media_stats
 
     def get_stats_values(self, stats_id, stats_name):
@@ -93,45 +240,110 @@ class WebrtcInternalsAnalyzer:
 
         return df
 
+    def get_decoded_values(self):
+        """DecodedValues of the whole stats table, metric i is row i of get_webrtc_stats()
+           from the parse cache or a binary dump, otherwise the values are decoded once and kept
+        """
+        self._refresh_live_stats()
+        if not isinstance(self._decoded, values_decoder.DecodedValues):
+            if self._live_store is not None:
+                self._decoded = self._live_store.get_decoded_values()
+            elif self._decoded is not None:
+                # a BinaryDump
+                self._decoded = self._decoded.to_decoded()
+            else:
+                with self._profiler.stage("decode_values") as counts:
+                    self._decoded = values_decoder.decode_values(self._webrtc_stats.get("values", []))
+                    counts["records"] = len(self._webrtc_stats)
+        return self._decoded
+
     def get_webrtc_events(self):
-        return self.get_webrtc_events
+        return self._webrtc_events
+
+    def get_profile(self):
+        """per stage report of an analyzer created with profile=True: stage, calls, wall_seconds, cpu_seconds,
+           records, bytes and peak_rss_mb, empty without profiling
+        """
+        return self._profiler.report()
+
+    def get_event_timeline(self):
+        return self._event_timeline
+
+    def get_event_columns(self):
+        """raw update log entries as column lists: time, pc, type, value"""
+        return self._pc_events
+
+    def get_events(self, start=None, end=None, pc=None, type=None):
+        """update log events in [start, end], optionally of one peer connection and one event type"""
+        return self._event_timeline.get_window(start, end, pc, type)
 
     def get_stats_ids(self, statsType):
-        media_stats = self._webrtc_stats[self._webrtc_stats["statsType"] == statsType]
-        metrics_ids = pd.unique(media_stats["id"])
-        return metrics_ids
+        return self._stats_index.get_ids(statsType)
 
-    def get_metrics_values(self, statsDf):
+    def get_metrics_values(self, statsDf, decoded=None):
         media_stats = {}
-        for index, row in statsDf.iterrows():
-            df = create_df_from_values(row)
-            if len(df) > 0:
-                media_stats[row['key']] = df
+        if len(statsDf) == 0:
+            return media_stats
+
+        with self._profiler.stage("metrics_values") as counts:
+            if decoded is None:
+                decoded = values_decoder.decode_values(statsDf["values"])
+            keys = statsDf["key"].values
+            start_times = statsDf["startTime"].values
+            end_times = statsDf["endTime"].values
+            for index in decoded.non_empty_indexes():
+                media_stats[keys[index]] = create_series_df(start_times[index], decoded.get_values(index),
+                                                            end_times[index])
+            counts["records"] = len(media_stats)
         return media_stats
 
+    def get_positions_by_type_name(self, statsType, statsName):
+        """row positions of the metrics in get_webrtc_stats() and get_decoded_values()"""
+        return self._stats_index.get_positions_by_type_name(statsType, statsName)
+
     def get_stats_by_type_name(self, statsType, statsName):
-        filter1 = self._webrtc_stats["statsType"] == statsType
-        filter2 = self._webrtc_stats["name"] == statsName
-        ret = self._webrtc_stats[filter1 & filter2][["key", "values", "startTime", "endTime"]]
-        return ret
+        return self._stats_index.get_by_type_name(statsType, statsName)
 
     def get_stats_by_id_name(self, id, name):
-        filter1 = self._webrtc_stats["name"] == name
-        filter2 = self._webrtc_stats["id"] == id
-        ret = self._webrtc_stats[filter1 & filter2][["key", "values", "startTime", "endTime"]]
-        return ret
+        return self._stats_index.get_by_id_name(id, name)
 
     def get_stats_by_type_id(self, statsType, statsId):
-        filter1 = self._webrtc_stats["statsType"] == statsType
-        filter2 = self._webrtc_stats["id"] == statsId
-        ret = self._webrtc_stats[filter1 & filter2][["key", "values", "startTime", "endTime"]]
-        return ret
-
+        return self._stats_index.get_by_type_id(statsType, statsId)
+
+
+    def get_aligned_stats(self, keys, interval=None, start=None, end=None, tolerance=None,
+                          as_matrix=False):
+        """Metrics of keys in one wide frame on a shared time grid, one column per key, NaN where there is no sample
+           keys: "id-name" strings, (id, name) or (pc, id, name) tuples, e.g. of several stats ids and peer connections
+           a grid point takes the last sample at or before it, at most tolerance old (1.5 sampling steps by default)
+           interval: step of the grid, alignment.DEFAULT_INTERVAL when None
+           as_matrix: return (grid, matrix, labels) with the numpy matrix of (grid points, keys)
+        """
+        if interval is None:
+            interval = alignment.DEFAULT_INTERVAL
+        stats_df = self.get_webrtc_stats()
+        positions = []
+        labels = []
+        for key in keys:
+            if isinstance(key, str):
+                pc, (stats_id, stats_name) = None, split_stats_key(key)
+                labels.append(key)
+            else:
+                pc, stats_id, stats_name = key if len(key) == 3 else (None, *key)
+                labels.append(f"{stats_id}-{stats_name}" if pc is None else f"{pc}/{stats_id}-{stats_name}")
+            candidates = self._stats_index.get_positions_by_id_name(stats_id, stats_name)
+            if pc is not None:
+                candidates = candidates[stats_df["pc"].values[candidates] == pc]
+            # the last one wins for the same metric in several peer connections, as in get_stats_values
+            positions.append(candidates[-1] if len(candidates) else -1)
+        return alignment.align_stats(stats_df, self.get_decoded_values(), positions, labels, interval, start, end,
+                                     tolerance, as_matrix)
 
     def get_unique_value(self, stats_id, stats_name):
 
-        stats_df = self.get_stats_by_id_name(stats_id, stats_name)
-        values_df = create_df_from_values(stats_df.squeeze())
+        values_df = self.get_stats_values(stats_id, stats_name)
+        if len(values_df) == 0:
+            return None
         stats_values = pd.unique(values_df["value"])
         if len(stats_values) == 1:
             stats_value = stats_values[0]
@@ -139,53 +351,178 @@ class WebrtcInternalsAnalyzer:
 
         return None
 
-    def parse(self, file_name):
-        with open(file_name, 'r', encoding='utf_8') as f:
-            logger.info(f"open {file_name}")
+    def memory_usage(self):
+        """Approximate bytes held by the parsed dump: stats table, events and decoded metrics"""
+        usage = int(self._webrtc_stats.memory_usage(deep=True).sum())
+        usage += self._event_timeline.memory_usage()
+        if self._decoded is not None:
+            usage += self._decoded.memory_usage()
+        if isinstance(self._media_stats, LazyMediaStats):
+            usage += self._media_stats.memory_usage()
+        elif isinstance(self._media_stats, dict):
+            usage += sum(int(df.memory_usage().sum()) for df in self._media_stats.values())
+        return usage
+
+    def ingest(self, snapshot, pc="live"):
+        """Append a getStats() snapshot (RTCStatsReport as JSON) of a running session
+           samples are kept in ring buffers of live_window samples per metric
+        """
+        if self._live_store is None:
+            window = self._live_window if self._live_window is not None else live_store.DEFAULT_WINDOW
+            self._live_store = live_store.LiveStatsStore(window)
+            self._media_stats = self._live_store
+            self._stats_index = self._live_store
+        self._live_store.ingest(snapshot, pc)
+
+    def _refresh_live_stats(self):
+        """the live stats table for the queries of the whole table: metadata and times of the window in the
+           rows of the live store positions, without "values", the samples come from get_decoded_values
+        """
+        if self._live_store is None or self._live_snapshot_count == self._live_store.snapshot_count:
+            return
+        self._webrtc_stats = create_stats_table(self._live_store.get_stats_records(values=False))
+        self._decoded = None
+        self._live_snapshot_count = self._live_store.snapshot_count
+
+    def parse(self, file_name, incremental=False, lazy=True, cache=False):
+        """Parse webrtc internals dump file
+           incremental: walk the dump with a streaming reader instead of json.load,
+           the raw dump is not kept in self._webrtc_internals
+           lazy: decode the metrics values on demand, otherwise decode everything now
+           cache: load the parsed dump from its cache next to the file, or write that cache
+           a gzip, zstd or xz compressed dump is decompressed while it is read and always parsed incrementally
+        """
+        with self._profiler.stage("parse") as counts:
+            self._parse(file_name, incremental, lazy, cache)
+            counts["records"] = len(self._webrtc_stats)
+            counts["bytes"] = os.path.getsize(file_name)
+
+    def _parse(self, file_name, incremental, lazy, cache):
+        if binary_dump.is_binary_dump(file_name):
+            self.load_binary(file_name, lazy)
+            return
+        if cache and self.load_cache(file_name, lazy):
+            return
+
+        file_compression = compression.detect_compression(file_name)
+        incremental = incremental or file_compression is not None
+        with compression.open_text(file_name, file_compression) as f:
+            dump_format, f = dump_formats.detect_format(f)
+            logger.info(f"open {file_name}, {dump_format.name} format" +
+                        (f", {file_compression} compressed" if file_compression else ""))
             self._webrtc_internals = {}
-            try:
-                self._webrtc_internals = json.load(f)
-            except:
-                logger.errror('not a json file {}'.format(file_name))
-
-            for pcKey, pcValue in self._webrtc_internals['PeerConnections'].items():
-                pcStats = pcValue["stats"]
-
-                for itemKey, itemDict in pcValue.items():
-
-                    if itemKey == "stats":
-
-                        for statKey, statDict in itemDict.items():
-                            statsItem = {}
-                            statsItem["key"] = statKey
-                            statsItem["pc"] = pcKey
-                            if "-" in statKey:
-                                arr = statKey.split("-")
-                                statsItem["id"] = arr[0]
-                                statsItem["name"] = arr[1]
-
-                            statsItem.update(statDict)
-                            self._pc_stats.append(statsItem)
+            if incremental or dump_format.load is None:
+                items = dump_format.iter_items(f)
+            else:
+                with self._profiler.stage("json_load") as counts:
+                    try:
+                        self._webrtc_internals = dump_format.load(f)
+                    except:
+                        logger.error('not a json file {}'.format(file_name))
+                    counts["bytes"] = os.path.getsize(file_name)
+                items = dump_format.walk_items(self._webrtc_internals)
+            self._load_items(items)
+
+        decoded = None
+        if cache:
+            with self._profiler.stage("save_cache") as counts:
+                decoded = values_decoder.decode_values(self._webrtc_stats.get("values", []))
+                parse_cache.save_cache(file_name, self._webrtc_stats, decoded, self._pc_events)
+                counts["records"] = len(self._webrtc_stats)
+
+        self._build_stats(lazy, decoded)
+
+    def parse_stream(self, fp, lazy=True):
+        """Parse a webrtc internals dump from an open text stream with the streaming reader,
+           e.g. an upload which is still being received
+        """
+        with self._profiler.stage("parse") as counts:
+            dump_format, fp = dump_formats.detect_format(fp)
+            self._webrtc_internals = {}
+            self._load_items(dump_format.iter_items(fp))
+            self._build_stats(lazy)
+            counts["records"] = len(self._webrtc_stats)
+
+    def _load_items(self, items):
+        """with a streaming reader, the records stage includes reading and decoding the json"""
+        self._pc_events = event_timeline.new_event_columns()
+        with self._profiler.stage("records") as counts:
+            for itemKey, pcKey, statKey, itemValue in items:
+                if itemKey == "stats":
+                    self._pc_stats.append(create_stats_item(pcKey, statKey, itemValue))
+                elif itemKey == "updateLog":
+                    event_timeline.append_update_log(self._pc_events, pcKey, itemValue)
+            counts["records"] = len(self._pc_stats)
+
+        with self._profiler.stage("table") as counts:
+            self._webrtc_stats = create_stats_table(self._pc_stats)
+            counts["records"] = len(self._webrtc_stats)
+        self._pc_stats = []
 
-                    elif itemKey == "updateLog":
-                        self._pc_events = itemDict
-                    else:
-                        pass
+        self._build_events()
 
-        self._webrtc_stats = pd.DataFrame.from_records(self._pc_stats)
+    def _build_events(self):
+        with self._profiler.stage("events") as counts:
+            self._event_timeline = event_timeline.EventTimeline(self._pc_events, self._log_utc_offset)
+            self._webrtc_events = self._event_timeline.get_events()
+            counts["records"] = len(self._webrtc_events)
 
-        self._webrtc_events = pd.DataFrame.from_records(self._pc_events)
+    def load_cache(self, file_name, lazy=True):
+        """Load the parsed dump from its cache, return False if there is no valid cache"""
+        with self._profiler.stage("load_cache"):
+            cached = parse_cache.load_cache(file_name)
+        if not cached:
+            return False
 
-        self._media_stats = self.get_metrics_values(self._webrtc_stats)
+        self._webrtc_internals = {}
+        self._webrtc_stats, decoded, self._pc_events = cached
+        self._build_events()
+        self._build_stats(lazy, decoded)
+        return True
+
+    def load_binary(self, file_name, lazy=True):
+        """Load a binary dump of binary_dump.convert_dump, its samples stay memory mapped"""
+        with self._profiler.stage("load_binary") as counts:
+            dump = binary_dump.BinaryDump(file_name)
+            logger.info(f"open binary dump {file_name}")
+            self._webrtc_internals = {}
+            self._webrtc_stats = dump.get_stats_table()
+            self._pc_events = dump.get_events()
+            counts["records"] = len(dump)
+        self._build_events()
+        self._build_stats(lazy, dump)
+
+    def _build_stats(self, lazy, decoded=None):
+        self._decoded = decoded
+        with self._profiler.stage("index") as counts:
+            self._stats_index = StatsIndex(self._webrtc_stats)
+            counts["records"] = len(self._webrtc_stats)
+        if lazy:
+            self._media_stats = LazyMediaStats(self._webrtc_stats, self._cache_size, decoded)
+        else:
+            self._media_stats = self.get_metrics_values(self._webrtc_stats, decoded)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', action='store',
                         dest='input_file', help='input webrtc dump file')
 
+    parser.add_argument('-s', action='store_true', dest='incremental',
+                        help='parse the dump incrementally with a streaming json reader')
+
     parser.add_argument('-c', action='store', dest='config_file',
                         help='user specified config file, yaml format only, will replace default config file')
 
+    parser.add_argument('--profile', nargs='?', const='stages', choices=['stages'] + profiling.CAPTURE_TOOLS,
+                        help='print the time, records and peak RSS of every stage, '
+                             'with cprofile or pyinstrument also capture a function profile')
+
+    parser.add_argument('--profile-output', dest='profile_output',
+                        help='save the cprofile stats or the pyinstrument html instead of printing them')
+
+    parser.add_argument('--utc-offset', dest='utc_offset', default=None,
+                        help='UTC offset of the browser which saved the dump, e.g. +02:00, for its update log times')
+
     args = parser.parse_args()
 
     if not args.input_file:
@@ -193,22 +530,28 @@ if __name__ == "__main__":
         print("e.g.: ./webrtc_internals_analyzer.py -i samples/receiver_webrtc_internals_dump.txt")
         exit(0)
 
-    # judge if json file or not and parse it
-    analyzer = WebrtcInternalsAnalyzer()
-    analyzer.parse(args.input_file)
-    line_separator = '-' * 30
-    print(f"\n{line_separator} webrtc media stats {line_separator}")
-    print(analyzer.get_webrtc_stats())
-
-    print(f"\n{line_separator} webrtc stats ids {line_separator}")
-    for statsType in getWebrtcStatsTypes():
-        stats_ids = analyzer.get_stats_ids(statsType)
-        print("*", statsType, ":", stats_ids.tolist())
-
-    metric_type_names = [
-        ("inbound-rtp", "[bytesReceived_in_bits/s]"),
-        ("outbound-rtp", "[bytesSent_in_bits/s]")
-    ]
-    for metric_type_name in metric_type_names:
-        print(f"\n{line_separator} {metric_type_name} {line_separator}")
-        print(analyzer.get_stats_by_type_name(metric_type_name[0], metric_type_name[1]))
\ No newline at end of file
+    capture_tool = args.profile if args.profile in profiling.CAPTURE_TOOLS else None
+    with profiling.capture(capture_tool, args.profile_output):
+        # judge if json file or not and parse it
+        analyzer = WebrtcInternalsAnalyzer(profile=bool(args.profile), log_utc_offset=args.utc_offset)
+        analyzer.parse(args.input_file, args.incremental)
+        line_separator = '-' * 30
+        print(f"\n{line_separator} webrtc media stats {line_separator}")
+        print(analyzer.get_webrtc_stats())
+
+        print(f"\n{line_separator} webrtc stats ids {line_separator}")
+        for statsType in getWebrtcStatsTypes():
+            stats_ids = analyzer.get_stats_ids(statsType)
+            print("*", statsType, ":", stats_ids.tolist())
+
+        metric_type_names = [
+            ("inbound-rtp", "[bytesReceived_in_bits/s]"),
+            ("outbound-rtp", "[bytesSent_in_bits/s]")
+        ]
+        for metric_type_name in metric_type_names:
+            print(f"\n{line_separator} {metric_type_name} {line_separator}")
+            print(analyzer.get_stats_by_type_name(metric_type_name[0], metric_type_name[1]))
+
+    if args.profile:
+        print(f"\n{line_separator} profile {line_separator}")
+        print(profiling.format_report(analyzer.get_profile()))
@@ -1,22 +1,82 @@
 #!/usr/bin/env python3
 
+import importlib
 import os
 import sys
 import logging
 import socket
-from pytz import timezone
+from functools import lru_cache
 from datetime import datetime
 
 TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+# NaT as int64 nanoseconds
+NAT_NS = -(1 << 63)
 
 LOGGER_MAP = {}
 
+
+class LazyModule:
+    """Module imported on the first access to one of its attributes, keeps heavy imports such as pandas
+       or matplotlib out of the start of a command which does not use them
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
 def numbers_to_string(numbers):
     return ",".join(str(n) for n in numbers)
 
 def str2time(str, date_format=TIME_FORMAT):
+    from pytz import timezone
     return datetime.strptime(str, date_format).astimezone(timezone('UTC'))
 
+@lru_cache(maxsize=4096)
+def str2datetime64(str):
+    """UTC time string such as 2023-02-18T08:00:00.000Z to numpy.datetime64, each distinct string is parsed once"""
+    import numpy as np
+    return np.datetime64(str.rstrip('Z'), 'ns')
+
+def to_datetime64(time):
+    """time string, numpy.datetime64 or pandas Timestamp to UTC numpy.datetime64[ns]"""
+    import numpy as np
+    if isinstance(time, str):
+        return str2datetime64(time)
+    if isinstance(time, np.datetime64):
+        return time.astype('datetime64[ns]')
+    if hasattr(time, "value") and hasattr(time, "tz_localize"):
+        # pandas Timestamp or NaT, value is nanoseconds since epoch in UTC
+        return np.datetime64(time.value, 'ns')
+    return np.datetime64(time, 'ns')
+
+def get_sample_steps(starts, ends, counts, default_step=1e9):
+    """float64 ns between the samples of every series, which are evenly spread from its start to its end time,
+       default_step apart when the end time is unknown or not after the start time
+       starts, ends: int64 ns since epoch, NaT as NAT_NS, counts: number of samples of every series
+    """
+    import numpy as np
+    starts, ends, counts = np.asarray(starts), np.asarray(ends), np.asarray(counts)
+    spread = (ends != NAT_NS) & (ends > starts) & (counts > 1)
+    with np.errstate(over='ignore'):
+        return np.where(spread, (ends - starts) / np.maximum(counts - 1, 1), default_step)
+
+def get_sample_times(starts, ends, counts, default_step=1e9):
+    """(int64 ns times of the samples of every series laid end to end, steps of get_sample_steps)"""
+    import numpy as np
+    starts, counts = np.asarray(starts, dtype=np.int64), np.asarray(counts, dtype=np.int64)
+    steps = get_sample_steps(starts, ends, counts, default_step)
+    seqs = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + (seqs * np.repeat(steps, counts)).astype(np.int64), steps
+
 def get_host_ip():
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -36,6 +96,15 @@ def get_logger(filename):
         LOGGER_MAP[filename] = logger
         return logger
 
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler which creates its folder and opens its file with the first record, not when it is created"""
+    def __init__(self, filename, mode='a', encoding=None):
+        super().__init__(filename, mode, encoding, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
 def create_logger(filename, log2console=False, logLevel=logging.INFO, logFolder= './logs'):
     logger = logging.getLogger(filename)
     logger.setLevel(logging.INFO)
@@ -46,11 +115,7 @@ def create_logger(filename, log2console=False, logLevel=logging.INFO, logFolder=
     if not logfile.endswith(".log"):
         logfile += ".log"
 
-    directory = os.path.dirname(logfile)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    handler = logging.FileHandler(logfile)
+    handler = LazyFileHandler(logfile)
     handler.setLevel(logLevel)
     handler.setFormatter(formatter)
     logger.addHandler(handler)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from . import analyzer_util
+from . import compression
+from .analyzer import WebrtcInternalsAnalyzer
+
+logger = analyzer_util.get_logger(os.path.basename(__file__))
+
+DEFAULT_PATTERN = "*.txt"
+DEFAULT_CHUNK_SIZE = 4
+
+
+class DumpTimeoutError(Exception):
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raise DumpTimeoutError when the block runs longer than seconds, no limit without SIGALRM"""
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise DumpTimeoutError(f"timeout after {seconds} seconds")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def get_dump_files(path, pattern=DEFAULT_PATTERN):
+    """Dump files of a directory, or the files matched by a glob, with their compressed ones e.g. *.txt.gz"""
+    if os.path.isdir(path):
+        path = os.path.join(path, pattern)
+    file_names = set(glob.glob(path, recursive=True))
+    for suffix in compression.SUFFIXES.values():
+        file_names.update(glob.glob(path + suffix, recursive=True))
+    return sorted(file_names)
+
+
+def summarize_dump(file_name):
+    """Parse a dump and return a compact summary instead of the DataFrames"""
+    analyzer = WebrtcInternalsAnalyzer()
+    analyzer.parse(file_name, incremental=True)
+    return summarize_analyzer(analyzer)
+
+
+def summarize_analyzer(analyzer):
+    stats_df = analyzer.get_webrtc_stats()
+    summary = {
+        "pcs": 0,
+        "records": len(stats_df),
+        "types": {},
+    }
+    if len(stats_df) > 0:
+        summary["pcs"] = int(stats_df["pc"].nunique())
+        summary["types"] = {str(k): int(v) for k, v in stats_df.groupby("statsType", observed=True)["id"].nunique().items()}
+    return summary
+
+
+def analyze_dump(file_name, timeout=None, summarize=summarize_dump):
+    begin = time.time()
+    result = {"file": file_name, "size": 0, "seconds": 0, "error": None}
+    try:
+        result["size"] = os.path.getsize(file_name)
+        with time_limit(timeout):
+            result.update(summarize(file_name))
+    except Exception as e:
+        logger.warning(f"fail to analyze {file_name}: {e!r}")
+        result["error"] = repr(e)
+    result["seconds"] = round(time.time() - begin, 3)
+    return result
+
+
+def analyze_chunk(file_names, timeout=None, summarize=summarize_dump):
+    return [analyze_dump(file_name, timeout, summarize) for file_name in file_names]
+
+
+def iter_batch_results(file_names, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, timeout=None,
+                       summarize=summarize_dump):
+    """Fan the dumps out to a process pool and yield their summaries as they complete
+       dumps are submitted in small chunks so that idle workers keep taking the next chunk
+    """
+    file_names = list(file_names)
+    chunks = [file_names[i:i + chunk_size] for i in range(0, len(file_names), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(analyze_chunk, chunk, timeout, summarize) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def analyze_dumps(path, pattern=DEFAULT_PATTERN, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, timeout=None,
+                  summarize=summarize_dump):
+    """Analyze a directory or a glob of dumps in parallel, return the summaries sorted by file"""
+    file_names = get_dump_files(path, pattern)
+    logger.info(f"analyze {len(file_names)} dumps of {path}")
+    results = list(iter_batch_results(file_names, workers, chunk_size, timeout, summarize))
+    return sorted(results, key=lambda result: result["file"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', action='store', dest='path', required=True,
+                        help='directory or glob of webrtc dump files')
+    parser.add_argument('-p', action='store', dest='pattern', default=DEFAULT_PATTERN,
+                        help='file pattern inside the directory')
+    parser.add_argument('-w', action='store', dest='workers', type=int, default=None,
+                        help='number of worker processes, default is the number of cpus')
+    parser.add_argument('-t', action='store', dest='timeout', type=float, default=None,
+                        help='timeout in seconds of each dump')
+    args = parser.parse_args()
+
+    begin = time.time()
+    results = analyze_dumps(args.path, args.pattern, args.workers, timeout=args.timeout)
+    elapsed = time.time() - begin
+    for result in results:
+        print(result)
+    print(f"{len(results)} dumps in {elapsed:.2f} seconds, {len(results) / max(elapsed, 1e-9):.1f} dumps/s")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from . import analyzer_util
+from . import values_decoder
+
+# only needed to name the binary dump of a compressed dump
+compression = analyzer_util.lazy_module(f"{__package__}.compression")
+
+logger = analyzer_util.get_logger(os.path.basename(__file__))
+
+# layout of a binary dump:
+#   MAGIC, header length (uint64), json header, padding to ALIGNMENT
+#   index: one INDEX_DTYPE record per metric
+#   data: the samples of every metric as a contiguous typed array, strings as their json text
+MAGIC = b"WSDUMP\x00\x01"
+BINARY_VERSION = 1
+BINARY_SUFFIX = ".wsdump"
+ALIGNMENT = 64
+
+# sample types of the data region: int64, float64 and bool as read, so that the samples are views of the file,
+# a dump written with narrow=True stores ints in the narrowest type which holds them and floats as float32
+# when that is lossless, it is smaller but its samples are widened, that is copied, when they are read
+SAMPLE_DTYPES = [np.dtype('<f8'), np.dtype('<f4'), np.dtype('i1'), np.dtype('<i2'), np.dtype('<i4'),
+                 np.dtype('<i8'), np.dtype('?'), np.dtype('u1')]
+TEXT_DTYPE = len(SAMPLE_DTYPES) - 1
+INT_DTYPES = [2, 3, 4, 5]
+
+# codes are positions in the string tables of the header, -1 when missing
+INDEX_DTYPE = np.dtype([
+    ("key", "<i4"), ("pc", "<i4"), ("id", "<i4"), ("name", "<i4"), ("statsType", "<i4"),
+    ("startTime", "<i8"), ("endTime", "<i8"),
+    ("offset", "<i8"), ("length", "<i8"),
+    ("kind", "i1"), ("dtype", "i1"), ("padding", "V6"),
+])
+CODE_COLUMNS = ["key", "pc", "id", "name", "statsType"]
+TIME_COLUMNS = ["startTime", "endTime"]
+
+
+def get_binary_name(file_name):
+    return os.path.splitext(compression.strip_suffix(file_name))[0] + BINARY_SUFFIX
+
+
+def is_binary_dump(file_name):
+    try:
+        with open(file_name, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _get_sample_array(decoded, index, narrow=False):
+    """(dtype code, array) of metric index to store, the smallest lossless type when narrow is set"""
+    kind = decoded.kinds[index]
+    if kind == values_decoder.KIND_OBJECT:
+        text = json.dumps(decoded.objects[index], separators=(',', ':')).encode('utf_8')
+        return TEXT_DTYPE, np.frombuffer(text, dtype=np.uint8)
+    values = decoded.buffer[decoded.offsets[index]:decoded.offsets[index + 1]]
+    if kind == values_decoder.KIND_BOOL:
+        return 6, values.astype(np.bool_)
+    # the zeros are only read as float64 samples, never as a view
+    if kind == values_decoder.KIND_ZERO:
+        return 2, values.astype(SAMPLE_DTYPES[2])
+    if kind == values_decoder.KIND_INT:
+        codes = INT_DTYPES if narrow else INT_DTYPES[-1:]
+        low, high = values.min(), values.max()
+        for code in codes:
+            info = np.iinfo(SAMPLE_DTYPES[code])
+            if info.min <= low and high <= info.max:
+                return code, values.astype(SAMPLE_DTYPES[code])
+    if narrow:
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+            return 1, narrowed
+    return 0, values
+
+
+def write_binary_dump(file_name, stats_df, decoded, events, source=None, narrow=False):
+    """Write the parsed table, its decoded values and the update log columns as a binary dump
+       narrow: store the samples in the smallest lossless type, they are copied when they are read
+    """
+    count = len(stats_df)
+    index = np.zeros(count, dtype=INDEX_DTYPE)
+    header = {"version": BINARY_VERSION, "count": count, "source": source or {},
+              "columns": [column for column in stats_df.columns if column != "values"],
+              "tables": {}, "events": events}
+    for column in CODE_COLUMNS:
+        if column in stats_df:
+            categorical = pd.Categorical(stats_df[column])
+            header["tables"][column] = [str(category) for category in categorical.categories]
+            index[column] = categorical.codes
+        else:
+            index[column] = -1
+    for column in TIME_COLUMNS:
+        if column in stats_df:
+            times = pd.DatetimeIndex(stats_df[column])
+            index[column] = (times.tz_convert(None) if times.tz is not None else times).values.astype('datetime64[ns]').astype(np.int64)
+        else:
+            index[column] = np.iinfo(np.int64).min
+
+    index["kind"] = decoded.kinds
+    arrays = []
+    offset = 0
+    # every metric with samples is stored, the all zero counters too, only the empty ones have none
+    for i in np.flatnonzero(index["kind"] != values_decoder.KIND_EMPTY):
+        code, array = _get_sample_array(decoded, i, narrow)
+        offset = _align(offset, array.dtype.itemsize)
+        index["dtype"][i] = code
+        index["offset"][i] = offset
+        index["length"][i] = len(array)
+        arrays.append((offset, array))
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf_8')
+    index_offset = _align(len(MAGIC) + 8 + len(header_bytes), ALIGNMENT)
+    data_offset = _align(index_offset + index.nbytes, ALIGNMENT)
+    tmp_name = "{}.{}.tmp".format(file_name, os.getpid())
+    try:
+        with open(tmp_name, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            f.write(b"\0" * (index_offset - f.tell()))
+            f.write(index.tobytes())
+            f.write(b"\0" * (data_offset - f.tell()))
+            for array_offset, array in arrays:
+                f.write(b"\0" * (data_offset + array_offset - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_name, file_name)
+    except OSError:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    logger.info(f"write {file_name}: {count} metrics, {offset} bytes of samples")
+
+
+class _TextValues:
+    """samples of the string metrics, decoded from their json text when asked for"""
+    def __init__(self, binary_dump):
+        self._binary_dump = binary_dump
+
+    def __getitem__(self, index):
+        return self._binary_dump.get_values(index)
+
+
+class BinaryDump:
+    """Memory mapped binary dump: the index and the sample arrays are numpy views of the file
+       It serves the values of metric i like DecodedValues with the same int64, float64 and bool dtypes,
+       only the samples of a dump written with narrow=True are widened into a copy when they are read
+    """
+    def __init__(self, file_name):
+        self._file_name = file_name
+        self._map = np.memmap(file_name, dtype=np.uint8, mode='r')
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"not a binary dump {file_name}")
+        header_length = int(np.frombuffer(self._map, dtype='<u8', count=1, offset=len(MAGIC))[0])
+        header_begin = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._map[header_begin:header_begin + header_length]))
+        if self.header.get("version") != BINARY_VERSION:
+            raise ValueError(f"unsupported binary dump version {self.header.get('version')} of {file_name}")
+
+        count = self.header["count"]
+        index_offset = _align(header_begin + header_length, ALIGNMENT)
+        self._data_offset = _align(index_offset + count * INDEX_DTYPE.itemsize, ALIGNMENT)
+        self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        self.kinds = self.index["kind"]
+        self.objects = _TextValues(self)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _get_array(self, index):
+        """samples of metric index as stored, a view of the file"""
+        record = self.index[index]
+        return np.frombuffer(self._map, dtype=SAMPLE_DTYPES[record["dtype"]], count=int(record["length"]),
+                             offset=self._data_offset + int(record["offset"]))
+
+    def get_values(self, index):
+        """values of metric index as numpy array (list for strings), None if it is empty or all zero
+           a read-only view of the file unless the dump was written with narrow=True
+        """
+        kind = self.kinds[index]
+        if kind == values_decoder.KIND_EMPTY or kind == values_decoder.KIND_ZERO:
+            return None
+        values = self._get_array(index)
+        if kind == values_decoder.KIND_OBJECT:
+            return json.loads(values.tobytes())
+        # the same dtypes as the json dump, arithmetic on a narrowed int16 would overflow silently
+        dtype = values_decoder.KIND_DTYPES.get(kind, np.float64)
+        return values if values.dtype == dtype else values.astype(dtype)
+
+    def get_samples(self, index):
+        """numeric samples of metric index as float64 array, the zeros of a KIND_ZERO metric too"""
+        return self._get_array(index).astype(np.float64)
+
+    def non_empty_indexes(self):
+        """metrics with values to show, the all zero ones are left out"""
+        return np.flatnonzero((self.kinds != values_decoder.KIND_EMPTY) & (self.kinds != values_decoder.KIND_ZERO))
+
+    def memory_usage(self):
+        """the samples are mapped, only the index is read"""
+        return self.index.nbytes
+
+    def get_stats_table(self):
+        """the stats table as parsed from the json dump, without the raw "values" strings"""
+        columns = {}
+        for column in self.header["columns"]:
+            if column in CODE_COLUMNS:
+                columns[column] = pd.Categorical.from_codes(np.asarray(self.index[column]),
+                                                            self.header["tables"][column])
+            elif column in TIME_COLUMNS:
+                columns[column] = pd.DatetimeIndex(np.asarray(self.index[column]).astype('datetime64[ns]'), tz='UTC')
+        return pd.DataFrame(columns, columns=[column for column in self.header["columns"] if column in columns])
+
+    def get_events(self):
+        return self.header["events"]
+
+    def to_decoded(self):
+        """All numeric samples as one float64 DecodedValues, the typed arrays are copied once"""
+        numeric = np.isin(self.kinds, values_decoder.NUMERIC_KINDS)
+        lengths = np.where(numeric, self.index["length"], 0)
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        buffer = np.empty(int(offsets[-1]), dtype=np.float64)
+        for i in np.flatnonzero(numeric):
+            buffer[offsets[i]:offsets[i + 1]] = self._get_array(i)
+        return values_decoder.DecodedValues(buffer, offsets, np.asarray(self.kinds), self.objects)
+
+
+def convert_dump(dump_file, output_file=None, narrow=False):
+    """Convert a json webrtc internals dump to a binary dump, return the name of the binary dump
+       narrow: smaller file, but its samples are copied instead of mapped when they are read
+    """
+    from .analyzer import WebrtcInternalsAnalyzer
+
+    output_file = output_file or get_binary_name(dump_file)
+    analyzer = WebrtcInternalsAnalyzer()
+    analyzer.parse(dump_file, incremental=True)
+    stat = os.stat(dump_file)
+    source = {"file": os.path.basename(dump_file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    write_binary_dump(output_file, analyzer.get_webrtc_stats(), analyzer.get_decoded_values(),
+                      analyzer.get_event_columns(), source, narrow)
+    return output_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', action='store', dest='input_file', required=True, help='input webrtc dump file')
+    parser.add_argument('-o', action='store', dest='output_file', default=None,
+                        help=f'output binary dump, default is the input file with the {BINARY_SUFFIX} suffix')
+    parser.add_argument('--narrow', action='store_true',
+                        help='store the samples in the smallest lossless type, they are copied when read')
+    args = parser.parse_args()
+
+    begin = time.time()
+    output_file = convert_dump(args.input_file, args.output_file, args.narrow)
+    input_size, output_size = os.path.getsize(args.input_file), os.path.getsize(output_file)
+    print(f"{args.input_file} ({input_size} bytes) -> {output_file} ({output_size} bytes, "
+          f"{output_size / max(input_size, 1):.1%}) in {time.time() - begin:.2f} seconds")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import gzip
+import io
+import lzma
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+XZ = "xz"
+
+# compressions are detected by the magic bytes of the file, not by its suffix
+MAGICS = {
+    GZIP: b"\x1f\x8b",
+    ZSTD: b"\x28\xb5\x2f\xfd",
+    XZ: b"\xfd7zXZ\x00",
+}
+SUFFIXES = {GZIP: ".gz", ZSTD: ".zst", XZ: ".xz"}
+# chunk size of compress_file and decompress_file
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def detect_compression(file_name):
+    """GZIP, ZSTD or XZ of a compressed file, None otherwise"""
+    try:
+        with open(file_name, 'rb') as f:
+            head = f.read(max(len(magic) for magic in MAGICS.values()))
+    except OSError:
+        return None
+    for compression, magic in MAGICS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def strip_suffix(file_name):
+    """file name without its compression suffix, e.g. dump.txt.gz -> dump.txt"""
+    for suffix in SUFFIXES.values():
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)]
+    return file_name
+
+
+def open_binary(file_name, compression=None):
+    """Binary stream of the decompressed content, decompressed chunk by chunk while it is read"""
+    compression = compression or detect_compression(file_name)
+    if compression == GZIP:
+        return gzip.open(file_name, 'rb')
+    if compression == XZ:
+        return lzma.open(file_name, 'rb')
+    if compression == ZSTD:
+        if zstandard is None:
+            raise ValueError(f"zstandard is required to read {file_name}, pip install zstandard")
+        fp = open(file_name, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(fp, closefd=True)
+    return open(file_name, 'rb')
+
+
+def open_text(file_name, compression=None, encoding='utf_8'):
+    """Text stream of a plain or compressed file, a compressed one is decompressed as it is read"""
+    compression = compression or detect_compression(file_name)
+    if compression is None:
+        return open(file_name, 'r', encoding=encoding)
+    return io.TextIOWrapper(open_binary(file_name, compression), encoding=encoding)
+
+
+def compress_file(file_name, compression, output_file=None):
+    """Compress a file in chunks, return the name of the compressed file"""
+    output_file = output_file or file_name + SUFFIXES[compression]
+    if compression == GZIP:
+        output = gzip.open(output_file, 'wb')
+    elif compression == XZ:
+        output = lzma.open(output_file, 'wb')
+    elif zstandard is None:
+        raise ValueError(f"zstandard is required to write {output_file}, pip install zstandard")
+    else:
+        output = zstandard.ZstdCompressor().stream_writer(open(output_file, 'wb'), closefd=True)
+    with open(file_name, 'rb') as f, output:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            output.write(chunk)
+    return output_file
+
+
+def decompress_file(file_name, output_file=None):
+    """Decompress a file to disk in chunks, return the name of the decompressed file"""
+    output_file = output_file or strip_suffix(file_name)
+    if os.path.abspath(output_file) == os.path.abspath(file_name):
+        output_file += ".out"
+    with open_binary(file_name) as f, open(output_file, 'wb') as output:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            output.write(chunk)
+    return output_file
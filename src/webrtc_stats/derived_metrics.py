@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import os
+import time
+import numpy as np
+import pandas as pd
+from . import values_decoder
+from .analyzer import generate_time_series
+from .yaml_config import YamlConfig
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analyzer.yaml")
+CONFIG_KEY = "derived_metrics"
+
+_NS_PER_SECOND = 1e9
+
+
+def _delta(values):
+    """change since the previous sample, NaN for the first one"""
+    result = np.full(values.shape, np.nan)
+    result[:, 1:] = values[:, 1:] - values[:, :-1]
+    return result
+
+
+class Formula:
+    """A derived metric formula compiled from its text once
+       evaluated over 2D arrays: one row per stats id, one column per sample, aligned on the last sample
+    """
+    BINARY_OPERATORS = {
+        ast.Add: np.add,
+        ast.Sub: np.subtract,
+        ast.Mult: np.multiply,
+        ast.Div: np.divide,
+        ast.Pow: np.power,
+    }
+    UNARY_OPERATORS = {
+        ast.USub: np.negative,
+        ast.UAdd: np.positive,
+    }
+    FUNCTIONS = {
+        "delta": _delta,
+        "sqrt": np.sqrt,
+        "abs": np.abs,
+        "log10": np.log10,
+        "min": np.fmin,
+        "max": np.fmax,
+    }
+
+    def __init__(self, text):
+        self.text = text
+        try:
+            self._tree = ast.parse(str(text), mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"invalid formula {text}: {e.msg}")
+        self.metrics = []
+        self._check(self._tree)
+
+    def _check(self, node):
+        if isinstance(node, ast.BinOp) and type(node.op) in self.BINARY_OPERATORS:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in self.UNARY_OPERATORS:
+            self._check(node.operand)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and (node.func.id in self.FUNCTIONS or node.func.id == "rate") and not node.keywords:
+            for arg in node.args:
+                self._check(arg)
+        elif isinstance(node, ast.Name) or (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            name = node.id if isinstance(node, ast.Name) else node.value
+            if name not in self.metrics:
+                self.metrics.append(name)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            pass
+        else:
+            raise ValueError(f"unsupported expression in formula {self.text}: {ast.dump(node)}")
+
+    def evaluate(self, arrays, seconds):
+        """arrays: metric name -> 2D float array, seconds: 2D array of the sample times in seconds"""
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result = self._evaluate(self._tree, arrays, seconds)
+        result = np.broadcast_to(np.asarray(result, dtype=np.float64), seconds.shape).copy()
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+    def _evaluate(self, node, arrays, seconds):
+        if isinstance(node, ast.BinOp):
+            return self.BINARY_OPERATORS[type(node.op)](self._evaluate(node.left, arrays, seconds),
+                                                        self._evaluate(node.right, arrays, seconds))
+        if isinstance(node, ast.UnaryOp):
+            return self.UNARY_OPERATORS[type(node.op)](self._evaluate(node.operand, arrays, seconds))
+        if isinstance(node, ast.Call):
+            args = [self._evaluate(arg, arrays, seconds) for arg in node.args]
+            if node.func.id == "rate":
+                return _delta(args[0]) / _delta(seconds)
+            return self.FUNCTIONS[node.func.id](*args)
+        if isinstance(node, ast.Name):
+            return arrays[node.id]
+        if isinstance(node.value, str):
+            return arrays[node.value]
+        return node.value
+
+
+class DerivedMetrics:
+    """Derived metrics of a parsed dump, configured by name -> formula for every stats type
+       A formula is evaluated for all stats ids of the type in one batch over the decoded values of the dump,
+       the results are cached by (id, formula) and only turned into DataFrames when asked for
+    """
+    def __init__(self, analyzer, config=None):
+        self._analyzer = analyzer
+        if config is None or isinstance(config, str):
+            config = YamlConfig(config or DEFAULT_CONFIG_FILE).get_config().get(CONFIG_KEY, {})
+        self._formulas = {statsType: {name: Formula(text) for name, text in (formulas or {}).items()}
+                          for statsType, formulas in config.items()}
+        # (stats id, formula text) -> (timestamps, values), None if it cannot be computed
+        self._cache = {}
+        # stats type -> [stats ids, {metric: 2D array}, 2D timestamps]
+        self._arrays = {}
+
+    def get_formulas(self, statsType):
+        return {name: formula.text for name, formula in self._formulas.get(statsType, {}).items()}
+
+    def get_stats_types(self):
+        return list(self._formulas.keys())
+
+    @staticmethod
+    def _resize(array, width, fill):
+        """pad a 2D array with fill at the start up to width columns"""
+        if array.shape[1] == width:
+            return array
+        padded = np.full((array.shape[0], width), fill, dtype=array.dtype)
+        padded[:, width - array.shape[1]:] = array
+        return padded
+
+    def _load_arrays(self, statsType, metrics):
+        """The samples of metrics for all ids of statsType as 2D arrays, right aligned as the metrics of a
+           stats id end at the same time, shorter series are padded with NaN at the start
+        """
+        if statsType not in self._arrays:
+            stats_ids = [str(id) for id in self._analyzer.get_stats_ids(statsType)]
+            self._arrays[statsType] = [stats_ids, {}, np.full((len(stats_ids), 0), np.datetime64('NaT'), 'datetime64[ns]')]
+        stats_ids, arrays, timestamps = self._arrays[statsType]
+        missing = [metric for metric in metrics if metric not in arrays]
+        if not missing:
+            return stats_ids, arrays, timestamps
+
+        rows = {stats_id: row for row, stats_id in enumerate(stats_ids)}
+        stats_df = self._analyzer.get_webrtc_stats()
+        decoded = self._analyzer.get_decoded_values()
+        keys, start_times, end_times = stats_df["key"].values, stats_df["startTime"].values, stats_df["endTime"].values
+        series = []
+        for metric in missing:
+            for position in self._analyzer.get_positions_by_type_name(statsType, metric):
+                row = rows.get(str(keys[position])[:-len(metric) - 1])
+                # the all zero counters of a healthy call are samples, their rates are 0, not missing
+                if row is None or decoded.kinds[position] not in values_decoder.NUMERIC_KINDS:
+                    continue
+                series.append((metric, row, start_times[position], end_times[position],
+                               decoded.get_samples(position)))
+
+        width = max([timestamps.shape[1]] + [len(values) for *_, values in series])
+        timestamps = self._resize(timestamps, width, np.datetime64('NaT'))
+        for metric in arrays:
+            arrays[metric] = self._resize(arrays[metric], width, np.nan)
+        for metric in missing:
+            arrays[metric] = np.full((len(stats_ids), width), np.nan)
+        for metric, row, start_time, end_time, values in series:
+            arrays[metric][row, width - len(values):] = values
+            times = timestamps[row, width - len(values):]
+            if np.isnat(times).any():
+                series_times = generate_time_series(start_time, len(values), end_time)
+                timestamps[row, width - len(values):] = np.where(np.isnat(times), series_times, times)
+
+        self._arrays[statsType] = [stats_ids, arrays, timestamps]
+        return stats_ids, arrays, timestamps
+
+    def evaluate(self, statsType, name):
+        """Evaluate a derived metric for all ids of statsType in one batch
+           return stats ids and the 2D timestamps and values, one row per stats id, NaN where it is undefined
+        """
+        formula = self._formulas.get(statsType, {}).get(name)
+        if formula is None:
+            raise KeyError(f"no derived metric {name} for {statsType}")
+
+        stats_ids, arrays, timestamps = self._load_arrays(statsType, formula.metrics)
+        seconds = np.where(np.isnat(timestamps), np.nan, timestamps.astype(np.int64) / _NS_PER_SECOND)
+        values = formula.evaluate(arrays, seconds)
+        for row, stats_id in enumerate(stats_ids):
+            valid = ~np.isnan(values[row])
+            self._cache[(stats_id, formula.text)] = (timestamps[row][valid], values[row][valid]) if valid.any() else None
+        return stats_ids, timestamps, values
+
+    def get_values(self, stats_id, statsType, name):
+        """A derived metric of one stats id as "timestamp, value" DataFrame, empty if it cannot be computed"""
+        formula = self._formulas.get(statsType, {}).get(name)
+        if formula is None:
+            raise KeyError(f"no derived metric {name} for {statsType}")
+        key = (str(stats_id), formula.text)
+        if key not in self._cache:
+            self.evaluate(statsType, name)
+        series = self._cache.get(key)
+        if series is None:
+            return pd.DataFrame(columns=["timestamp", "value"])
+        return pd.DataFrame({"timestamp": pd.DatetimeIndex(series[0], tz='UTC'), "value": series[1]})
+
+    def evaluate_all(self, statsTypes=None):
+        """(statsType, name) -> (stats ids, timestamps, values) of every configured derived metric"""
+        results = {}
+        for statsType in statsTypes or self.get_stats_types():
+            for name in self._formulas.get(statsType, {}):
+                results[(statsType, name)] = self.evaluate(statsType, name)
+        return results
+
+
+if __name__ == "__main__":
+    from .analyzer import WebrtcInternalsAnalyzer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', action='store', dest='input_file', required=True, help='input webrtc dump file')
+    parser.add_argument('-c', action='store', dest='config_file', default=DEFAULT_CONFIG_FILE,
+                        help='yaml file with the derived_metrics section')
+    args = parser.parse_args()
+
+    analyzer = WebrtcInternalsAnalyzer()
+    analyzer.parse(args.input_file, incremental=True)
+    derived_metrics = DerivedMetrics(analyzer, args.config_file)
+    begin = time.time()
+    results = derived_metrics.evaluate_all()
+    elapsed = time.time() - begin
+    for (statsType, name), (stats_ids, timestamps, values) in results.items():
+        for stats_id in stats_ids:
+            df = derived_metrics.get_values(stats_id, statsType, name)
+            if len(df) > 0:
+                print(f"* {statsType} {stats_id}-{name}: ", df.tail(6)["value"].round(3).values.tolist())
+    print(f"{len(results)} derived metrics in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ["lttb", "minmax"]
+DEFAULT_MAX_POINTS = 2000
+
+
+def to_numbers(values):
+    """datetime64 or numeric values as float64, for the triangle areas of lttb"""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[ns]').astype(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb_indexes(x, y, threshold):
+    """Positions of the points kept by Largest-Triangle-Three-Buckets
+       The first and last points are kept, every bucket in between keeps the point which makes
+       the largest triangle with the point kept in the previous bucket and the average of the next bucket
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = to_numbers(x)
+    y = to_numbers(y)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    # averages of every bucket, the last one is the last point
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    indexes = np.empty(threshold, dtype=np.int64)
+    indexes[0] = 0
+    indexes[-1] = n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[a] - avg_x[bucket + 1]) * (y[start:end] - y[a])
+                       - (x[a] - x[start:end]) * (avg_y[bucket + 1] - y[a]))
+        a = start + int(np.argmax(areas))
+        indexes[bucket + 1] = a
+    return indexes
+
+
+def minmax_indexes(y, threshold):
+    """Positions of the first, last, and the min and max points of (threshold - 2) / 2 equal buckets,
+       in time order. Spikes are never lost, which lttb does not promise
+    """
+    n = len(y)
+    bucket_count = (threshold - 2) // 2
+    if threshold >= n or bucket_count < 1:
+        return np.arange(n)
+
+    y = to_numbers(y)
+    bucket_size = -(-n // bucket_count)
+    padded = np.full(bucket_count * bucket_size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(bucket_count, bucket_size)
+    # the buckets of the padding only are empty
+    valid = ~np.all(np.isnan(buckets), axis=1)
+    buckets = buckets[valid]
+    base = np.flatnonzero(valid) * bucket_size
+    min_indexes = base + np.nanargmin(buckets, axis=1)
+    max_indexes = base + np.nanargmax(buckets, axis=1)
+    return np.unique(np.concatenate([[0, n - 1], min_indexes, max_indexes]))
+
+
+def downsample_indexes(x, y, threshold, method="lttb"):
+    if method == "minmax":
+        return minmax_indexes(y, threshold)
+    if method == "lttb":
+        return lttb_indexes(x, y, threshold)
+    raise ValueError(f"unknown downsample method {method}, expect one of {DOWNSAMPLE_METHODS}")
+
+
+def downsample(df, threshold=DEFAULT_MAX_POINTS, method="lttb", abscissa="timestamp", ordinate="value"):
+    """Rows of df kept by the downsample method, df itself if it has no more than threshold rows
+       rows without a numeric ordinate, e.g. strings, are never downsampled
+    """
+    if not threshold or len(df) <= threshold or df[ordinate].dtype.kind not in 'iufb':
+        return df
+    indexes = downsample_indexes(df[abscissa].values, df[ordinate].values, threshold, method)
+    return df.iloc[indexes]
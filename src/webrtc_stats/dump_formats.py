@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import json
+import re
+from array import array
+from datetime import datetime, timezone
+from . import stream_parser
+
+# enough of the start of a dump to tell its format
+HEAD_SIZE = 1 << 16
+# the head is read on up to its first newline when HEAD_SIZE is not enough, e.g. the first getStats()
+# snapshot of a json lines dump, or a one line chrome dump with a long getUserMedia list first
+MAX_HEAD_SIZE = 1 << 26
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# members of an RTCStats dictionary which are not metrics
+STATS_MEMBERS = frozenset(["id", "type", "timestamp"])
+
+
+class HeadReader:
+    """Text stream which replays the head read for the format detection before the rest of fp"""
+    def __init__(self, head, fp):
+        self._head = head
+        self._fp = fp
+
+    def read(self, size=-1):
+        if not self._head:
+            return self._fp.read(size)
+        if size is None or size < 0:
+            text, self._head = self._head + self._fp.read(), ""
+        else:
+            text, self._head = self._head[:size], self._head[size:]
+        return text
+
+
+class DumpFormat:
+    """A parser backend: detect(head) tells if the start of a dump is in this format,
+       iter_items(fp) yields the items of the dump as the (item_key, pc_key, key, value) tuples of
+       stream_parser.iter_webrtc_internals, load(fp) optionally loads the whole dump for walk_items
+    """
+    def __init__(self, name, detect, iter_items, load=None, walk_items=None):
+        self.name = name
+        self.detect = detect
+        self.iter_items = iter_items
+        self.load = load
+        self.walk_items = walk_items
+
+
+# detected in order
+FORMATS = []
+
+
+def register_format(dump_format, first=False):
+    if first:
+        FORMATS.insert(0, dump_format)
+    else:
+        FORMATS.append(dump_format)
+
+
+def get_format(name):
+    for dump_format in FORMATS:
+        if dump_format.name == name:
+            return dump_format
+    raise KeyError(f"unknown dump format {name}, one of {[f.name for f in FORMATS]}")
+
+
+def _detect(head):
+    return next((dump_format for dump_format in FORMATS if dump_format.detect(head)), None)
+
+
+def detect_format(fp):
+    """(format, stream) of an open text stream, the stream returned starts where fp started:
+       fp itself seeked back if it can, otherwise a HeadReader which replays what the detection read
+       ValueError if the dump is in none of the formats
+    """
+    position = fp.tell() if fp.seekable() else None
+    head = fp.read(HEAD_SIZE)
+    dump_format = _detect(head)
+    if dump_format is None and "\n" not in head and len(head) == HEAD_SIZE:
+        parts = [head]
+        size = len(head)
+        while size < MAX_HEAD_SIZE:
+            chunk = fp.read(HEAD_SIZE)
+            parts.append(chunk)
+            size += len(chunk)
+            if not chunk or "\n" in chunk:
+                break
+        head = "".join(parts)
+        dump_format = _detect(head)
+    if dump_format is None:
+        raise ValueError(f"unknown dump format, not one of {[f.name for f in FORMATS]}")
+    if position is None:
+        return dump_format, HeadReader(head, fp)
+    fp.seek(position)
+    return dump_format, fp
+
+
+def format_time(ms):
+    """chrome's stats time text of ms since epoch"""
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime(TIME_FORMAT)
+
+
+class Samples:
+    """Samples of one metric in a typed array, int64 until a float comes, 8 bytes per sample instead of
+       a python object; strings, booleans and mixed values are kept in a list
+    """
+    __slots__ = ("values",)
+
+    def __init__(self, value):
+        self.values = [value]
+        self._type(value)
+
+    def _type(self, value):
+        if type(value) is int and -(1 << 63) <= value < (1 << 63):
+            self.values = array('q', self.values)
+        elif type(value) is float:
+            self.values = array('d', self.values)
+
+    def append(self, value):
+        values = self.values
+        if type(values) is list:
+            values.append(value)
+        elif type(value) is float and values.typecode == 'q':
+            self.values = array('d', values)
+            self.values.append(value)
+        else:
+            try:
+                if type(value) is bool:
+                    raise TypeError("a boolean among the numbers")
+                values.append(value)
+            except (TypeError, OverflowError):
+                # a string, a boolean or an int beyond int64 among the numbers
+                self.values = values.tolist()
+                self.values.append(value)
+
+    def to_json(self):
+        values = self.values
+        if type(values) is list or values.typecode == 'd':
+            return json.dumps(values if type(values) is list else values.tolist(), separators=(',', ':'))
+        return "[" + ",".join(map(str, values)) + "]"
+
+
+class StatsSeries:
+    """Turns RTCStats snapshots into the series of a webrtc internals dump: one item per (pc, id, metric)
+       with its stats type, the times of its first and last sample and its samples as json text.
+       The samples of a metric are evenly spread between those times like the ones of chrome.
+       A series is only complete with the last snapshot, so the samples of the dump are held until then,
+       as typed Samples, and every item is turned into json text when it is yielded
+    """
+    def __init__(self):
+        # (pc, stats id) -> (stats type, {metric: [first ms, last ms, Samples]})
+        self._series = {}
+        self._update_logs = {}
+
+    def add_stats(self, pc_key, stats, timestamp=None):
+        """Add one RTCStats dictionary, timestamp in ms is used when it has none"""
+        stats_id, statsType = stats.get("id"), stats.get("type")
+        time = stats.get("timestamp", timestamp)
+        if stats_id is None or statsType is None or not isinstance(time, (int, float)):
+            return
+        series = self._series.get((pc_key, stats_id))
+        if series is None:
+            series = self._series[(pc_key, stats_id)] = (statsType, {})
+        metrics = series[1]
+        for name, value in stats.items():
+            metric = metrics.get(name)
+            if metric is not None:
+                metric[1] = time
+                metric[2].append(value)
+            elif name not in STATS_MEMBERS:
+                metrics[name] = [time, time, Samples(value)]
+
+    def set_update_log(self, pc_key, update_log):
+        self._update_logs[pc_key] = update_log
+
+    def iter_items(self):
+        for (pc_key, stats_id), (statsType, metrics) in self._series.items():
+            for name, (start, end, values) in metrics.items():
+                yield "stats", pc_key, f"{stats_id}-{name}", {
+                    "startTime": format_time(start),
+                    "endTime": format_time(end),
+                    "statsType": statsType,
+                    "values": values.to_json(),
+                }
+        for pc_key, update_log in self._update_logs.items():
+            yield "updateLog", pc_key, None, update_log
+
+
+# the first key of a chrome dump, PeerConnections may come after a long getUserMedia list
+CHROME_FIRST_KEY = re.compile(r'\s*\{\s*"(getUserMedia|PeerConnections|UserAgent)"')
+
+
+def _is_chrome(head):
+    return '"PeerConnections"' in head or CHROME_FIRST_KEY.match(head) is not None
+
+
+register_format(DumpFormat("chrome", _is_chrome, stream_parser.iter_webrtc_internals,
+                           load=json.load, walk_items=stream_parser.walk_webrtc_internals))
+
+
+def _is_firefox(head):
+    return '"reports"' in head and '"pcid"' in head
+
+
+def _firefox_update_log(report):
+    """setLocalDescription and setRemoteDescription events of the sdp history of a report"""
+    return [{"time": entry.get("timestamp"),
+             "type": "setLocalDescription" if entry.get("isLocal") else "setRemoteDescription",
+             "value": entry.get("sdp", "")}
+            for entry in report.get("sdpHistory") or [] if isinstance(entry, dict)]
+
+
+def iter_firefox_reports(fp):
+    """Items of a Firefox about:webrtc json export: {"reports": [report, ...]}, a report is a snapshot of
+       a peer connection with its stats in lists like inboundRtpStreamStats, one report after another
+       is read, several reports of a pcid are the samples of its series
+    """
+    reader = stream_parser.JsonStreamReader(fp)
+    series = StatsSeries()
+
+    def add_report(report):
+        if not isinstance(report, dict):
+            return
+        pc_key = str(report.get("pcid"))
+        for value in report.values():
+            if isinstance(value, list):
+                for stats in value:
+                    if isinstance(stats, dict):
+                        series.add_stats(pc_key, stats, report.get("timestamp"))
+        if "sdpHistory" in report:
+            series.set_update_log(pc_key, _firefox_update_log(report))
+
+    if reader.peek() == '[':
+        for report in reader.iter_array():
+            add_report(report)
+    else:
+        for key in reader.iter_object():
+            if key != "reports":
+                reader.read_value()
+                continue
+            for report in reader.iter_array():
+                add_report(report)
+    yield from series.iter_items()
+
+
+register_format(DumpFormat("firefox", _is_firefox, iter_firefox_reports))
+
+
+def _is_stats_lines(head):
+    line = head.lstrip().split("\n", 1)[0]
+    if not line.startswith(("{", "[")):
+        return False
+    try:
+        return isinstance(json.loads(line), (dict, list))
+    except ValueError:
+        return False
+
+
+def _iter_lines(fp, chunk_size=stream_parser.CHUNK_SIZE):
+    """lines of a stream which only has read(size), a line longer than a chunk is joined once"""
+    parts = []
+    for chunk in iter(lambda: fp.read(chunk_size), ""):
+        lines = chunk.split("\n")
+        if len(lines) == 1:
+            parts.append(chunk)
+            continue
+        parts.append(lines[0])
+        yield "".join(parts)
+        yield from lines[1:-1]
+        parts = [lines[-1]]
+    yield "".join(parts)
+
+
+def iter_stats_lines(fp):
+    """Items of RTCStatsReport json lines, one getStats() snapshot per line, either
+       {"pc": <pc>, "timestamp": <ms>, "stats": [...] or {id: stats}, "updateLog": [...]},
+       a bare {id: stats} of Object.fromEntries(report), or a bare list of stats
+    """
+    series = StatsSeries()
+    update_logs = {}
+    for line in _iter_lines(fp):
+        line = line.strip()
+        if not line:
+            continue
+        snapshot = json.loads(line)
+        pc_key, timestamp = "0", None
+        if isinstance(snapshot, dict) and ("stats" in snapshot or "report" in snapshot):
+            pc_key = str(snapshot.get("pc", snapshot.get("pcid", pc_key)))
+            timestamp = snapshot.get("timestamp")
+            update_logs.setdefault(pc_key, []).extend(snapshot.get("updateLog") or [])
+            snapshot = snapshot.get("stats", snapshot.get("report"))
+        for stats in snapshot.values() if isinstance(snapshot, dict) else snapshot or []:
+            if isinstance(stats, dict):
+                series.add_stats(pc_key, stats, timestamp)
+    for pc_key, update_log in update_logs.items():
+        series.set_update_log(pc_key, update_log)
+    yield from series.iter_items()
+
+
+register_format(DumpFormat("jsonl", _is_stats_lines, iter_stats_lines))
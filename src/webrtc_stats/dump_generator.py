@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import argparse
+import functools
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+LOG_TIME_FORMAT = '%m/%d/%Y, %I:%M:%S %p'
+
+# (id prefix, metric names) of each stats type, the kind of metric decides how its samples look
+STATS_TYPES = {
+    "inbound-rtp": ("IT01V", ["bytesReceived", "[bytesReceived_in_bits/s]", "packetsReceived", "[packetsReceived/s]",
+                              "packetsLost", "jitter", "framesDecoded", "[framesDecoded/s]", "framesPerSecond",
+                              "frameWidth", "keyFramesDecoded", "nackCount", "pliCount", "freezeCount",
+                              "jitterBufferDelay", "jitterBufferEmittedCount", "totalAudioEnergy",
+                              "totalSamplesDuration", "ssrc", "kind", "codecId"]),
+    "outbound-rtp": ("OT01V", ["bytesSent", "[bytesSent_in_bits/s]", "packetsSent", "[packetsSent/s]",
+                               "retransmittedPacketsSent", "[retransmittedPacketsSent/s]", "framesEncoded",
+                               "[framesEncoded/s]", "framesPerSecond", "frameWidth", "keyFramesEncoded",
+                               "nackCount", "pliCount", "ssrc", "kind", "codecId"]),
+    "remote-inbound-rtp": ("RIV", ["jitter", "roundTripTime", "fractionLost", "packetsLost", "ssrc", "kind"]),
+    "candidate-pair": ("CP", ["availableOutgoingBitrate", "availableIncomingBitrate", "bytesSent",
+                              "[bytesSent_in_bits/s]", "bytesReceived", "[bytesReceived_in_bits/s]",
+                              "currentRoundTripTime", "nominated", "state", "localCandidateId", "remoteCandidateId"]),
+    "local-candidate": ("I", ["ip", "port", "protocol", "candidateType"]),
+    "remote-candidate": ("I", ["ip", "port", "protocol", "candidateType"]),
+    "codec": ("CIT01_", ["mimeType", "clockRate", "payloadType"]),
+    "transport": ("T01", ["bytesSent", "bytesReceived", "dtlsState", "selectedCandidatePairChanges"]),
+}
+
+STRING_VALUES = {
+    "kind": ["video", "audio"],
+    "state": ["succeeded"],
+    "protocol": ["udp", "tcp"],
+    "candidateType": ["host", "srflx", "relay"],
+    "mimeType": ["video/VP8", "video/H264", "audio/opus"],
+    "dtlsState": ["connected"],
+    "ip": ["10.224.34.19", "192.168.1.8", "172.16.0.3"],
+}
+
+# metrics whose values are the id of another stats entry
+REFERENCES = {
+    "localCandidateId": "local-candidate",
+    "remoteCandidateId": "remote-candidate",
+    "codecId": "codec",
+}
+
+# stats list of a Firefox about:webrtc report of each stats type
+FIREFOX_STATS_LISTS = {
+    "inbound-rtp": "inboundRtpStreamStats",
+    "outbound-rtp": "outboundRtpStreamStats",
+    "remote-inbound-rtp": "remoteInboundRtpStreamStats",
+    "candidate-pair": "iceCandidatePairStats",
+    "local-candidate": "iceCandidateStats",
+    "remote-candidate": "iceCandidateStats",
+    "codec": "codecStats",
+    "transport": "transportStats",
+}
+DUMP_FORMATS = ["chrome", "firefox", "jsonl"]
+
+UPDATE_LOG_TYPES = ["createOffer", "setLocalDescription", "setRemoteDescription", "icecandidate",
+                    "iceconnectionstatechange", "connectionstatechange", "signalingstatechange"]
+
+
+def generate_values(name, sample_count, rng, stats_ids):
+    """Samples of a metric: counters grow, rates and gauges move around, ids and strings stay the same"""
+    if name in STRING_VALUES:
+        return [rng.choice(STRING_VALUES[name])] * sample_count
+    if name in REFERENCES:
+        return [rng.choice(stats_ids[REFERENCES[name]])] * sample_count
+    if name == "nominated":
+        return [True] * sample_count
+    if name in ("ssrc", "port", "clockRate", "payloadType", "frameWidth"):
+        return [rng.randint(1, 1 << 16)] * sample_count
+    if name in ("jitter", "roundTripTime", "currentRoundTripTime", "fractionLost", "totalAudioEnergy",
+                "jitterBufferDelay", "totalSamplesDuration"):
+        return [round(rng.random() * 0.2, 6) for _ in range(sample_count)]
+    if name.startswith("[") or name.startswith("available") or name == "framesPerSecond":
+        base = rng.randint(10, 2000000)
+        return [max(0, base + rng.randint(-base // 10, base // 10)) for _ in range(sample_count)]
+    value = rng.randint(0, 1000)
+    values = []
+    for _ in range(sample_count):
+        value += rng.randint(0, 1000)
+        values.append(value)
+    return values
+
+
+def write_dump(file_name, pc_count=1, ids_per_type=2, metrics_per_id=None, sample_count=600,
+               log_count=20, interval=1.0, seed=0, start_time=None):
+    """Write a synthetic webrtc internals dump in the PeerConnections/<pc>/stats/<id-name> layout
+       pc_count peer connections, each with ids_per_type stats ids of every stats type,
+       up to metrics_per_id metrics per id and sample_count samples per metric
+    """
+    rng = random.Random(seed)
+    start_time = start_time or datetime(2023, 2, 18, 8, 0, 0, tzinfo=timezone.utc)
+    end_time = start_time + timedelta(seconds=interval * (sample_count - 1))
+    start_str = start_time.strftime(TIME_FORMAT)
+    end_str = end_time.strftime(TIME_FORMAT)
+
+    with open(file_name, 'w', encoding='utf_8') as f:
+        f.write('{\n "getUserMedia": [],\n "PeerConnections": {\n')
+        for pc_index in range(pc_count):
+            pc_key = f"{1000 + pc_index}-1"
+            f.write('  {}: {{\n   "constraints": "",\n   "rtcConfiguration": "{{}}",\n   "stats": {{\n'.format(json.dumps(pc_key)))
+            stats_ids = {statsType: [f"{id_prefix}{rng.randint(1 << 28, 1 << 31)}" for _ in range(ids_per_type)]
+                         for statsType, (id_prefix, names) in STATS_TYPES.items()}
+            separator = ''
+            for statsType, (id_prefix, names) in STATS_TYPES.items():
+                for stats_id in stats_ids[statsType]:
+                    for name in names[:metrics_per_id]:
+                        values = generate_values(name, sample_count, rng, stats_ids)
+                        entry = {
+                            "endTime": end_str,
+                            "startTime": start_str,
+                            "statsType": statsType,
+                            "values": json.dumps(values, separators=(',', ':')),
+                        }
+                        f.write('{}    {}: {}'.format(separator, json.dumps(f"{stats_id}-{name}"), json.dumps(entry)))
+                        separator = ',\n'
+            f.write('\n   },\n   "updateLog": [\n')
+            for log_index in range(log_count):
+                log_time = start_time + timedelta(seconds=interval * sample_count * log_index / max(log_count, 1))
+                entry = {"time": log_time.strftime(LOG_TIME_FORMAT),
+                         "type": UPDATE_LOG_TYPES[log_index % len(UPDATE_LOG_TYPES)],
+                         "value": ""}
+                f.write('{}    {}'.format(',\n' if log_index > 0 else '', json.dumps(entry)))
+            f.write('\n   ],\n   "url": "https://example.com/call"\n  }')
+            f.write(',\n' if pc_index < pc_count - 1 else '\n')
+        f.write(' },\n "UserAgent": "Mozilla/5.0 (synthetic)"\n}\n')
+
+
+def write_snapshots(file_name, dump_format="firefox", pc_count=1, ids_per_type=2, metrics_per_id=None,
+                    sample_count=600, interval=1.0, seed=0, start_time=None):
+    """Write the synthetic stats as getStats() snapshots instead of series: a Firefox about:webrtc export
+       with one report per peer connection and sample, or RTCStatsReport json lines with one snapshot per line
+       ids contain dashes like the ones of Firefox, the metrics chrome computes like "[bytesSent_in_bits/s]" are left out
+    """
+    rng = random.Random(seed)
+    start_time = start_time or datetime(2023, 2, 18, 8, 0, 0, tzinfo=timezone.utc)
+    start_ms = start_time.timestamp() * 1000
+
+    with open(file_name, 'w', encoding='utf_8') as f:
+        if dump_format == "firefox":
+            f.write('{"reports": [\n')
+        separator = ''
+        for pc_index in range(pc_count):
+            pc_key = f"{{{rng.getrandbits(32):08x}-{1000 + pc_index}}}"
+            stats_ids = {statsType: [f"{rng.getrandbits(32):08x}-{rng.getrandbits(16):04x}" for _ in range(ids_per_type)]
+                         for statsType in STATS_TYPES}
+            series = [(statsType, stats_id, {name: generate_values(name, sample_count, rng, stats_ids)
+                                             for name in names[:metrics_per_id] if not name.startswith("[")})
+                      for statsType, (id_prefix, names) in STATS_TYPES.items() for stats_id in stats_ids[statsType]]
+            for sample in range(sample_count):
+                timestamp = start_ms + interval * 1000 * sample
+                snapshot = [dict({"id": stats_id, "type": statsType, "timestamp": timestamp},
+                                 **{name: values[sample] for name, values in metrics.items()})
+                            for statsType, stats_id, metrics in series]
+                if dump_format == "firefox":
+                    report = {"pcid": pc_key, "timestamp": timestamp}
+                    for stats in snapshot:
+                        report.setdefault(FIREFOX_STATS_LISTS[stats["type"]], []).append(stats)
+                    f.write(separator + json.dumps(report))
+                    separator = ',\n'
+                else:
+                    f.write(json.dumps({"pc": pc_key, "timestamp": timestamp, "stats": snapshot}) + '\n')
+        if dump_format == "firefox":
+            f.write('\n]}\n')
+
+
+def write_dump_of_size(file_name, size_mb, sample_count=600, seed=0, dump_format="chrome"):
+    """Write a dump of about size_mb by growing the number of peer connections, return that number"""
+    if dump_format == "chrome":
+        write = write_dump
+    else:
+        write = functools.partial(write_snapshots, dump_format=dump_format)
+    write(file_name, pc_count=1, sample_count=sample_count, seed=seed)
+    pc_size = os.path.getsize(file_name)
+    pc_count = max(1, round(size_mb * 1024 * 1024 / pc_size))
+    write(file_name, pc_count=pc_count, sample_count=sample_count, seed=seed)
+    return pc_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', action='store', dest='output_file', required=True,
+                        help='output webrtc dump file, e.g. samples/receiver_webrtc_internals_dump.txt')
+    parser.add_argument('-p', action='store', dest='pc_count', type=int, default=1, help='number of peer connections')
+    parser.add_argument('-i', action='store', dest='ids_per_type', type=int, default=2,
+                        help='number of stats ids of each stats type')
+    parser.add_argument('-m', action='store', dest='metrics_per_id', type=int, default=None,
+                        help='max number of metrics of each stats id')
+    parser.add_argument('-s', action='store', dest='sample_count', type=int, default=600,
+                        help='number of samples of each metric')
+    parser.add_argument('--size', action='store', dest='size_mb', type=int, default=None,
+                        help='approximate size in MB, overrides the number of peer connections')
+    parser.add_argument('-f', action='store', dest='dump_format', choices=DUMP_FORMATS, default="chrome",
+                        help='chrome webrtc internals dump, firefox about:webrtc export or RTCStatsReport json lines')
+    args = parser.parse_args()
+
+    if args.size_mb:
+        write_dump_of_size(args.output_file, args.size_mb, args.sample_count, dump_format=args.dump_format)
+    elif args.dump_format == "chrome":
+        write_dump(args.output_file, args.pc_count, args.ids_per_type, args.metrics_per_id, args.sample_count)
+    else:
+        write_snapshots(args.output_file, args.dump_format, args.pc_count, args.ids_per_type, args.metrics_per_id,
+                        args.sample_count)
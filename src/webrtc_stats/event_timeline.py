@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import numpy as np
+import pandas as pd
+
+EVENT_COLUMNS = ["time", "pc", "type", "value"]
+
+# update log types of the ICE, DTLS and signaling state machines, their value is the new state
+STATE_CHANGE_TYPES = ["iceconnectionstatechange", "icegatheringstatechange", "connectionstatechange",
+                      "signalingstatechange"]
+
+# time of the update log entries of chrome, e.g. "2/18/2023, 8:00:00 AM", the local time of the browser
+LOG_TIME_FORMAT = '%m/%d/%Y, %I:%M:%S %p'
+# time zones are whole quarters of an hour, an inferred offset is rounded to it
+OFFSET_STEP = pd.Timedelta(minutes=15)
+_OFFSET_PATTERN = re.compile(r'^([+-])(\d{1,2}):?(\d{2})$')
+
+_NO_POSITIONS = np.array([], dtype=np.intp)
+
+
+def new_event_columns():
+    """raw update log entries as column lists, the way they are collected while parsing"""
+    return {column: [] for column in EVENT_COLUMNS}
+
+
+def append_update_log(events, pc_key, update_log):
+    """Append the updateLog entries of a peer connection to the event columns"""
+    for entry in update_log or []:
+        if not isinstance(entry, dict):
+            continue
+        value = entry.get("value", "")
+        events["time"].append(entry.get("time"))
+        events["pc"].append(pc_key)
+        events["type"].append(entry.get("type"))
+        events["value"].append(value if isinstance(value, str) else json.dumps(value))
+
+
+def to_utc_offset(offset):
+    """Timedelta of a local time minus UTC: "+02:00", "-0530", "2h", "-90min", a Timedelta or hours"""
+    if offset is None or isinstance(offset, pd.Timedelta):
+        return offset
+    if isinstance(offset, (int, float)):
+        return pd.Timedelta(hours=offset)
+    match = _OFFSET_PATTERN.match(str(offset).strip())
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = pd.Timedelta(hours=int(hours), minutes=int(minutes))
+        return -offset if sign == '-' else offset
+    return pd.Timedelta(offset)
+
+
+def infer_utc_offset(local_times, utc_times):
+    """UTC offset of the browser from a log with both kinds of times: the local time of an entry minus the
+       UTC time of its neighbour in the log, the median rounded to a quarter of an hour, None without such pairs
+       local_times and utc_times are naive, NaT where the entry has the other kind of time
+    """
+    local = local_times.values.astype('datetime64[ns]').astype(np.int64)
+    utc = utc_times.values.astype('datetime64[ns]').astype(np.int64)
+    nat = np.iinfo(np.int64).min
+    # a local entry with the entry in ms since epoch before it, then with the one after it
+    differences = np.concatenate([
+        (local[1:] - utc[:-1])[(local[1:] != nat) & (utc[:-1] != nat)],
+        (local[:-1] - utc[1:])[(local[:-1] != nat) & (utc[1:] != nat)],
+    ])
+    if len(differences) == 0:
+        return None
+    return pd.Timedelta(int(np.median(differences))).round(OFFSET_STEP)
+
+
+def parse_log_times(times, utc_offset=None):
+    """UTC timestamps of update log times: ms since epoch, date strings with a time zone, or chrome's
+       "2/18/2023, 8:00:00 AM" strings which are the local time of the browser without a time zone
+       utc_offset: that local time minus UTC, see to_utc_offset; by default it is inferred from the entries
+       in ms since epoch next to local ones, the local times are taken as UTC if there are none
+    """
+    times = pd.Series(times, dtype=object)
+    numbers = pd.to_numeric(times, errors='coerce')
+    result = pd.Series(pd.to_datetime(numbers, unit='ms', utc=True), index=times.index)
+    strings = numbers.isna() & times.notna()
+    if strings.any():
+        local = pd.Series(pd.NaT, index=times.index, dtype='datetime64[ns]')
+        local[strings] = pd.to_datetime(times[strings], format=LOG_TIME_FORMAT, errors='coerce')
+        others = strings & local.isna()
+        if others.any():
+            result[others] = pd.to_datetime(times[others], format='mixed', errors='coerce', utc=True)
+        utc_offset = to_utc_offset(utc_offset)
+        if utc_offset is None:
+            utc_offset = infer_utc_offset(local, result.dt.tz_convert(None)) or pd.Timedelta(0)
+        chrome = local.notna()
+        result[chrome] = (local[chrome] - utc_offset).dt.tz_localize('UTC')
+    return result.astype('datetime64[ns, UTC]')
+
+
+def to_datetime64(time):
+    """numpy UTC datetime64 of a Timestamp, datetime or date string, naive times are taken as UTC"""
+    time = pd.Timestamp(time)
+    if time.tzinfo is not None:
+        time = time.tz_convert('UTC').tz_localize(None)
+    return time.to_datetime64().astype('datetime64[ns]')
+
+
+class EventTimeline:
+    """The updateLog events of all peer connections in one time sorted table: time, pc, type, value
+       indexed by pc, by type and by (pc, type), the events of a time window are found by binary search
+    """
+    def __init__(self, events=None, utc_offset=None):
+        events = events or new_event_columns()
+        events_df = pd.DataFrame({
+            "time": parse_log_times(events["time"], utc_offset),
+            "pc": pd.Categorical(events["pc"]),
+            "type": pd.Categorical(events["type"]),
+            "value": pd.Series(events["value"], dtype=object),
+        }, columns=EVENT_COLUMNS)
+        # stable: the events of the same second keep their order of the log, events without a time go last
+        self._events_df = events_df.sort_values("time", kind="stable", na_position="last").reset_index(drop=True)
+        self._times = self._events_df["time"].dt.tz_convert(None).values
+
+        # positions are ascending, so the times of every group are sorted too
+        self._by_pc = {}
+        self._by_type = {}
+        self._by_pc_type = {}
+        if len(self._events_df) > 0:
+            self._by_pc = self._events_df.groupby("pc", sort=False, observed=True).indices
+            self._by_type = self._events_df.groupby("type", sort=False, observed=True).indices
+            self._by_pc_type = self._events_df.groupby(["pc", "type"], sort=False, observed=True).indices
+
+    def __len__(self):
+        return len(self._events_df)
+
+    def get_events(self):
+        return self._events_df
+
+    def get_pcs(self):
+        return list(self._by_pc.keys())
+
+    def get_types(self):
+        return list(self._by_type.keys())
+
+    def _get_positions(self, pc=None, type=None):
+        """positions of the events of pc and type, None for all the events"""
+        if pc is not None and type is not None:
+            return self._by_pc_type.get((pc, type), _NO_POSITIONS)
+        if pc is not None:
+            return self._by_pc.get(pc, _NO_POSITIONS)
+        if type is not None:
+            return self._by_type.get(type, _NO_POSITIONS)
+        return None
+
+    def get_window_positions(self, start=None, end=None, pc=None, type=None):
+        """row positions of the events in [start, end], optionally of one pc and one type"""
+        positions = self._get_positions(pc, type)
+        times = self._times if positions is None else self._times[positions]
+        lo = 0 if start is None else int(np.searchsorted(times, to_datetime64(start), side='left'))
+        if end is None:
+            # events without a time are only returned when there is no time range
+            hi = len(times) if start is None else int(np.searchsorted(times, np.datetime64('NaT'), side='left'))
+        else:
+            hi = int(np.searchsorted(times, to_datetime64(end), side='right'))
+        if positions is None:
+            return np.arange(lo, max(lo, hi))
+        return positions[lo:hi]
+
+    def get_window(self, start=None, end=None, pc=None, type=None):
+        """events in [start, end] as a DataFrame, start and end are Timestamps or date strings, naive ones are UTC"""
+        return self._events_df.iloc[self.get_window_positions(start, end, pc, type)]
+
+    def get_state_changes(self, pc=None, types=STATE_CHANGE_TYPES):
+        """state transitions of the ICE, DTLS and signaling state machines: time, pc, type, previous, state"""
+        frames = []
+        for type in types:
+            events_df = self._events_df.iloc[self._get_positions(pc, type)]
+            if len(events_df) == 0:
+                continue
+            states = events_df["value"].str.strip('"')
+            frames.append(pd.DataFrame({"time": events_df["time"], "pc": events_df["pc"], "type": events_df["type"],
+                                        "previous": states.groupby(events_df["pc"], observed=True).shift(1),
+                                        "state": states}))
+        if not frames:
+            return pd.DataFrame(columns=["time", "pc", "type", "previous", "state"])
+        return pd.concat(frames).sort_index(kind="stable")
+
+    def memory_usage(self):
+        return int(self._events_df.memory_usage(deep=True).sum())
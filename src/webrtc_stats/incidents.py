@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from . import analyzer_util
+from . import values_decoder
+from .yaml_config import YamlConfig
+
+DEFAULT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analyzer.yaml")
+CONFIG_KEY = "incident_rules"
+
+# samples of the rolling baseline, and of each side of a level shift
+DEFAULT_WINDOW = 20
+# z-score of a spike or a drop against the rolling baseline
+DEFAULT_THRESHOLD = 4.0
+# t statistic of the mean of the window after a sample against the window before it
+DEFAULT_SHIFT_THRESHOLD = 6.0
+# the spread of a baseline is at least this fraction of its level, so that flat series do not alert on noise
+RELATIVE_SCALE = 0.05
+MIN_SCALE = 1e-9
+LEVEL_SHIFT = "level-shift"
+# severity of an incident by its score in multiples of the threshold
+SEVERITIES = [(4, "critical"), (2, "major"), (1, "minor")]
+
+INCIDENT_COLUMNS = ["pc", "statsType", "id", "name", "incident", "severity", "score", "start", "end", "samples",
+                    "peak", "baseline"]
+
+DIRECTIONS = {"up": 1, "down": -1}
+
+
+def get_severity(ratios):
+    """severity label of scores divided by their threshold"""
+    severity = np.full(len(ratios), SEVERITIES[-1][1], dtype=object)
+    for multiple, label in reversed(SEVERITIES):
+        severity[ratios >= multiple] = label
+    return severity
+
+
+class _Segments:
+    """Series laid end to end in one flat array, series i is values[offsets[i]:offsets[i+1]]
+       every window sum is the difference of two cumulative sums, so the scans are linear in the samples
+    """
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+        self.lengths = np.diff(offsets)
+        self.series = np.repeat(np.arange(len(self.lengths)), self.lengths)
+        self.begin = np.repeat(offsets[:-1], self.lengths)
+        self.end = np.repeat(offsets[1:], self.lengths)
+        self.positions = np.arange(len(values))
+
+    def diff(self, values):
+        """change since the previous sample of the series, NaN for its first sample"""
+        result = np.full(len(values), np.nan)
+        result[1:] = values[1:] - values[:-1]
+        result[self.offsets[:-1][self.lengths > 0]] = np.nan
+        return result
+
+    def reduce(self, ufunc, values):
+        """ufunc of every series, 0 for the empty ones"""
+        result = np.zeros(len(self.lengths), dtype=values.dtype)
+        non_empty = self.lengths > 0
+        result[non_empty] = ufunc.reduceat(values, self.offsets[:-1][non_empty])
+        return result
+
+    def window_stats(self, values, lo, hi):
+        """count, mean and variance of the valid samples in [lo, hi) of every position"""
+        valid = ~np.isnan(values)
+        # the cumulative sums run over all the series: every series is standardized first,
+        # else the sums of squares of the byte counters swallow the small metrics such as jitter
+        counts = self.reduce(np.add, valid.astype(np.int64))
+        means = self.reduce(np.add, np.where(valid, values, 0)) / np.maximum(counts, 1)
+        centered = np.where(valid, values - means[self.series], 0)
+        scales = np.sqrt(self.reduce(np.add, centered * centered) / np.maximum(counts, 1))
+        scales[scales == 0] = 1
+        normalized = centered / scales[self.series]
+        c0 = np.concatenate([[0], np.cumsum(valid)])
+        c1 = np.concatenate([[0], np.cumsum(normalized)])
+        c2 = np.concatenate([[0], np.cumsum(normalized * normalized)])
+        count = c0[hi] - c0[lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = (c1[hi] - c1[lo]) / count
+            var = np.maximum((c2[hi] - c2[lo]) / count - mean * mean, 0)
+        scale = scales[self.series]
+        return count, mean * scale + means[self.series], var * scale * scale
+
+
+class IncidentDetector:
+    """Incidents of every numeric series of a dump, e.g. a loss burst of a SSRC or a frame rate collapse
+       the metrics of incident_rules are scanned for spikes or drops against a rolling baseline,
+       the other metrics for level shifts, cumulative counters are scanned as rates
+       all the series are scanned at once in a flat array, in linear time of the samples
+    """
+    def __init__(self, config=None, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                 shift_threshold=DEFAULT_SHIFT_THRESHOLD, scan_all=True):
+        if config is None or isinstance(config, str):
+            config = YamlConfig(config or DEFAULT_CONFIG_FILE).get_config().get(CONFIG_KEY, {})
+        self._rules = {}
+        for statsType, rules in config.items():
+            for name, rule in (rules or {}).items():
+                direction = rule.get("direction", "up")
+                if direction not in DIRECTIONS:
+                    raise ValueError(f"unknown direction {direction} of {statsType} {name}, expect up or down")
+                self._rules[(statsType, name)] = rule
+        self._window = window
+        self._threshold = threshold
+        self._shift_threshold = shift_threshold
+        # scan the metrics without a rule for level shifts
+        self._scan_all = scan_all
+
+    def get_rules(self, statsType):
+        return {name: rule for (type, name), rule in self._rules.items() if type == statsType}
+
+    def _get_series(self, stats_df, decoded):
+        """positions of the numeric series in stats_df, their samples, sample times in ns and rule of each"""
+        lengths = np.diff(decoded.offsets)
+        rule_indexes = np.array([key in self._rules for key in
+                                 zip(stats_df["statsType"].astype(str), stats_df["name"].astype(str))], dtype=bool)
+        numeric = np.isin(decoded.kinds, [values_decoder.KIND_INT, values_decoder.KIND_FLOAT]) & (lengths > 2)
+        if not self._scan_all:
+            numeric &= rule_indexes
+        indexes = np.flatnonzero(numeric)
+
+        values = decoded.buffer[np.repeat(numeric, lengths)]
+        offsets = np.zeros(len(indexes) + 1, dtype=np.int64)
+        np.cumsum(lengths[indexes], out=offsets[1:])
+        segments = _Segments(values, offsets)
+
+        # samples are evenly spread between the start and the end time, one second apart when the end is unknown
+        starts = stats_df["startTime"].values[indexes].astype('datetime64[ns]').astype(np.int64)
+        ends = stats_df["endTime"].values[indexes].astype('datetime64[ns]').astype(np.int64)
+        times, _ = analyzer_util.get_sample_times(starts, ends, segments.lengths)
+        return indexes, segments, times, rule_indexes[indexes]
+
+    def _extend_incidents(self, values, spikes, z, mean, scale, end, series, direction, min_value, max_ratio):
+        """(flags, baseline, z) with every incident tested against the baseline of its first sample until a sample
+           is not anomalous against it, a spike within an incident is a part of it
+           one forward scan: a loop per incident, its extent is found in growing slices, so each sample is tested
+           a bounded number of times and the scan stays linear in the samples
+        """
+        flags = spikes.copy()
+        baseline = mean.copy()
+        z = z.copy()
+        candidates = np.flatnonzero(spikes)
+        i = 0
+        while i < len(candidates):
+            start = candidates[i]
+            s, series_end, level = series[start], end[start], mean[start]
+            last = start
+            size = max(self._window, 1)
+            while last + 1 < series_end:
+                lo, hi = last + 1, min(last + 1 + size, series_end)
+                run_values = values[lo:hi]
+                with np.errstate(invalid='ignore'):
+                    run_z = direction[s] * (run_values - level) / scale[start]
+                    holds = run_z > self._threshold
+                    holds &= np.isnan(min_value[s]) | (run_values >= min_value[s])
+                    holds &= np.isnan(max_ratio[s]) | (run_values <= max_ratio[s] * level)
+                count = len(holds) if holds.all() else int(np.argmin(holds))
+                flags[lo:lo + count] = True
+                baseline[lo:lo + count] = level
+                z[lo:lo + count] = run_z[:count]
+                last += count
+                if count < len(holds):
+                    break
+                size *= 2
+            # the spikes within the incident are a part of it
+            i = np.searchsorted(candidates, last + 1)
+        return flags, baseline, z
+
+    def detect(self, analyzer):
+        """DataFrame of the incidents of a parsed dump, sorted by start time
+           score is the largest z-score (t statistic of level shifts), peak the worst value of the incident
+           and baseline the rolling mean before it, which stays the same while the incident lasts
+        """
+        stats_df = analyzer.get_webrtc_stats()
+        if len(stats_df) == 0:
+            return pd.DataFrame(columns=INCIDENT_COLUMNS)
+        indexes, segments, times, has_rule = self._get_series(stats_df, analyzer.get_decoded_values())
+        if len(indexes) == 0:
+            return pd.DataFrame(columns=INCIDENT_COLUMNS)
+
+        keys = list(zip(stats_df["statsType"].values[indexes].astype(str), stats_df["name"].values[indexes].astype(str)))
+        rules = [self._rules.get(key, {}) for key in keys]
+        direction = np.array([DIRECTIONS[rule.get("direction", "up")] for rule in rules], dtype=np.float64)
+        min_value = np.array([rule.get("min_value", np.nan) for rule in rules], dtype=np.float64)
+        max_ratio = np.array([rule.get("max_ratio", np.nan) for rule in rules], dtype=np.float64)
+
+        # cumulative counters are scanned as their change per second: the ones of a rule with rate: true,
+        # and every non-decreasing series which is not already a rate
+        values = segments.values
+        deltas = segments.diff(values)
+        decreasing = segments.reduce(np.add, (deltas < 0).astype(np.int64))
+        is_rate = np.array([name.startswith("[") for _, name in keys], dtype=bool)
+        counter = np.where(has_rule, [bool(rule.get("rate", False)) for rule in rules],
+                           (decreasing == 0) & ~is_rate & (segments.reduce(np.add, np.nan_to_num(deltas)) > 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = deltas / (segments.diff(times.astype(np.float64)) / 1e9)
+        values = np.where(counter[segments.series], rates, values)
+        values[~np.isfinite(values)] = np.nan
+
+        window = self._window
+        positions, begin, end, series = segments.positions, segments.begin, segments.end, segments.series
+
+        # spikes and drops of the rule metrics against the trailing window, the sample itself excluded
+        count, mean, var = segments.window_stats(values, np.maximum(begin, positions - window), positions)
+        scale = np.maximum(np.maximum(np.sqrt(var), RELATIVE_SCALE * np.abs(mean)), MIN_SCALE)
+        with np.errstate(invalid='ignore'):
+            z = direction[series] * (values - mean) / scale
+            spikes = has_rule[series] & (count >= max(window // 2, 2)) & (z > self._threshold)
+            spikes &= np.isnan(min_value[series]) | (values >= min_value[series])
+            spikes &= np.isnan(max_ratio[series]) | (values <= max_ratio[series] * mean)
+
+        # an open incident keeps the baseline of its first sample, the trailing window would absorb
+        # a sustained spike or drop within a few samples and only its start would be flagged
+        spikes, baseline, z = self._extend_incidents(values, spikes, z, mean, scale, end, series,
+                                                     direction, min_value, max_ratio)
+
+        # level shifts of the other metrics, both windows inside the series
+        shifts = np.zeros(len(values), dtype=bool)
+        t = np.zeros(len(values))
+        after_mean = np.full(len(values), np.nan)
+        if self._scan_all:
+            inside = ~has_rule[series] & (positions - window >= begin) & (positions + window <= end)
+            hi = np.where(inside, positions + window, positions)
+            count_b, mean_b, var_b = count, mean, var
+            count_a, after_mean, var_a = segments.window_stats(values, positions, hi)
+            floor = RELATIVE_SCALE * np.maximum(np.abs(mean_b), np.abs(after_mean)) + MIN_SCALE
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.abs(after_mean - mean_b) / np.sqrt(var_b / count_b + var_a / count_a + floor * floor)
+                shifts = inside & (count_b == window) & (count_a == window) & (t > self._shift_threshold)
+
+        flags = spikes | shifts
+        scores = np.where(spikes, z, t)
+        flagged = np.flatnonzero(flags)
+        if len(flagged) == 0:
+            return pd.DataFrame(columns=INCIDENT_COLUMNS)
+
+        # consecutive flagged samples of a series make one incident
+        run_begins = np.ones(len(flagged), dtype=bool)
+        run_begins[1:] = (np.diff(flagged) != 1) | (series[flagged[1:]] != series[flagged[:-1]])
+        run_starts = np.flatnonzero(run_begins)
+        run_ends = np.append(run_starts[1:], len(flagged)) - 1
+        run_scores = np.maximum.reduceat(scores[flagged], run_starts)
+        # the first sample of the largest score of every run
+        candidates = np.where(scores[flagged] == np.repeat(run_scores, np.diff(np.append(run_starts, len(flagged)))),
+                              np.arange(len(flagged)), len(flagged))
+        peaks = flagged[np.minimum.reduceat(candidates, run_starts)]
+        first, last = flagged[run_starts], flagged[run_ends]
+
+        rows = indexes[series[first]]
+        shift_runs = shifts[first]
+        thresholds = np.where(shift_runs, self._shift_threshold, self._threshold)
+        incidents = pd.DataFrame({
+            "pc": stats_df["pc"].values[rows],
+            "statsType": stats_df["statsType"].values[rows],
+            "id": stats_df["id"].values[rows],
+            "name": stats_df["name"].values[rows],
+            "incident": [LEVEL_SHIFT if shift else rules[s].get("incident", f"{keys[s][1]}-anomaly")
+                         for shift, s in zip(shift_runs, series[first])],
+            "severity": get_severity(run_scores / thresholds),
+            "score": np.round(run_scores, 3),
+            "start": pd.to_datetime(times[first], utc=True),
+            "end": pd.to_datetime(times[last], utc=True),
+            "samples": last - first + 1,
+            "peak": np.where(shift_runs, after_mean[peaks], values[peaks]),
+            "baseline": baseline[peaks],
+        }, columns=INCIDENT_COLUMNS)
+        return incidents.sort_values(["start", "score"], ascending=[True, False], kind="stable").reset_index(drop=True)
+
+
+def summarize_incidents(file_name):
+    """batch summary of a dump with its incident counts by incident and severity, for the fleet pipeline"""
+    from .analyzer import WebrtcInternalsAnalyzer
+    from .batch import summarize_analyzer
+
+    analyzer = WebrtcInternalsAnalyzer()
+    analyzer.parse(file_name, incremental=True)
+    summary = summarize_analyzer(analyzer)
+    incidents = IncidentDetector().detect(analyzer)
+    summary["incidents"] = {f"{incident}/{severity}": int(count) for (incident, severity), count in
+                            incidents.groupby(["incident", "severity"]).size().items()}
+    return summary
+
+
+if __name__ == "__main__":
+    from .analyzer import WebrtcInternalsAnalyzer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', action='store', dest='input_file', required=True, help='input webrtc dump file')
+    parser.add_argument('-c', action='store', dest='config_file', default=DEFAULT_CONFIG_FILE,
+                        help='yaml file with the incident_rules section')
+    parser.add_argument('-w', action='store', dest='window', type=int, default=DEFAULT_WINDOW,
+                        help='samples of the rolling window')
+    args = parser.parse_args()
+
+    analyzer = WebrtcInternalsAnalyzer()
+    analyzer.parse(args.input_file, incremental=True)
+    begin = time.time()
+    incidents = IncidentDetector(args.config_file, args.window).detect(analyzer)
+    elapsed = time.time() - begin
+    print(incidents.to_string())
+    print(f"{len(incidents)} incidents in {elapsed * 1000:.1f} ms")
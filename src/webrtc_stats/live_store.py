@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+import json
+import time
+from collections import deque
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from . import values_decoder
+from .stats_index import LOOKUP_COLUMNS
+
+# max number of samples kept for each metric, one snapshot per second is 10 minutes
+DEFAULT_WINDOW = 600
+
+# cumulative counters of RTCStats and the per second rates derived from them, named as webrtc-internals does
+RATE_METRICS = {
+    "bytesReceived": "[bytesReceived_in_bits/s]",
+    "bytesSent": "[bytesSent_in_bits/s]",
+    "headerBytesReceived": "[headerBytesReceived_in_bits/s]",
+    "headerBytesSent": "[headerBytesSent_in_bits/s]",
+    "retransmittedBytesSent": "[retransmittedBytesSent_in_bits/s]",
+    "packetsReceived": "[packetsReceived/s]",
+    "packetsSent": "[packetsSent/s]",
+    "retransmittedPacketsSent": "[retransmittedPacketsSent/s]",
+    "framesDecoded": "[framesDecoded/s]",
+    "framesEncoded": "[framesEncoded/s]",
+    "framesReceived": "[framesReceived/s]",
+    "framesSent": "[framesSent/s]",
+    "keyFramesDecoded": "[keyFramesDecoded/s]",
+    "keyFramesEncoded": "[keyFramesEncoded/s]",
+    "requestsReceived": "[requestsReceived/s]",
+    "requestsSent": "[requestsSent/s]",
+    "responsesReceived": "[responsesReceived/s]",
+    "responsesSent": "[responsesSent/s]",
+}
+
+_SKIPPED_FIELDS = ("id", "type", "timestamp")
+_INITIAL_CAPACITY = 64
+
+
+class RingBuffer:
+    """Samples of one numeric metric, the oldest ones are dropped beyond the window
+       Every sample is written twice so that the samples in time order are always a contiguous view
+    """
+    def __init__(self, window):
+        self._window = window
+        self._capacity = min(window, _INITIAL_CAPACITY)
+        self._times = np.empty(2 * self._capacity, dtype=np.int64)
+        self._values = np.empty(2 * self._capacity, dtype=np.float64)
+        self._start = 0
+        self._count = 0
+
+    def _grow(self):
+        times, values = self.view()
+        self._capacity = min(2 * self._capacity, self._window)
+        self._times = np.empty(2 * self._capacity, dtype=np.int64)
+        self._values = np.empty(2 * self._capacity, dtype=np.float64)
+        self._times[:self._count] = times
+        self._values[:self._count] = values
+        self._start = 0
+
+    def append(self, time_ns, value):
+        if self._count == self._capacity and self._capacity < self._window:
+            self._grow()
+        end = (self._start + self._count) % self._capacity
+        if self._count == self._capacity:
+            self._start = (self._start + 1) % self._capacity
+        else:
+            self._count += 1
+        self._times[end] = self._times[end + self._capacity] = time_ns
+        self._values[end] = self._values[end + self._capacity] = value
+
+    def view(self):
+        """(times in ns, values) in time order, views on the buffer without copy"""
+        end = self._start + self._count
+        return self._times[self._start:end], self._values[self._start:end]
+
+    def __len__(self):
+        return self._count
+
+
+class ObjectRing:
+    """Samples of one metric with string values, e.g. kind or codecId"""
+    def __init__(self, window):
+        self._samples = deque(maxlen=window)
+
+    def append(self, time_ns, value):
+        self._samples.append((time_ns, value))
+
+    def view(self):
+        times = np.fromiter((sample[0] for sample in self._samples), dtype=np.int64, count=len(self._samples))
+        return times, [sample[1] for sample in self._samples]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class LiveStatsStore(Mapping):
+    """Rolling store of getStats() snapshots
+       Mapping of metrics key (id-name) to "timestamp, value" DataFrame like _media_stats,
+       the memory is bounded by window samples per metric
+       It is also the StatsIndex of the live stats: a metric gets its row position when it first appears,
+       the lookups only read the ring buffers of the metrics they return
+    """
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._window = window
+        self._buffers = {}
+        # key -> (pc, id, name, statsType)
+        self._metadata = {}
+        # keys in order of appearance, a key is at this row of the live stats table
+        self._keys = []
+        # (statsType, name), (id, name) and (statsType, id) -> row positions
+        self._by_type_name = {}
+        self._by_id_name = {}
+        self._by_type_id = {}
+        # key -> value dtype
+        self._dtypes = {}
+        # counter key -> (time_ns, value) of the previous snapshot
+        self._last_counters = {}
+        self._ids_by_type = {}
+        self.snapshot_count = 0
+
+    @staticmethod
+    def _iter_stats(snapshot):
+        if isinstance(snapshot, (str, bytes)):
+            snapshot = json.loads(snapshot)
+        if isinstance(snapshot, dict):
+            # {id: stats} as from Object.fromEntries(report), or a single stats dict
+            if "id" in snapshot and "type" in snapshot:
+                return [snapshot]
+            return list(snapshot.values())
+        return snapshot
+
+    def _append(self, pc, stats_id, name, statsType, time_ns, value):
+        key = f"{stats_id}-{name}"
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            is_number = isinstance(value, (int, float))
+            buffer = RingBuffer(self._window) if is_number else ObjectRing(self._window)
+            self._buffers[key] = buffer
+            self._metadata[key] = (pc, stats_id, name, statsType)
+            position = len(self._keys)
+            self._keys.append(key)
+            self._by_type_name.setdefault((statsType, name), []).append(position)
+            self._by_id_name.setdefault((stats_id, name), []).append(position)
+            self._by_type_id.setdefault((statsType, stats_id), []).append(position)
+            self._dtypes[key] = np.bool_ if isinstance(value, bool) else np.int64 if isinstance(value, int) else None
+            ids = self._ids_by_type.setdefault(statsType, {})
+            ids[stats_id] = True
+        elif isinstance(value, float) and self._dtypes[key] is not None:
+            self._dtypes[key] = None
+        if isinstance(buffer, RingBuffer) and not isinstance(value, (int, float)):
+            return
+        buffer.append(time_ns, value)
+
+    def _append_rate(self, pc, stats_id, name, statsType, time_ns, value):
+        counter_key = f"{stats_id}-{name}"
+        last = self._last_counters.get(counter_key)
+        self._last_counters[counter_key] = (time_ns, value)
+        if last is None or time_ns <= last[0]:
+            return
+        rate = (value - last[1]) * 1e9 / (time_ns - last[0])
+        if name.startswith("bytes") or "Bytes" in name:
+            rate *= 8
+        self._append(pc, stats_id, RATE_METRICS[name], statsType, time_ns, rate)
+
+    def ingest(self, snapshot, pc="live"):
+        """Append a RTCStatsReport snapshot: JSON text, list of stats or dict of id to stats"""
+        for stats in self._iter_stats(snapshot):
+            stats_id = stats.get("id")
+            statsType = stats.get("type")
+            if not stats_id or not statsType:
+                continue
+            timestamp = stats.get("timestamp")
+            # RTCStats timestamp is in milliseconds since epoch
+            time_ns = int(timestamp * 1e6) if timestamp else time.time_ns()
+            for name, value in stats.items():
+                if name in _SKIPPED_FIELDS or isinstance(value, (dict, list)) or value is None:
+                    continue
+                self._append(pc, stats_id, name, statsType, time_ns, value)
+                if name in RATE_METRICS and isinstance(value, (int, float)):
+                    self._append_rate(pc, stats_id, name, statsType, time_ns, value)
+        self.snapshot_count += 1
+
+    def get_stats_ids(self, statsType):
+        return np.array(list(self._ids_by_type.get(statsType, {})), dtype=object)
+
+    get_ids = get_stats_ids
+
+    @staticmethod
+    def _get_positions(index, index_key):
+        return np.array(index.get(index_key, ()), dtype=np.intp)
+
+    def get_positions_by_type_name(self, statsType, statsName):
+        return self._get_positions(self._by_type_name, (statsType, statsName))
+
+    def get_positions_by_id_name(self, id, name):
+        return self._get_positions(self._by_id_name, (id, name))
+
+    def _take(self, positions):
+        """LOOKUP_COLUMNS rows at positions, the values of these metrics only are encoded"""
+        if len(positions) == 0:
+            return pd.DataFrame(columns=LOOKUP_COLUMNS)
+        return pd.DataFrame.from_records(self.get_stats_records(positions), index=positions, columns=LOOKUP_COLUMNS)
+
+    def get_by_type_name(self, statsType, statsName):
+        return self._take(self.get_positions_by_type_name(statsType, statsName))
+
+    def get_by_id_name(self, id, name):
+        return self._take(self.get_positions_by_id_name(id, name))
+
+    def get_by_type_id(self, statsType, statsId):
+        return self._take(self._get_positions(self._by_type_id, (statsType, statsId)))
+
+    def _get_values(self, key):
+        """(times, values) of a metric, None if it has no sample or only zeros like a parsed dump"""
+        buffer = self._buffers[key]
+        times, values = buffer.view()
+        if len(times) == 0:
+            return None
+        if isinstance(buffer, RingBuffer):
+            if not values.any():
+                return None
+            if self._dtypes[key] is not None:
+                values = values.astype(self._dtypes[key])
+        return times, values
+
+    def __getitem__(self, key):
+        series = self._get_values(key)
+        if series is None:
+            raise KeyError(key)
+        times, values = series
+        # copy the values, the ring buffer is overwritten by the next snapshots
+        return pd.DataFrame({"timestamp": pd.DatetimeIndex(times.astype('datetime64[ns]'), tz='UTC'),
+                             "value": np.array(values)})
+
+    def __contains__(self, key):
+        return key in self._buffers and self._get_values(key) is not None
+
+    def __iter__(self):
+        return (key for key in self._buffers if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get_stats_records(self, positions=None, values=True):
+        """Stats items of the window in the same shape as a parsed dump, one per row position, all by default
+           values: encode the samples as the "values" json text, a table without it is O(metrics)
+        """
+        records = []
+        for position in range(len(self._keys)) if positions is None else positions:
+            key = self._keys[position]
+            pc, stats_id, name, statsType = self._metadata[key]
+            times, samples = self._buffers[key].view()
+            record = {"key": key, "pc": pc, "id": stats_id, "name": name, "statsType": statsType,
+                      "startTime": pd.Timestamp(int(times[0]), tz='UTC'),
+                      "endTime": pd.Timestamp(int(times[-1]), tz='UTC')}
+            if values:
+                if isinstance(samples, np.ndarray):
+                    samples = samples.astype(self._dtypes[key] or np.float64).tolist()
+                record["values"] = json.dumps(samples, separators=(',', ':'))
+            records.append(record)
+        return records
+
+    def get_decoded_values(self):
+        """DecodedValues of the rows of the live stats table, copied from the ring buffers without json"""
+        kinds = np.empty(len(self._keys), dtype=np.int8)
+        arrays = []
+        objects = {}
+        for position, key in enumerate(self._keys):
+            buffer = self._buffers[key]
+            _, samples = buffer.view()
+            if isinstance(buffer, ObjectRing):
+                kinds[position] = values_decoder.KIND_OBJECT
+                objects[position] = samples
+                samples = np.empty(0)
+            elif not samples.any():
+                kinds[position] = values_decoder.KIND_ZERO
+            elif self._dtypes[key] is np.bool_:
+                kinds[position] = values_decoder.KIND_BOOL
+            elif self._dtypes[key] is np.int64:
+                kinds[position] = values_decoder.KIND_INT
+            else:
+                kinds[position] = values_decoder.KIND_FLOAT
+            arrays.append(samples)
+        offsets = np.zeros(len(self._keys) + 1, dtype=np.int64)
+        np.cumsum([len(samples) for samples in arrays], out=offsets[1:])
+        buffer = np.concatenate(arrays) if arrays else np.empty(0)
+        return values_decoder.DecodedValues(buffer, offsets, kinds, objects)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from . import analyzer_util
+from . import values_decoder
+
+logger = analyzer_util.get_logger(os.path.basename(__file__))
+
+# bump it whenever the parsed table or the decoded values change
+PARSER_VERSION = 5
+
+CACHE_SUFFIX = ".wscache"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_cache_dir(file_name):
+    return file_name + CACHE_SUFFIX
+
+
+def get_file_hash(file_name):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_state(file_name):
+    stat = os.stat(file_name)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class ObjectValues:
+    """Samples of KIND_OBJECT metrics, decoded from the raw values string when asked for"""
+    def __init__(self, values_strs):
+        self._values_strs = values_strs
+
+    def __getitem__(self, index):
+        return json.loads(self._values_strs[index])
+
+
+def _is_valid(meta, file_name):
+    if meta.get("parser_version") != PARSER_VERSION:
+        return False
+    state = get_file_state(file_name)
+    if meta.get("size") != state["size"]:
+        return False
+    if meta.get("mtime_ns") == state["mtime_ns"]:
+        return True
+    # touched but maybe not changed
+    if meta.get("content_hash") != get_file_hash(file_name):
+        return False
+    meta["mtime_ns"] = state["mtime_ns"]
+    return True
+
+
+def load_cache(file_name):
+    """Return (stats_df, decoded_values, events) of the dump from its cache, None if it is missing or stale"""
+    cache_dir = get_cache_dir(file_name)
+    meta_file = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    try:
+        with open(meta_file, 'r', encoding='utf_8') as f:
+            meta = json.load(f)
+        mtime_ns = meta.get("mtime_ns")
+        if not _is_valid(meta, file_name):
+            logger.info(f"stale cache {cache_dir}")
+            return None
+        if meta["mtime_ns"] != mtime_ns:
+            with open(meta_file, 'w', encoding='utf_8') as f:
+                json.dump(meta, f)
+
+        def load_array(name):
+            return np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode='r')
+
+        columns = {}
+        for column, categories in meta["categories"].items():
+            codes = np.asarray(load_array("codes_" + column))
+            columns[column] = pd.Categorical.from_codes(codes, categories)
+        for column in meta["times"]:
+            columns[column] = pd.DatetimeIndex(np.asarray(load_array("times_" + column)), tz='UTC')
+
+        with open(os.path.join(cache_dir, "values.txt"), 'r', encoding='utf_8', newline='') as f:
+            values_text = f.read()
+        values_offsets = load_array("values_offsets").tolist()
+        columns["values"] = [values_text[values_offsets[i]:values_offsets[i + 1]]
+                             for i in range(len(values_offsets) - 1)]
+
+        stats_df = pd.DataFrame(columns)[meta["columns"]]
+        decoded = values_decoder.DecodedValues(load_array("buffer"), load_array("offsets"),
+                                               np.asarray(load_array("kinds")), ObjectValues(columns["values"]))
+
+        with open(os.path.join(cache_dir, "events.json"), 'r', encoding='utf_8') as f:
+            events = json.load(f)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"fail to load cache {cache_dir}: {e}")
+        return None
+
+    logger.info(f"load cache {cache_dir}")
+    return stats_df, decoded, events
+
+
+def save_cache(file_name, stats_df, decoded, events):
+    """Write the parsed table, the decoded values and the update log columns next to the dump"""
+    cache_dir = get_cache_dir(file_name)
+    tmp_dir = "{}.{}.tmp".format(cache_dir, os.getpid())
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        def save_array(name, array):
+            np.save(os.path.join(tmp_dir, name + ".npy"), array)
+
+        meta = {"parser_version": PARSER_VERSION, "content_hash": get_file_hash(file_name),
+                "columns": list(stats_df.columns), "categories": {}, "times": []}
+        meta.update(get_file_state(file_name))
+
+        for column in stats_df.columns:
+            if column == "values":
+                continue
+            if isinstance(stats_df[column].dtype, pd.DatetimeTZDtype):
+                meta["times"].append(column)
+                save_array("times_" + column, stats_df[column].dt.tz_convert(None).values.astype('datetime64[ns]'))
+                continue
+            categorical = pd.Categorical(stats_df[column])
+            meta["categories"][column] = categorical.categories.tolist()
+            save_array("codes_" + column, categorical.codes)
+
+        values_strs = [s if isinstance(s, str) else "" for s in stats_df.get("values", [])]
+        values_offsets = np.zeros(len(values_strs) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in values_strs], out=values_offsets[1:])
+        with open(os.path.join(tmp_dir, "values.txt"), 'w', encoding='utf_8', newline='') as f:
+            f.write("".join(values_strs))
+        save_array("values_offsets", values_offsets)
+
+        save_array("buffer", decoded.buffer)
+        save_array("offsets", decoded.offsets)
+        save_array("kinds", decoded.kinds)
+
+        with open(os.path.join(tmp_dir, "events.json"), 'w', encoding='utf_8') as f:
+            json.dump(events, f)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf_8') as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, cache_dir)
+        logger.info(f"save cache {cache_dir}")
+    except OSError as e:
+        logger.warning(f"fail to save cache {cache_dir}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
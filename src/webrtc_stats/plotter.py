@@ -1,66 +1,171 @@
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib
 matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.dates import DateFormatter
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import matplotlib.style
 import matplotlib.ticker as mticker
+import numpy as np
 import pandas as pd
 from pytz import timezone
 from datetime import datetime
+from .downsample import downsample, DEFAULT_MAX_POINTS
+
+# value labels are at least LABEL_INTERVAL seconds apart, and at most MAX_LABELS per chart
+LABEL_INTERVAL = 5
+MAX_LABELS = 60
+
+CHART_STYLE = 'seaborn-v0_8-whitegrid'
+CHART_FONT = {'font.weight': 'bold', 'font.size': 18}
+CHART_FORMATS = ["png", "svg"]
+
+# figures kept by every rendering process and thread, keyed by (width, height, rows), cleared and reused for the next page
+_figure_templates = threading.local()
+
+
+def get_label_indexes(times, min_interval=LABEL_INTERVAL, max_labels=MAX_LABELS):
+    """Positions of the samples to label: the first sample of every interval, the interval grows
+       with the time span so that there are no more than max_labels labels
+    """
+    if len(times) == 0:
+        return np.array([], dtype=np.int64)
+    seconds = np.asarray(times).astype('datetime64[ns]').astype(np.int64) / 1e9
+    seconds = seconds - seconds[0]
+    interval = max(min_interval, seconds[-1] / max_labels)
+    _, indexes = np.unique(np.floor(seconds / interval), return_index=True)
+    return indexes
+
+
+def get_chart_rc():
+    rc = dict(matplotlib.style.library.get(CHART_STYLE, {}))
+    rc.update(CHART_FONT)
+    return rc
+
+
+def get_figure(width, height, rows):
+    """A figure of rows charts, reused from the templates of this process"""
+    figures = _figure_templates.__dict__.setdefault("figures", {})
+    key = (width, height, rows)
+    fig = figures.get(key)
+    if fig is None:
+        fig = Figure(figsize=(width, height * rows))
+        FigureCanvasAgg(fig)
+        figures[key] = fig
+    else:
+        fig.clear()
+    return fig
+
+
+def draw_chart(ax, df, chart_field, abscissa="timestamp", chart_type="line", title=None):
+    """Draw one chart on ax through the axes methods only, no pyplot state is involved"""
+    ax.set_title(title or chart_field)
+    ax.set_xlabel(abscissa)
+    ax.set_ylabel(chart_field)
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=30)
+    ax.xaxis.set_major_formatter(DateFormatter("%H:%M:%S"))
+
+    if chart_type == "scatter":
+        ax.scatter(df[abscissa], df[chart_field], marker='o', label=chart_field)
+    elif chart_type == "bar":
+        ax.bar(df[abscissa], df[chart_field], label=chart_field)
+    else:
+        ax.plot(df[abscissa], df[chart_field], marker='.', label=chart_field)
+
+    label_indexes = get_label_indexes(df[abscissa].values)
+    for a, b in zip(df[abscissa].values[label_indexes], df[chart_field].values[label_indexes]):
+        ax.text(a, b, b, ha='center', va='bottom', fontsize=8, rotation=45)
+
+    label_format = '{:,.0f}'
+    ticks_loc = ax.get_yticks().tolist()
+    ax.yaxis.set_major_locator(mticker.FixedLocator(ticks_loc))
+    ax.set_yticklabels([label_format.format(x) for x in ticks_loc])
+
+
+def render_page(file_name, charts, width, height, abscissa="timestamp", chart_type="line"):
+    """Render (title, df, chart_field) charts as the tiles of one file, runs in the worker processes"""
+    with matplotlib.rc_context(get_chart_rc()):
+        fig = get_figure(width, height, len(charts))
+        for i, (title, df, chart_field) in enumerate(charts):
+            ax = fig.add_subplot(len(charts), 1, i + 1)
+            draw_chart(ax, df, chart_field, abscissa, chart_type, title)
+        fig.tight_layout()
+        fig.savefig(file_name)
+    return file_name
+
 
 class Plotter:
-    def __init__(self, chart_file, width=24, height=20) -> None:
+    def __init__(self, chart_file, width=24, height=20, max_points=DEFAULT_MAX_POINTS, downsample_method="lttb") -> None:
         self._chart_file = chart_file
         self._width = width
         self._height = height
-        self._csv_file = self.chart_file[:-4] + '.csv'
-
-    def draw_charts(self, df, chart_fields, abscissa="timestamp", chart_type="line"):
-        plt.style.use('seaborn-v0_8-whitegrid')
-        chart_count = len(chart_fields)
-
-        fig = plt.figure(figsize=(self._width, self._height * chart_count))
-        font = {'weight' : 'bold', 'size'   : 18}
-        plt.rc('font', **font)
+        self._csv_file = self._chart_file[:-4] + '.csv'
+        # series longer than max_points are downsampled before drawing, 0 draws every sample
+        self._max_points = max_points
+        self._downsample_method = downsample_method
 
-        i = 0
+    def _prepare(self, df, chart_field, abscissa):
+        """Samples to draw: no NaN and no more than max_points, None if there is nothing to draw"""
+        df = df[[abscissa, chart_field]].dropna().reset_index(drop=True)
+        if len(df) == 0:
+            return None
+        return downsample(df, self._max_points, self._downsample_method, abscissa, chart_field)
 
+    def draw_charts(self, df, chart_fields, abscissa="timestamp", chart_type="line"):
+        charts = []
         for chart_field in chart_fields:
             if chart_field not in df:
                 print(f'{chart_field} not in this catagory, skip...')
                 continue
+            chart_df = self._prepare(df, chart_field, abscissa)
+            if chart_df is not None:
+                charts.append((chart_field, chart_df, chart_field))
+        if charts:
+            render_page(self._chart_file, charts, self._width, self._height, abscissa, chart_type)
 
-            i = i + 1
-            ax = fig.add_subplot(chart_count, 1, i)
-            self.draw_chart(ax, df, chart_field, abscissa, chart_type)
+    def draw_chart(self, ax, df, chart_field, abscissa="timestamp", chart_type="line"):
+        print("draw chart for {}, {}".format(abscissa, chart_field))
+        chart_df = self._prepare(df, chart_field, abscissa)
+        if chart_df is not None:
+            draw_chart(ax, chart_df, chart_field, abscissa, chart_type)
 
-        fig.savefig(self._chart_file)
-        plt.close()
+    def render_charts(self, series, output_dir, file_format="png", charts_per_page=1, workers=None,
+                      abscissa="timestamp", chart_field="value", chart_type="line"):
+        """Render every (title, df) of series in a process pool
+           charts_per_page=1 writes a file per chart, more tiles several charts in a page
+           return the file names, in the order of series
+        """
+        if file_format not in CHART_FORMATS:
+            raise ValueError(f"unknown chart format {file_format}, expect one of {CHART_FORMATS}")
+        os.makedirs(output_dir, exist_ok=True)
 
-    def draw_chart(self, ax,  df, chart_field, abscissa="timestamp", chart_type="line"):
-        print("draw chart for {}, {}".format(abscissa, chart_field))
-        plt.title(chart_field)
-        plt.xlabel(abscissa)
-        plt.ylabel(chart_field)
-        plt.grid(True)
-        plt.xticks(rotation=30)
-
-        date_form = DateFormatter("%H:%M:%S")
-        ax.xaxis.set_major_formatter(date_form)
-
-        if chart_type == "scatter":
-            ax.scatter(df[abscissa], df[chart_field], marker='o', label=chart_field)
-        elif chart_type == "bar":
-            ax.bar(df[abscissa], df[chart_field], label=chart_field)
-        else:
-            ax.plot(df[abscissa], df[chart_field], marker='.', label=chart_field)
-
-        begin_time = df[abscissa][0]
-        for a, b in zip(df[abscissa], df[chart_field]):
-            if (a - begin_time).seconds >= 5 or a == begin_time:
-                begin_time = a
-                ax.text(a, b, b, ha='center', va='bottom', fontsize=8, rotation=45)
-
-        label_format = '{:,.0f}'
-        ticks_loc = ax.get_yticks().tolist()
-        ax.yaxis.set_major_locator(mticker.FixedLocator(ticks_loc))
-        ax.set_yticklabels([label_format.format(x) for x in ticks_loc])
+        charts = []
+        for title, df in series:
+            chart_df = self._prepare(df, chart_field, abscissa)
+            if chart_df is not None:
+                charts.append((title, chart_df, chart_field))
+
+        pages = []
+        page_count = math.ceil(len(charts) / charts_per_page)
+        base_name = os.path.splitext(os.path.basename(self._chart_file))[0]
+        for i in range(page_count):
+            page_charts = charts[i * charts_per_page:(i + 1) * charts_per_page]
+            if charts_per_page == 1:
+                name = "".join(c if c.isalnum() or c in "-_." else "_" for c in page_charts[0][0])
+            else:
+                name = f"{base_name}_{i + 1}"
+            pages.append((os.path.join(output_dir, f"{name}.{file_format}"), page_charts))
+
+        if workers == 1 or len(pages) <= 1:
+            return [render_page(file_name, page_charts, self._width, self._height, abscissa, chart_type)
+                    for file_name, page_charts in pages]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_page, file_name, page_charts, self._width, self._height,
+                                       abscissa, chart_type)
+                       for file_name, page_charts in pages]
+            return [future.result() for future in futures]
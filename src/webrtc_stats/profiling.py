@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CPROFILE = "cprofile"
+PYINSTRUMENT = "pyinstrument"
+CAPTURE_TOOLS = [CPROFILE, PYINSTRUMENT]
+# lines of the cProfile stats printed when they are not saved
+CAPTURE_LINES = 30
+
+REPORT_COLUMNS = ["stage", "calls", "wall_seconds", "cpu_seconds", "records", "bytes", "peak_rss_mb"]
+
+
+def get_peak_rss_mb():
+    """peak RSS of the process so far, None where resource is missing"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class StageProfiler:
+    """Wall and cpu time of the stages of the analyzer pipeline with their record and byte counts,
+       and the peak RSS of the process when a stage ends. The runs of a stage are summed up,
+       a stage inside another one is counted in both
+    """
+    enabled = True
+
+    def __init__(self):
+        # stage -> [calls, wall seconds, cpu seconds, records, bytes, peak rss mb], in the order they first started
+        self._stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """time the block, it sets the "records" and "bytes" it handled in the dict it gets"""
+        stage = self._stages.setdefault(name, [0, 0.0, 0.0, None, None, None])
+        counts = {}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield counts
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stage[0] += 1
+            stage[1] += wall
+            stage[2] += cpu
+            for column, count in ((3, counts.get("records")), (4, counts.get("bytes"))):
+                if count is not None:
+                    stage[column] = (stage[column] or 0) + count
+            stage[5] = get_peak_rss_mb()
+
+    def report(self):
+        """one dict of REPORT_COLUMNS per stage"""
+        return [dict(zip(REPORT_COLUMNS, [name, *stage])) for name, stage in self._stages.items()]
+
+    def reset(self):
+        self._stages = {}
+
+
+class NullProfiler:
+    """Profiler of an analyzer without profiling: a stage is a shared nullcontext, nothing is measured"""
+    enabled = False
+
+    def __init__(self):
+        self._stage = nullcontext({})
+
+    def stage(self, name):
+        return self._stage
+
+    def report(self):
+        return []
+
+    def reset(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def format_report(report):
+    from tabulate import tabulate
+
+    if not report:
+        return "no profiled stage"
+    rows = [[row[column] if row[column] is not None else "" for column in REPORT_COLUMNS] for row in report]
+    return tabulate(rows, headers=REPORT_COLUMNS, tablefmt='psql', floatfmt='.3f')
+
+
+def start_capture(tool, output=None):
+    """Start profiling with cProfile or pyinstrument, return the function which stops it and
+       saves the profile to output (pstats file of cProfile, html of pyinstrument) or prints it
+    """
+    if tool == CPROFILE:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.enable()
+
+        def stop():
+            profile.disable()
+            if output:
+                profile.dump_stats(output)
+            else:
+                pstats.Stats(profile).sort_stats("cumulative").print_stats(CAPTURE_LINES)
+        return stop
+    if tool == PYINSTRUMENT:
+        try:
+            import pyinstrument
+        except ImportError:
+            raise ValueError("pyinstrument is required to profile with it, pip install pyinstrument")
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+
+        def stop():
+            profiler.stop()
+            if output:
+                with open(output, 'w', encoding='utf_8') as f:
+                    f.write(profiler.output_html())
+            else:
+                print(profiler.output_text())
+        return stop
+    raise ValueError(f"unknown profiler {tool}, one of {CAPTURE_TOOLS}")
+
+
+@contextmanager
+def capture(tool=None, output=None):
+    """Profile the block with start_capture, nothing without a tool"""
+    if not tool:
+        yield
+        return
+    stop = start_capture(tool, output)
+    try:
+        yield
+    finally:
+        stop()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+
+LOOKUP_COLUMNS = ["key", "values", "startTime", "endTime"]
+
+_NO_POSITIONS = np.array([], dtype=np.intp)
+
+
+class StatsIndex:
+    """Hash index of the _webrtc_stats rows by (statsType, name), (id, name) and (statsType, id)
+       It is built once after parsing, every lookup is a dict access plus a row take
+    """
+    def __init__(self, stats_df):
+        self._by_type_name = {}
+        self._by_id_name = {}
+        self._by_type_id = {}
+        self._ids_by_type = {}
+        self._lookup_df = pd.DataFrame(columns=LOOKUP_COLUMNS)
+        if len(stats_df) == 0 or not {"statsType", "id", "name"}.issubset(stats_df.columns):
+            return
+
+        # a table of a binary dump has no raw "values"
+        self._lookup_df = stats_df[[column for column in LOOKUP_COLUMNS if column in stats_df]]
+        self._by_type_name = self._group_positions(stats_df, ["statsType", "name"])
+        self._by_id_name = self._group_positions(stats_df, ["id", "name"])
+        self._by_type_id = self._group_positions(stats_df, ["statsType", "id"])
+
+        # ids in order of appearance, same as pd.unique
+        first_ids = stats_df[["statsType", "id"]].drop_duplicates()
+        for statsType, ids in first_ids.groupby("statsType", sort=False, observed=True)["id"]:
+            self._ids_by_type[statsType] = np.asarray(ids.dropna(), dtype=object)
+
+    @staticmethod
+    def _group_positions(stats_df, columns):
+        return stats_df.groupby(columns, sort=False, observed=True).indices
+
+    def _take(self, positions):
+        return self._lookup_df.iloc[positions]
+
+    def get_ids(self, statsType):
+        return self._ids_by_type.get(statsType, np.array([], dtype=object))
+
+    def get_positions_by_type_name(self, statsType, statsName):
+        return self._by_type_name.get((statsType, statsName), _NO_POSITIONS)
+
+    def get_by_type_name(self, statsType, statsName):
+        return self._take(self._by_type_name.get((statsType, statsName), _NO_POSITIONS))
+
+    def get_by_id_name(self, id, name):
+        return self._take(self._by_id_name.get((id, name), _NO_POSITIONS))
+
+    def get_positions_by_id_name(self, id, name):
+        """row positions in the stats table, one per peer connection which has the metric"""
+        return self._by_id_name.get((id, name), _NO_POSITIONS)
+
+    def get_by_type_id(self, statsType, statsId):
+        return self._take(self._by_type_id.get((statsType, statsId), _NO_POSITIONS))
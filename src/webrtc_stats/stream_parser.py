@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# characters which may continue a number, "1." or "1e" at the end of the buffer is decoded as 1
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_DECODER = json.JSONDecoder()
+
+
+class JsonStreamReader:
+    """Event based reader over a JSON text stream
+       Only the value being decoded is kept in memory, the buffer is refilled on demand
+    """
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.chars_read = 0
+
+    def _fill(self, size=None):
+        if self._eof:
+            return False
+        chunk = self._fp.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self.chars_read += len(chunk)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def peek(self):
+        self._skip_whitespace()
+        if self._pos >= len(self._buf):
+            return ''
+        return self._buf[self._pos]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError("expect '{}' but got '{}' at offset {}".format(
+                char, found, self.chars_read - len(self._buf) + self._pos))
+        self._pos += 1
+
+    def read_value(self):
+        """Decode the next complete JSON value"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # the value is not complete yet, read more (doubling) and retry
+                if not self._fill(max(self._chunk_size, len(self._buf))):
+                    raise
+                continue
+            if (isinstance(value, (int, float)) and _NUMBER_TAIL.match(self._buf, end).end() >= len(self._buf)
+                    and self._fill()):
+                # a number may continue in the next chunk
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self):
+        """Yield the keys of the next object, the caller must consume each value"""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError("expect ',' or '}}' but got '{}'".format(separator))
+
+    def iter_array(self):
+        """Yield the elements of the next array one by one"""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            separator = self.peek()
+            self._pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError("expect ',' or ']' but got '{}'".format(separator))
+
+
+def iter_webrtc_internals(fp, chunk_size=CHUNK_SIZE):
+    """Walk PeerConnections -> <pc> -> stats of a webrtc internals dump without loading it
+       yield (item_key, pc_key, key, value) tuples:
+       * ("stats", pc_key, stats_key, stats_dict) for each stats entry
+       * ("updateLog", pc_key, None, log_list) for the update log of each peer connection
+    """
+    reader = JsonStreamReader(fp, chunk_size)
+    for top_key in reader.iter_object():
+        if top_key != "PeerConnections":
+            reader.read_value()
+            continue
+
+        for pc_key in reader.iter_object():
+            for item_key in reader.iter_object():
+                if item_key == "stats":
+                    for stats_key in reader.iter_object():
+                        yield "stats", pc_key, stats_key, reader.read_value()
+                elif item_key == "updateLog":
+                    yield "updateLog", pc_key, None, reader.read_value()
+                else:
+                    reader.read_value()
+
+
+def walk_webrtc_internals(webrtc_internals):
+    """Same tuples as iter_webrtc_internals, from an already loaded dump"""
+    for pc_key, pc_value in webrtc_internals['PeerConnections'].items():
+        for item_key, item_value in pc_value.items():
+            if item_key == "stats":
+                for stats_key, stats_dict in item_value.items():
+                    yield "stats", pc_key, stats_key, stats_dict
+            elif item_key == "updateLog":
+                yield "updateLog", pc_key, None, item_value
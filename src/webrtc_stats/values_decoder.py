@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import json
+from itertools import chain
+import numpy as np
+
+# kinds of a decoded "values" string
+KIND_EMPTY = 0   # not a list, not decodable or empty
+KIND_INT = 1
+KIND_FLOAT = 2
+KIND_BOOL = 3
+KIND_OBJECT = 4  # e.g. strings such as kind, protocol, ip
+KIND_ZERO = 5    # numeric and all zero, e.g. packetsLost of a healthy call
+
+# kinds whose samples are in the numeric buffer
+NUMERIC_KINDS = [KIND_INT, KIND_FLOAT, KIND_BOOL, KIND_ZERO]
+
+KIND_DTYPES = {
+    KIND_INT: np.int64,
+    KIND_FLOAT: np.float64,
+    KIND_BOOL: np.bool_,
+}
+
+
+def classify_values(metrics_str):
+    """Guess the kind of a "values" string without decoding it"""
+    if not isinstance(metrics_str, str) or not metrics_str.startswith("["):
+        return KIND_EMPTY
+    if "null" in metrics_str or "NaN" in metrics_str or "Infinity" in metrics_str:
+        return KIND_EMPTY
+    if '"' in metrics_str:
+        return KIND_OBJECT
+    if "true" in metrics_str or "false" in metrics_str:
+        return KIND_BOOL
+    if "." in metrics_str or "e" in metrics_str or "E" in metrics_str:
+        return KIND_FLOAT
+    return KIND_INT
+
+
+def _loads_list(metrics_str):
+    try:
+        values = json.loads(metrics_str)
+    except ValueError:
+        return None
+    if type(values) != list:
+        return None
+    return values
+
+
+class DecodedValues:
+    """The whole "values" column decoded in one pass
+       numeric samples live in one flat float64 buffer, metric i is buffer[offsets[i]:offsets[i+1]]
+       samples of KIND_OBJECT metrics are kept as python lists in objects
+    """
+    def __init__(self, buffer, offsets, kinds, objects):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.kinds = kinds
+        self.objects = objects
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def get_values(self, index):
+        """values of metric index as numpy array (list for strings), None if it is empty or all zero"""
+        kind = self.kinds[index]
+        if kind == KIND_EMPTY or kind == KIND_ZERO:
+            return None
+        if kind == KIND_OBJECT:
+            return self.objects[index]
+        values = self.buffer[self.offsets[index]:self.offsets[index + 1]]
+        if kind == KIND_FLOAT:
+            return values
+        return values.astype(KIND_DTYPES[kind])
+
+    def get_samples(self, index):
+        """numeric samples of metric index as float64 array, the zeros of a KIND_ZERO metric too"""
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def non_empty_indexes(self):
+        """metrics with values to show, the all zero ones are left out"""
+        return np.flatnonzero((self.kinds != KIND_EMPTY) & (self.kinds != KIND_ZERO))
+
+    def memory_usage(self):
+        return self.buffer.nbytes + self.offsets.nbytes + self.kinds.nbytes
+
+
+def decode_values(values_strs):
+    """Decode a sequence of webrtc internals "values" strings in a single pass"""
+    values_strs = list(values_strs)
+    count = len(values_strs)
+    kinds = np.fromiter((classify_values(s) for s in values_strs), dtype=np.int8, count=count)
+
+    numeric_indexes = np.flatnonzero((kinds != KIND_EMPTY) & (kinds != KIND_OBJECT))
+    numeric_strs = [values_strs[i] for i in numeric_indexes]
+    try:
+        # one json parse for all numeric metrics
+        numeric_lists = json.loads("[" + ",".join(numeric_strs) + "]")
+    except ValueError:
+        numeric_lists = []
+        for i, metrics_str in zip(numeric_indexes, numeric_strs):
+            values = _loads_list(metrics_str)
+            if values is None:
+                kinds[i] = KIND_EMPTY
+                values = []
+            numeric_lists.append(values)
+
+    lengths = np.zeros(count, dtype=np.int64)
+    lengths[numeric_indexes] = np.fromiter(map(len, numeric_lists), dtype=np.int64, count=len(numeric_lists))
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    buffer = np.fromiter(chain.from_iterable(numeric_lists), dtype=np.float64, count=int(offsets[-1]))
+
+    # the empty metrics have no samples, the all zero ones keep theirs
+    kinds[(lengths == 0) & (kinds != KIND_OBJECT)] = KIND_EMPTY
+    non_empty = np.flatnonzero(lengths > 0)
+    if len(non_empty) > 0:
+        has_nonzero = np.logical_or.reduceat(buffer != 0, offsets[non_empty])
+        kinds[non_empty[~has_nonzero]] = KIND_ZERO
+
+    objects = {}
+    for i in np.flatnonzero(kinds == KIND_OBJECT):
+        values = _loads_list(values_strs[i])
+        if values:
+            objects[i] = values
+        else:
+            kinds[i] = KIND_EMPTY
+
+    return DecodedValues(buffer, offsets, kinds, objects)